@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 14:05:51 2026
+
+@author: kfrench
+
+Command-line entry point for the CBI / SHARP analyses.
+
+    python astrostats.py match --windows 3 6 12
+    python astrostats.py regress --by phase --bootstrap 10000
+    python astrostats.py regress --sharp MEANPOT --log
+    python astrostats.py timeseries USFLUX 'log10(TOTPOT)' --rolling 27D
+    python astrostats.py phases --phases MIN_MAX_PHASES --plot phases.png
+    python astrostats.py cube --reductions median mean -o cbi_frames.csv
+    python astrostats.py wedges --random 1000 --width 40 -o null_wedges.csv
+    python astrostats.py lags --kind monthly --freq MS --max-lag 120 -o lags.csv
+    python astrostats.py index CBI MEANPOT
+    python astrostats.py rollup USFLUX --resolution MS
+
+Paths and settings come from config.py (astrostats.ini, $ASTROSTATS_CONFIG,
+ASTROSTATS_<KEY>), then --config, then --set section.key=value, then the
+per-command path flags.  Only argparse and config are imported up front;
+pandas, scipy, matplotlib and the analysis modules are imported by the
+subcommand that needs them, so --help and bad arguments return at once.
+"""
+
+import argparse
+import os
+import sys
+
+import config
+
+
+# === Helpers ===
+def _apply_settings(args):
+    if args.config:
+        config.load(args.config)
+    cfg = config.get_config()
+    for item in args.set or ():
+        key, sep, value = item.partition('=')
+        section, dot, name = key.partition('.')
+        if not sep or not dot:
+            raise SystemExit(f"--set expects section.key=value, got {item!r}")
+        if section not in cfg:
+            raise SystemExit(f"Unknown config section {section!r}")
+        cfg[section][name] = value
+    if args.trace:
+        import instrument
+
+        instrument.configure(trace=args.trace)
+
+
+def _path(value, name):
+    return os.path.expanduser(value) if value else config.path(name)
+
+
+def _emit(table, output, index=True):
+    """
+    Print a DataFrame, or write it to output (.csv, or .json as records).
+    """
+    if not output:
+        print(table.to_string(index=index))
+    elif output.endswith('.json'):
+        table.reset_index().to_json(output, orient='records', date_format='iso', indent=1)
+    else:
+        table.to_csv(output, index=index)
+
+
+def _save(fig, path):
+    fig.savefig(path, dpi=150)
+    print(f"Figure written to {path}")
+
+
+def _events(args, columns):
+    """
+    CBI catalog rows with Vel > 0 (or all rows with --keep-zero-vel).
+    """
+    from cbi_catalog import load_catalog
+
+    df = load_catalog(_path(args.cbi_file, args.catalog), columns=columns)
+    if not args.keep_zero_vel:
+        df = df[df['Vel'] > 0]
+    return df.reset_index(drop=True)
+
+
+def _phases(name):
+    import solar_phases
+
+    if not name.isupper() or not hasattr(solar_phases, name):
+        raise SystemExit(f"Unknown phase catalog {name!r} (MIN_MAX_PHASES, CYCLE_PHASES)")
+    return getattr(solar_phases, name)
+
+
+# === Subcommands ===
+def cmd_match(args):
+    import logging
+    import time
+
+    from cbi_catalog import load_catalog
+    from matched_events import refresh
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    cbi = load_catalog(_path(args.cbi_file, 'cbi_file'), columns=['Date'])
+    t0 = time.perf_counter()
+    counts = refresh(cbi['Date'], _path(args.swan_db, 'swan_db'), args.keywords, args.windows,
+                     match_db=args.match_db, full=args.full)
+    print(f"{sum(counts.values())} event windows recomputed in {time.perf_counter() - t0:.1f} s")
+    return 0
+
+
+def cmd_regress(args):
+    import numpy as np
+    import pandas as pd
+
+    from regress_batch import grouped_linregress
+
+    df = _events(args, ['Date', 'Vel', 'CBI'])
+    x_col, y_col = args.x, args.y
+    if args.sharp:
+        from matched_events import matched
+
+        df[args.sharp] = matched(df, _path(args.swan_db, 'swan_db'), args.sharp,
+                                 args.window, agg=args.agg)
+        x_col, y_col = args.sharp, 'CBI'
+    if args.log:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            df[x_col] = np.log10(df[x_col].where(df[x_col] > 0))
+
+    if args.by == 'phase':
+        from solar_phases import assign_phases
+
+        df['phase'] = assign_phases(df['Date'], _phases(args.phases))
+    elif args.by == 'year':
+        df['year'] = df['Date'].dt.year
+    else:
+        df['all'] = 'all'
+    by = args.by or 'all'
+
+    table = grouped_linregress(df, by, x_col=x_col, y_col=y_col)
+    if args.bootstrap or args.permutations:
+        from resample_stats import bootstrap, permutation_test
+
+        extra = {}
+        for key, group in df.dropna(subset=[x_col, y_col, by]).groupby(by, observed=True):
+            if len(group) < 3:
+                continue
+            row = {}
+            if args.bootstrap:
+                boot = bootstrap(group[x_col], group[y_col], args.bootstrap, workers=args.workers)
+                row['slope_ci_lo'], row['slope_ci_hi'] = boot['slope_ci']
+                row['r_ci_lo'], row['r_ci_hi'] = boot['r_ci']
+            if args.permutations:
+                perm = permutation_test(group[x_col], group[y_col], args.permutations,
+                                        workers=args.workers)
+                row['perm_p'] = perm['p_value']
+            extra[key] = row
+        table = table.join(pd.DataFrame.from_dict(extra, orient='index'))
+    print(f"{y_col} ~ {x_col}", file=sys.stderr)
+    _emit(table, args.output)
+    return 0
+
+
+def cmd_timeseries(args):
+    import sharp_timeseries
+
+    db_path = _path(args.swan_db, 'swan_cbi_db')
+    specs = args.specs or sharp_timeseries.DEFAULT_SPECS
+    if args.rolling:
+        from rolling_corr import rolling_sharp
+
+        if len(specs) != 1:
+            raise SystemExit("--rolling takes exactly one spec")
+        table = rolling_sharp(db_path, specs[0], x=args.x, window=args.rolling, step=args.step,
+                              start=args.start, end=args.end)
+        _emit(table.dropna(subset=['r']), args.output)
+    else:
+        table = sharp_timeseries.correlation_sweep(db_path, specs, x=args.x, start=args.start,
+                                                   end=args.end)
+        _emit(table, args.output, index=False)
+    if args.plot:
+        import figures
+
+        _save(figures.sharp_timeseries(db_path, specs[0]), args.plot)
+    return 0
+
+
+def cmd_phases(args):
+    from solar_phases import phase_stats
+
+    phases = _phases(args.phases)
+    df = _events(args, ['Date', 'Vel', 'CBI'])
+    if args.nonzero_cbi:
+        df = df[df['CBI'] > 0]
+    _emit(phase_stats(df, phases), args.output)
+    if args.plot:
+        import figures
+
+        _save(figures.phase_grid(_path(args.cbi_file, args.catalog), args.phases), args.plot)
+    return 0
+
+
+def cmd_cube(args):
+    import numpy as np
+    import pandas as pd
+
+    from cbi_cube import frame_reductions
+
+    cube_file = _path(args.cube_file, 'cube_file')
+    table = frame_reductions(cube_file, tuple(args.reductions), tuple(args.percentiles),
+                             start=args.skip, workers=args.workers, executor=args.executor)
+    dates_file = _path(args.dates_file, 'dates_file')
+    if os.path.exists(dates_file):
+        dates = np.load(dates_file, allow_pickle=True)
+        table.insert(0, 'date', pd.to_datetime(dates[table.index.to_numpy()]))
+    _emit(table, args.output)
+    if args.plot:
+        import figures
+
+        _save(figures.cbi_sunspots(cube_file, dates_file, skip=args.skip), args.plot)
+    return 0
+
+
+def cmd_wedges(args):
+    import numpy as np
+    import pandas as pd
+
+    import cbi_wedges
+
+    cube_file = _path(args.cube_file, 'cube_file')
+    index = cbi_wedges.polar_index(
+        cbi_wedges.open_cube(cube_file).shape[1:],
+        center=tuple(args.center) if args.center else None,
+        r_edges=tuple(args.r_edges) if args.r_edges else None,
+        pa_step=args.pa_step, pa_offset=args.pa_offset)
+    pas = cbi_wedges.random_pas(args.random, args.seed) if args.random else args.pas
+    tables = cbi_wedges.wedge_reductions(cube_file, pas, args.width, tuple(args.stats), index=index,
+                                         start=args.skip, workers=args.workers,
+                                         executor=args.executor)
+    # One row per (frame, wedge)
+    table = pd.concat({name: t.stack() for name, t in tables.items()}, axis=1)
+    dates_file = _path(args.dates_file, 'dates_file')
+    if os.path.exists(dates_file):
+        dates = np.load(dates_file, allow_pickle=True)
+        frames = table.index.get_level_values('frame').to_numpy()
+        table.insert(0, 'date', pd.to_datetime(dates[frames]))
+    _emit(table, args.output)
+    return 0
+
+
+def cmd_lags(args):
+    import lag_corr
+
+    grid, table = lag_corr.cbi_sunspot_lags(
+        _path(args.cube_file, 'cube_file'), _path(args.dates_file, 'dates_file'), kind=args.kind,
+        freq=args.freq, max_lag=args.max_lag, block=args.block, n_replicates=args.replicates,
+        skip=args.skip, ci=args.ci, workers=args.workers, seed=args.seed)
+    best = lag_corr.peak(table)
+    print(f"{int(grid['valid'].sum())} of {len(grid)} grid points valid; peak r = {best['r']:.3f} "
+          f"at lag {best.name} ({best['lag_days']:+.0f} days)", file=sys.stderr)
+    _emit(table, args.output)
+    return 0
+
+
+def cmd_index(args):
+    import logging
+
+    import swan_db
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    db_path = _path(args.swan_db, 'swan_db')
+    if args.drop_others:
+        conn = swan_db.connect(db_path)
+        try:
+            for name in swan_db.drop_covering_indexes(conn, keep=[args.keywords]):
+                print(f"Dropped {name}")
+        finally:
+            conn.close()
+    print(', '.join(swan_db.prepare(db_path, args.keywords)) or 'indexes already present')
+    return 0
+
+
+def cmd_rollup(args):
+    import sharp_rollup
+
+    db_path = _path(args.swan_db, 'swan_db')
+    if args.update or args.full or not args.keyword:
+        import logging
+
+        logging.basicConfig(level=logging.INFO, format='%(message)s')
+        sharp_rollup.refresh(db_path, full=args.full)
+    if args.keyword:
+        print(f"level: {sharp_rollup.plan(db_path, args.keyword, args.resolution)}", file=sys.stderr)
+        _emit(sharp_rollup.series(db_path, args.keyword, args.start, args.end, args.resolution),
+              args.output)
+    return 0
+
+
+# === Parser ===
+def build_parser():
+    parser = argparse.ArgumentParser(prog='astrostats', description=__doc__.split('\n\n')[2].strip(),
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', help='INI file (default: astrostats.ini / $ASTROSTATS_CONFIG)')
+    parser.add_argument('--set', action='append', metavar='SECTION.KEY=VALUE',
+                        help='override one setting, e.g. paths.swan_db=/data/swan.db')
+    parser.add_argument('--trace', choices=['off', 'log', 'chrome'], help='stage timing output')
+    sub = parser.add_subparsers(dest='command', metavar='command', required=True)
+
+    def add(name, func, help):
+        p = sub.add_parser(name, help=help, description=help)
+        p.set_defaults(func=func)
+        return p
+
+    def catalog_args(p, default='cbi_file'):
+        p.add_argument('--catalog', choices=['cbi_file', 'cbi_ar_file'], default=default,
+                       help='configured catalog to read (default: %(default)s)')
+        p.add_argument('--cbi-file', help='catalog path, overrides --catalog')
+        p.add_argument('--keep-zero-vel', action='store_true', help='keep events with Vel <= 0')
+
+    def output_arg(p):
+        p.add_argument('-o', '--output', help='write the table to .csv or .json instead of printing')
+
+    p = add('match', cmd_match, 'refresh the CBI / SHARP match table')
+    p.add_argument('--keywords', nargs='+', help='default: every SHARP keyword')
+    p.add_argument('--windows', type=float, nargs='+', default=[6.0],
+                   help='window half-widths in hours (default: 6)')
+    p.add_argument('--full', action='store_true', help='recompute every event')
+    p.add_argument('--cbi-file')
+    p.add_argument('--swan-db')
+    p.add_argument('--match-db')
+
+    p = add('regress', cmd_regress, 'linear regression of CME velocity (or CBI) per group')
+    catalog_args(p)
+    p.add_argument('--x', default='CBI')
+    p.add_argument('--y', default='Vel')
+    p.add_argument('--by', choices=['phase', 'year'], help='fit each group separately')
+    p.add_argument('--phases', default='CYCLE_PHASES', help='phase catalog for --by phase')
+    p.add_argument('--sharp', metavar='KEYWORD', help='regress CBI on a windowed SHARP keyword')
+    p.add_argument('--window', type=float, default=6.0, help='--sharp window half-width (hours)')
+    p.add_argument('--agg', default='max', choices=['max', 'mean', 'min'])
+    p.add_argument('--swan-db')
+    p.add_argument('--log', action='store_true', help='use log10 of the x column')
+    p.add_argument('--bootstrap', type=int, metavar='N', help='add bootstrap CIs from N replicates')
+    p.add_argument('--permutations', type=int, metavar='N', help='add a permutation p-value')
+    p.add_argument('--workers', type=int)
+    output_arg(p)
+
+    p = add('timeseries', cmd_timeseries, 'correlate CBI with SHARP keyword specs over time')
+    p.add_argument('specs', nargs='*', help="keywords, 'log10(KW)' or 'A/B' (default: a sweep)")
+    p.add_argument('--x', default='CBI')
+    p.add_argument('--swan-db')
+    p.add_argument('--start')
+    p.add_argument('--end')
+    p.add_argument('--rolling', metavar='WINDOW', help="rolling correlation window, e.g. 27D")
+    p.add_argument('--step', default='1D', help='grid step for --rolling (default: %(default)s)')
+    p.add_argument('--plot', metavar='FILE', help='also save the time-series figure of the first spec')
+    output_arg(p)
+
+    p = add('phases', cmd_phases, 'CBI and velocity statistics per solar-cycle phase')
+    catalog_args(p, default='cbi_ar_file')
+    p.add_argument('--phases', default='MIN_MAX_PHASES', help='MIN_MAX_PHASES or CYCLE_PHASES')
+    p.add_argument('--nonzero-cbi', action='store_true', help='drop events with CBI <= 0')
+    p.add_argument('--plot', metavar='FILE', help='also save the 2x2 phase scatter grid')
+    output_arg(p)
+
+    p = add('cube', cmd_cube, 'per-frame reductions of the CBI image cube')
+    p.add_argument('--cube-file')
+    p.add_argument('--dates-file')
+    p.add_argument('--reductions', nargs='+', default=['median'],
+                   choices=['median', 'nanmedian', 'mean', 'sum', 'std', 'min', 'max'])
+    p.add_argument('--percentiles', type=float, nargs='+', default=[])
+    p.add_argument('--skip', type=int, default=100, help='leading frames to skip (default: 100)')
+    p.add_argument('--workers', type=int)
+    p.add_argument('--executor', choices=['thread', 'process'], default='thread')
+    p.add_argument('--plot', metavar='FILE', help='also save the CBI / sunspot figure')
+    output_arg(p)
+
+    p = add('wedges', cmd_wedges, 'position-angle wedge statistics of the CBI image cube')
+    p.add_argument('--cube-file')
+    p.add_argument('--dates-file')
+    p.add_argument('--pas', type=float, nargs='+', default=[0.0, 90.0, 180.0, 270.0],
+                   help='wedge centre PAs in degrees')
+    p.add_argument('--random', type=int, metavar='N', help='use N random PAs instead of --pas')
+    p.add_argument('--seed', type=int, default=0, help='seed for --random (default: 0)')
+    p.add_argument('--width', type=float, default=40.0, help='wedge width in degrees (default: 40)')
+    p.add_argument('--stats', nargs='+', default=['median'], choices=['sum', 'mean', 'median', 'count'])
+    p.add_argument('--r-edges', type=float, nargs='+', help='radius limits in pixels')
+    p.add_argument('--center', type=float, nargs=2, metavar=('ROW', 'COL'))
+    p.add_argument('--pa-step', type=float, default=1.0, help='PA bin in degrees (default: 1)')
+    p.add_argument('--pa-offset', type=float, default=0.0, help='PA of image up, in degrees')
+    p.add_argument('--skip', type=int, default=100, help='leading frames to skip (default: 100)')
+    p.add_argument('--workers', type=int)
+    p.add_argument('--executor', choices=['thread', 'process'], default='thread')
+    output_arg(p)
+
+    p = add('lags', cmd_lags, 'lagged cross-correlation of the CBI median with the sunspot number')
+    p.add_argument('--cube-file')
+    p.add_argument('--dates-file')
+    p.add_argument('--kind', choices=['daily', 'monthly', 'smoothed'], default='daily',
+                   help='SILSO series (default: %(default)s)')
+    p.add_argument('--freq', default='1D', help='common grid step, e.g. 1D, 27D, MS (default: %(default)s)')
+    p.add_argument('--max-lag', default='2000D', help='grid steps or a duration (default: %(default)s)')
+    p.add_argument('--block', default='365D',
+                   help='bootstrap block, grid steps or a duration (default: %(default)s)')
+    p.add_argument('--replicates', type=int, default=1000, help='bootstrap replicates (default: 1000)')
+    p.add_argument('--ci', type=float, default=0.95)
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--skip', type=int, default=100, help='leading frames to skip (default: 100)')
+    p.add_argument('--workers', type=int)
+    output_arg(p)
+
+    p = add('index', cmd_index, 'build the SWAN Timestamp index and one covering index')
+    p.add_argument('keywords', nargs='*', help='keyword set for the covering index (any order)')
+    p.add_argument('--drop-others', action='store_true',
+                   help='drop covering indexes built for other keyword sets')
+    p.add_argument('--swan-db')
+
+    p = add('rollup', cmd_rollup, 'update the SHARP time rollups or query one keyword from them')
+    p.add_argument('keyword', nargs='?', help='keyword to query (default: only update)')
+    p.add_argument('--resolution', default='MS', help="bin size, e.g. 6h, 1D, MS (default: %(default)s)")
+    p.add_argument('--start')
+    p.add_argument('--end')
+    p.add_argument('--update', action='store_true', help='update the rollups before querying')
+    p.add_argument('--full', action='store_true', help='rebuild the rollups from scratch')
+    p.add_argument('--swan-db')
+    output_arg(p)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    _apply_settings(args)
+    try:
+        return args.func(args)
+    except FileNotFoundError as err:
+        # Usually an unconfigured data path
+        print(f"astrostats {args.command}: {err}", file=sys.stderr)
+        return 2
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
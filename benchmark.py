@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 15:04:38 2026
+
+@author: kfrench
+
+Benchmark harness for the CBI analyses on synthetic data.
+
+Deterministic generators (seeded, chunked so the big sizes stay in
+bounded memory) write a CBI catalog (CSV, plus a workbook with Date,
+Corrected Velocity, Median Brightness, Cls), a SWAN solar_flare_data
+database and a CBI cube for each scale n.  Files already generated for a
+scale and seed are reused.
+
+  catalog  n events, 2010-2024          (workbook only up to EXCEL_MAX_ROWS)
+  swan     n SHARP rows over the same span
+  cube     about n pixels, CUBE_SIDE x CUBE_SIDE frames
+
+Each scale then times the load, match, stats and render stages of the
+existing analyses and the results go to a JSON file.  --compare flags
+stages that got slower than a previous results file.  The result cache
+(result_cache.py) is switched off for the run, so every stage computes
+instead of timing a cache hit.
+
+    python benchmark.py --scales 1e3 1e4 1e5
+    python benchmark.py --scales 1e5 --compare bench_results_old.json
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import config
+
+SPAN = ('2010-05-01', '2024-12-31')
+KEYWORDS = ('USFLUX', 'TOTUSJZ', 'TOTBSQ', 'MEANPOT', 'TOTPOT', 'R_VALUE')
+CLASSES = np.array(list('ABCMX'))
+CUBE_SIDE = 64
+MIN_FRAMES = 16
+EXCEL_MAX_ROWS = 200_000
+CHUNK_ROWS = 1_000_000
+REGRESSION = 1.25
+# Differences below this many seconds are timer noise, never a regression
+NOISE_FLOOR = 0.005
+OUT_FILE = 'bench_results.json'
+
+
+# === Generators ===
+def _span_seconds():
+    lo, hi = (pd.Timestamp(s) for s in SPAN)
+    return lo, int((hi - lo).total_seconds())
+
+
+def iter_catalog(n, seed=0, chunk_rows=CHUNK_ROWS):
+    """
+    n CME events in chunks of chunk_rows, with the columns load_catalog
+    returns: Date (sorted, on the minute), Vel (about 10% zero), CBI
+    (lognormal) and Cls (GOES class, about 5% missing).
+    """
+    lo, span = _span_seconds()
+    for i0 in range(0, n, chunk_rows):
+        i1 = min(n, i0 + chunk_rows)
+        rng = np.random.default_rng([seed, 1, i0])
+        m = i1 - i0
+        # One event per slot of span / n seconds, at a random offset within it
+        seconds = (np.arange(i0, i1, dtype=np.int64) * span + rng.integers(0, span, m)) // n
+        # Round to the minute, like the catalog
+        dates = lo + pd.to_timedelta(seconds - seconds % 60, unit='s')
+        cbi = rng.lognormal(0.5, 0.8, m)
+        vel = np.maximum(0, 300 + 60 * cbi + rng.normal(0, 200, m)).round()
+        vel[rng.random(m) < 0.1] = 0
+        cls = np.char.add(CLASSES[rng.integers(0, len(CLASSES), m)],
+                          np.char.mod('%.1f', rng.uniform(1, 9.9, m)))
+        cls = cls.astype(object)
+        cls[rng.random(m) < 0.05] = None
+        yield pd.DataFrame({'Date': dates, 'Vel': vel.astype(int), 'CBI': cbi, 'Cls': cls})
+
+
+def synth_catalog(n, seed=0):
+    """
+    The whole iter_catalog(n, seed) as one DataFrame.
+    """
+    return pd.concat(iter_catalog(n, seed), ignore_index=True)
+
+
+def synth_catalog_csv(path, n, seed=0):
+    """
+    Write iter_catalog(n, seed) to a CSV one chunk at a time.
+    """
+    with open(path, 'w', newline='') as fh:
+        for i, chunk in enumerate(iter_catalog(n, seed)):
+            chunk.to_csv(fh, header=i == 0, index=False, date_format='%Y-%m-%d %H:%M')
+
+
+def read_catalog_csv(path):
+    return pd.read_csv(path, parse_dates=['Date'], dtype={'Cls': str})
+
+
+def write_catalog(df, path):
+    from cbi_catalog import RENAMES
+
+    out = df.rename(columns={v: k for k, v in RENAMES.items()})
+    out['Date'] = out['Date'].dt.strftime('%Y-%m-%d %H:%M')
+    out.to_excel(path, index=False)
+
+
+def synth_swan(path, n, seed=0, keywords=KEYWORDS):
+    """
+    solar_flare_data with n rows: evenly spaced Timestamps over SPAN, a few
+    hundred HARPNUMs, CBI and lognormal keywords with about 2% NULLs.
+    Written in CHUNK_ROWS transactions.
+    """
+    import sqlite3
+
+    lo, span = _span_seconds()
+    cols = ['Timestamp', 'HARPNUM', 'CBI'] + list(keywords)
+    conn = sqlite3.connect(path)
+    conn.execute(f"CREATE TABLE solar_flare_data (Timestamp TEXT, HARPNUM INTEGER, CBI REAL, "
+                 f"{', '.join(k + ' REAL' for k in keywords)})")
+    sql = f"INSERT INTO solar_flare_data VALUES ({', '.join('?' * len(cols))})"
+    for i0 in range(0, n, CHUNK_ROWS):
+        i1 = min(n, i0 + CHUNK_ROWS)
+        rng = np.random.default_rng([seed, 2, i0])
+        m = i1 - i0
+        seconds = np.arange(i0, i1, dtype=np.int64) * span // n
+        frame = pd.DataFrame({
+            'Timestamp': (lo + pd.to_timedelta(seconds, unit='s')).strftime('%Y-%m-%d %H:%M:%S'),
+            'HARPNUM': rng.integers(1, 400, m),
+            'CBI': rng.lognormal(0.5, 0.8, m),
+        })
+        for k in keywords:
+            values = rng.lognormal(20 if k in ('USFLUX', 'TOTPOT') else 5, 1.0, m)
+            values[rng.random(m) < 0.02] = np.nan
+            frame[k] = values
+        frame = frame.astype(object).where(frame.notna(), None)
+        with conn:
+            conn.executemany(sql, frame.itertuples(index=False, name=None))
+    conn.close()
+
+
+def synth_cube(path, n, seed=0, side=CUBE_SIDE):
+    """
+    float32 (frames, side, side) cube with about n pixels, written through
+    a memmap one frame block at a time.
+    """
+    frames = max(MIN_FRAMES, n // (side * side))
+    cube = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32,
+                                     shape=(frames, side, side))
+    block = max(1, CHUNK_ROWS // (side * side))
+    for f0 in range(0, frames, block):
+        f1 = min(frames, f0 + block)
+        rng = np.random.default_rng([seed, 3, f0])
+        cube[f0:f1] = rng.lognormal(0, 0.5, (f1 - f0, side, side))
+    cube.flush()
+    del cube
+
+
+def generate(n, work_dir, seed=0):
+    """
+    Generate (or reuse) the data files for scale n.  Returns their paths.
+    """
+    import swan_db
+
+    os.makedirs(work_dir, exist_ok=True)
+    stem = os.path.join(work_dir, f"n{n}_s{seed}")
+    paths = {
+        'catalog': None,
+        'catalog_csv': stem + '_catalog.csv',
+        'swan_db': stem + '_swan.db',
+        'cube_file': stem + '_cube.npy',
+        'match_db': stem + '_matches.db',
+    }
+    if not os.path.exists(paths['catalog_csv']):
+        synth_catalog_csv(paths['catalog_csv'] + '.tmp', n, seed)
+        os.replace(paths['catalog_csv'] + '.tmp', paths['catalog_csv'])
+    catalog = read_catalog_csv(paths['catalog_csv'])
+    if n <= EXCEL_MAX_ROWS:
+        paths['catalog'] = stem + '_catalog.xlsx'
+        if not os.path.exists(paths['catalog']):
+            write_catalog(catalog, paths['catalog'])
+    if not os.path.exists(paths['swan_db']):
+        synth_swan(paths['swan_db'] + '.tmp', n, seed)
+        os.replace(paths['swan_db'] + '.tmp', paths['swan_db'])
+    if not os.path.exists(paths['cube_file']):
+        synth_cube(paths['cube_file'], n, seed)
+    # Index builds are set-up, not part of any timed stage
+    for keywords in [('CBI', 'USFLUX', 'MEANPOT'), ('MEANPOT',), ('CBI', 'MEANPOT')]:
+        swan_db.prepare(paths['swan_db'], keywords)
+    return catalog, paths
+
+
+# === Timing ===
+def timed(results, n, stage, name, func, rows=None, repeat=3, setup=None):
+    """
+    Best and mean wall time of func() over repeat runs.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+    entry = {'n': n, 'stage': stage, 'name': name, 'rows': int(rows if rows is not None else n),
+             'best_s': min(times), 'mean_s': float(np.mean(times)), 'repeat': repeat}
+    results.append(entry)
+    print(f"  {stage:7s} {name:24s} {entry['best_s'] * 1e3:10.1f} ms")
+    return entry
+
+
+def _render(builder, *args, **kwargs):
+    fig = builder(*args, **kwargs)
+    fig.savefig(io.BytesIO(), format='png', dpi=100)
+
+
+def run_scale(n, work_dir, seed=0, repeat=3, render=True):
+    import cbi_catalog
+    import cbi_cube
+    import cbi_wedges
+    import lag_corr
+    import matched_events
+    import regress_batch
+    import resample_stats
+    import sharp_stream
+    import sharp_timeseries
+    import swan_db
+    from flare_class import parse_flare_class
+    from window_join import get_sharp_near_times
+
+    print(f"n = {n:,d}")
+    t0 = time.perf_counter()
+    catalog, paths = generate(n, work_dir, seed)
+    print(f"  data ready in {time.perf_counter() - t0:.1f} s")
+    results = []
+    db, cube_file = paths['swan_db'], paths['cube_file']
+
+    # --- load ---
+    if paths['catalog']:
+        timed(results, n, 'load', 'catalog_excel',
+              lambda: cbi_catalog.load_catalog(paths['catalog'], cache_dir=work_dir, refresh=True),
+              repeat=1)
+        timed(results, n, 'load', 'catalog_cached',
+              lambda: cbi_catalog.load_catalog(paths['catalog'], columns=['Date', 'Vel', 'CBI', 'Cls'],
+                                               cache_dir=work_dir), repeat=repeat)
+    timed(results, n, 'load', 'swan_series',
+          lambda: swan_db.load_series(db, ['CBI', 'USFLUX', 'MEANPOT']), repeat=repeat)
+    timed(results, n, 'load', 'swan_stream',
+          lambda: sharp_stream.collect(sharp_stream.iter_chunks(db, ['CBI', 'USFLUX', 'MEANPOT'])),
+          repeat=repeat)
+    timed(results, n, 'load', 'swan_stream_moments',
+          lambda: sharp_stream.moments(sharp_stream.iter_chunks(db, ['CBI', 'USFLUX', 'MEANPOT'])),
+          repeat=repeat)
+    timed(results, n, 'load', 'cube_open', lambda: cbi_cube.open_cube(cube_file), repeat=repeat)
+
+    # --- match ---
+    timed(results, n, 'match', 'window_join',
+          lambda: get_sharp_near_times(catalog, db, 'MEANPOT', 6, agg=['max', 'mean', 'min']),
+          repeat=repeat)
+
+    def fresh_matches():
+        if os.path.exists(paths['match_db']):
+            os.remove(paths['match_db'])
+
+    timed(results, n, 'match', 'match_table_build',
+          lambda: matched_events.refresh(catalog['Date'], db, ['MEANPOT'], [6], paths['match_db']),
+          repeat=repeat, setup=fresh_matches)
+    timed(results, n, 'match', 'match_table_noop',
+          lambda: matched_events.refresh(catalog['Date'], db, ['MEANPOT'], [6], paths['match_db']),
+          repeat=repeat)
+
+    # --- stats ---
+    timed(results, n, 'stats', 'flare_class', lambda: parse_flare_class(catalog['Cls']),
+          repeat=repeat)
+    frame = sharp_timeseries.load_frame(db, ['MEANPOT', 'log10(TOTPOT)', 'TOTUSJZ/USFLUX'],
+                                        require_all=False)
+    timed(results, n, 'stats', 'correlate',
+          lambda: sharp_timeseries.correlate(frame, 'CBI', ['MEANPOT', 'log10(TOTPOT)',
+                                                            'TOTUSJZ/USFLUX']),
+          rows=len(frame), repeat=repeat)
+    series = frame.set_index('Timestamp')
+    grid = lag_corr.align(series['CBI'], series['MEANPOT'], freq='1h')
+    timed(results, n, 'stats', 'xcorr_all_lags',
+          lambda: lag_corr.xcorr(grid['x'].to_numpy(), grid['y'].to_numpy()),
+          rows=len(grid), repeat=repeat)
+    by_year = catalog.assign(year=catalog['Date'].dt.year)
+    timed(results, n, 'stats', 'grouped_linregress',
+          lambda: regress_batch.grouped_linregress(by_year, 'year'), repeat=repeat)
+    timed(results, n, 'stats', 'bootstrap_1k',
+          lambda: resample_stats.bootstrap(catalog['CBI'], catalog['Vel'], n_replicates=1000,
+                                           workers=1), repeat=1)
+    cube = cbi_cube.open_cube(cube_file)
+    timed(results, n, 'stats', 'frame_medians', lambda: cbi_cube.frame_medians(cube),
+          rows=cube.size, repeat=repeat)
+    pas = cbi_wedges.random_pas(100, seed)
+    timed(results, n, 'stats', 'wedge_medians_100',
+          lambda: cbi_wedges.wedge_reductions(cube, pas, stats=('median',)),
+          rows=cube.size, repeat=repeat)
+
+    # --- render ---
+    if render:
+        import figures
+
+        # sharp_scatter reads the match table through config's match_db
+        config.get_config()['paths']['match_db'] = paths['match_db']
+
+        if paths['catalog']:
+            timed(results, n, 'render', 'velocity_scatter',
+                  lambda: _render(figures.velocity_scatter, paths['catalog']), repeat=1)
+            timed(results, n, 'render', 'sharp_scatter',
+                  lambda: _render(figures.sharp_scatter, paths['catalog'], db, 'MEANPOT'), repeat=1)
+        timed(results, n, 'render', 'sharp_timeseries',
+              lambda: _render(figures.sharp_timeseries, db, 'MEANPOT'), rows=len(frame), repeat=1)
+
+    swan_db.close_pools()
+    return results
+
+
+# === Results ===
+def _commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment():
+    import matplotlib
+    import scipy
+
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'scipy': scipy.__version__,
+        'matplotlib': matplotlib.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(old, new, threshold=REGRESSION):
+    """
+    Entries of new whose best time is more than threshold x the matching
+    (n, stage, name) entry of old (and slower by more than NOISE_FLOOR).
+    """
+    before = {(r['n'], r['stage'], r['name']): r['best_s'] for r in old['results']}
+    slower = []
+    for r in new['results']:
+        ref = before.get((r['n'], r['stage'], r['name']))
+        if ref and r['best_s'] > threshold * ref and r['best_s'] - ref > NOISE_FLOOR:
+            slower.append(dict(r, baseline_s=ref, ratio=r['best_s'] / ref))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the CBI analyses on synthetic data.')
+    parser.add_argument('--scales', type=float, nargs='+', default=[1e3, 1e4, 1e5],
+                        help='rows per dataset, 1e3 .. 1e8')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--work-dir', help='generated data (default: <cache_dir>/bench)')
+    parser.add_argument('--out', default=OUT_FILE)
+    parser.add_argument('--no-render', action='store_true')
+    parser.add_argument('--compare', metavar='JSON', help='earlier results to check against')
+    parser.add_argument('--threshold', type=float, default=REGRESSION)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    # Time the work, not result_cache hits (worker processes read the env)
+    os.environ['ASTROSTATS_RESULT_CACHE'] = 'false'
+    config.get_config()['cache']['result_cache'] = 'false'
+    work_dir = args.work_dir or os.path.join(config.path('cache_dir'), 'bench')
+    report = dict(environment(), seed=args.seed, results=[])
+    for n in args.scales:
+        report['results'] += run_scale(int(n), work_dir, args.seed, args.repeat,
+                                       render=not args.no_render)
+
+    with open(args.out, 'w') as fh:
+        json.dump(report, fh, indent=1)
+    print(f"Results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as fh:
+            slower = compare(json.load(fh), report, args.threshold)
+        for r in slower:
+            print(f"SLOWER  n={r['n']:,d} {r['stage']}/{r['name']}: "
+                  f"{r['baseline_s'] * 1e3:.1f} -> {r['best_s'] * 1e3:.1f} ms (x{r['ratio']:.2f})")
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
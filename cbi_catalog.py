@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 11:20:54 2026
+
+@author: kfrench
+
+Loader for the LASCO CBI Excel catalogs (cbi_wedge_40_sum.xlsx,
+cbi_wedge_40_sum_markedAR.xlsx, ...).
+
+The first load parses the workbook, applies the usual Vel/CBI renames and
+Date parsing, and writes an uncompressed Arrow/Feather file under
+<cache_dir>/catalog (cache_dir from config.py).  Later loads memory-map
+that file and read only the requested columns.  The cache stores the
+workbook's size, mtime and sha256 in its schema metadata and is rebuilt
+whenever they stop matching.  If the cache can't be written (read-only or
+full disk) the parsed workbook is returned anyway.  pyarrow is optional;
+without it every load falls back to read_excel.  Within a process, repeated loads
+come from the result_cache memo.
+"""
+
+import hashlib
+import json
+import logging
+import os
+
+import pandas as pd
+
+import config
+import instrument
+import result_cache
+from result_cache import file_sha256
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+RENAMES = {'Corrected Velocity': 'Vel', 'Median Brightness': 'CBI'}
+CACHE_SUFFIX = '.arrow'
+FINGERPRINT_KEY = b'cbi_catalog_fingerprint'
+
+
+def fingerprint(path, with_hash=True):
+    st = os.stat(path)
+    fp = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    if with_hash:
+        fp['sha256'] = file_sha256(path)
+    return fp
+
+
+def cache_path(path, cache_dir=None):
+    """
+    Arrow cache file for a workbook, in cache_dir (default
+    <cache_dir>/catalog).  The name carries a hash of the workbook's full
+    path so same-named workbooks in different folders don't collide.
+    """
+    cache_dir = cache_dir or os.path.join(config.path('cache_dir'), 'catalog')
+    tag = hashlib.sha256(os.path.realpath(path).encode()).hexdigest()[:12]
+    base = f"{os.path.splitext(os.path.basename(path))[0]}-{tag}{CACHE_SUFFIX}"
+    return os.path.join(cache_dir, base)
+
+
+def read_catalog_excel(path):
+    """
+    Parse the workbook the same way the analysis scripts always have.
+    """
+    df = pd.read_excel(path)
+    df['Date'] = pd.to_datetime(df['Date'])
+    df.rename(columns=RENAMES, inplace=True)
+    return df
+
+
+def _cached_fingerprint(cache_file):
+    try:
+        with pa.memory_map(cache_file) as source:
+            meta = pa.ipc.open_file(source).schema.metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    raw = meta.get(FINGERPRINT_KEY)
+    return json.loads(raw) if raw else None
+
+
+def is_fresh(path, cache_file):
+    """
+    The cache is fresh if size and mtime match; if only the mtime moved
+    (touch, copy) the sha256 decides.
+    """
+    cached = _cached_fingerprint(cache_file)
+    if cached is None:
+        return False
+    current = fingerprint(path, with_hash=False)
+    if current['size'] != cached.get('size'):
+        return False
+    if current['mtime_ns'] == cached.get('mtime_ns'):
+        return True
+    return file_sha256(path) == cached.get('sha256')
+
+
+def write_cache(df, path, cache_file):
+    """
+    Write df to the Arrow cache and return the table (returned even if
+    the write fails, so callers can carry on without a cache).
+    """
+    df = df.copy()
+    # Mixed object columns (notes, flags) go in as strings
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    meta = dict(table.schema.metadata or {})
+    meta[FINGERPRINT_KEY] = json.dumps(fingerprint(path)).encode()
+    table = table.replace_schema_metadata(meta)
+
+    tmp = cache_file + '.tmp'
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        feather.write_feather(table, tmp, compression='uncompressed')
+        os.replace(tmp, cache_file)
+    except OSError as err:
+        logger.warning("Could not write the catalog cache %s: %s", cache_file, err)
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+    return table
+
+
+# The Arrow file is the on-disk layer, so only the in-process memo is used
+@result_cache.cached('catalog', files=('path',), ignore=('cache_dir',), refresh='refresh', disk=False)
+@instrument.timed('load.catalog')
+def load_catalog(path, columns=None, cache_dir=None, refresh=False):
+    """
+    Load a CBI catalog with Date parsed and Vel/CBI renamed.
+
+    columns limits the returned columns (post-rename names); only those are
+    read from the cache.  refresh=True rebuilds the cache unconditionally.
+    """
+    if pa is None:
+        df = read_catalog_excel(path)
+        instrument.count('bytes_read', os.path.getsize(path))
+        return df[list(columns)] if columns is not None else df
+
+    cache_file = cache_path(path, cache_dir)
+    if refresh or not is_fresh(path, cache_file):
+        df = read_catalog_excel(path)
+        instrument.count('bytes_read', os.path.getsize(path))
+        # Return what a cache hit would, not the raw workbook frame
+        table = write_cache(df, path, cache_file)
+        if columns is not None:
+            table = table.select(list(columns))
+        return table.to_pandas()
+
+    table = feather.read_table(cache_file, columns=columns, memory_map=True)
+    instrument.count('bytes_read', table.nbytes)
+    return table.to_pandas()
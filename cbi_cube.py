@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 12:31:45 2026
+
+@author: kfrench
+
+Bounded-memory reader for the CBI image cube (frames x ny x nx .npy).
+
+The cube is memory-mapped instead of unpickled, and per-frame reductions
+(median, mean, percentiles, masked sums over a wedge, ...) are computed a
+chunk of frames at a time across a thread or process pool.  Peak memory is
+about workers x chunk, no matter how many frames the cube holds.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import instrument
+
+CHUNK_BYTES = 128 * 1024 ** 2
+
+
+def open_cube(path):
+    """
+    Memory-map a cube saved as a plain numeric .npy (no pickle).
+    """
+    try:
+        return np.load(path, mmap_mode='r')
+    except ValueError as err:
+        raise ValueError(
+            f"{path} holds a pickled object array and cannot be memory-mapped; "
+            f"convert it once with convert_cube()"
+        ) from err
+
+
+def convert_cube(src, dst, dtype=np.float32):
+    """
+    One-off conversion of a pickled (object dtype) cube to a plain .npy
+    that open_cube() can memory-map.  Frames are written one at a time.
+    """
+    cube = np.load(src, allow_pickle=True)
+    first = np.asarray(cube[0], dtype=dtype)
+    out = np.lib.format.open_memmap(dst, mode='w+', dtype=dtype,
+                                    shape=(len(cube),) + first.shape)
+    for i, frame in enumerate(cube):
+        out[i] = np.asarray(frame, dtype=dtype)
+    out.flush()
+    del out
+    return dst
+
+
+def _apply_chunk(cube, start, stop, func, args):
+    with instrument.stage('cube.chunk', start=start, stop=stop):
+        if isinstance(cube, (str, os.PathLike)):
+            cube = open_cube(cube)
+        chunk = np.asarray(cube[start:stop])
+        instrument.count('bytes_read', chunk.nbytes)
+        return start, func(chunk, *args)
+
+
+def map_chunks(cube, func, args=(), start=0, stop=None, chunk_frames=None, workers=None,
+               executor='thread'):
+    """
+    Apply func(chunk, *args) to consecutive blocks of frames across a
+    thread or process pool.  chunk is an in-memory (frames, ny, nx) array;
+    by default each holds about CHUNK_BYTES.  executor='process' reopens
+    the memmap in each worker (func and args must pickle).
+
+    Returns [(start, stop, result), ...] in frame order.
+    """
+    arr = open_cube(cube) if isinstance(cube, (str, os.PathLike)) else cube
+    if executor == 'process' and not isinstance(cube, (str, os.PathLike)):
+        raise ValueError("executor='process' needs the cube path, not an array")
+
+    stop = len(arr) if stop is None else min(stop, len(arr))
+    if chunk_frames is None:
+        frame_bytes = arr[0].nbytes if len(arr) else 1
+        chunk_frames = max(1, CHUNK_BYTES // max(frame_bytes, 1))
+    workers = workers or os.cpu_count() or 1
+    bounds = [(s, min(s + chunk_frames, stop)) for s in range(start, stop, chunk_frames)]
+
+    pool_cls = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+    source = cube if executor == 'process' else arr
+    pieces = {}
+    pool_args = instrument.pool_kwargs() if executor == 'process' else {}
+    with pool_cls(max_workers=workers, **pool_args) as pool:
+        # Keep at most 2 x workers chunks in flight so memory stays bounded
+        pending = []
+        for s, e in bounds:
+            pending.append(pool.submit(_apply_chunk, source, s, e, func, args))
+            if len(pending) >= 2 * workers:
+                s0, out = pending.pop(0).result()
+                pieces[s0] = out
+        for fut in pending:
+            s0, out = fut.result()
+            pieces[s0] = out
+    return [(s, e, pieces[s]) for s, e in bounds]
+
+
+def _reduce_chunk(chunk, reductions, percentiles, masks):
+    flat = chunk.reshape(len(chunk), -1)
+
+    out = {}
+    for name in reductions:
+        if name == 'median':
+            out[name] = np.median(flat, axis=1)
+        elif name == 'nanmedian':
+            out[name] = np.nanmedian(flat, axis=1)
+        elif name in ('mean', 'sum', 'std', 'min', 'max'):
+            out[name] = getattr(np, name)(flat, axis=1)
+        else:
+            raise ValueError(f"Unknown reduction {name!r}")
+    if percentiles:
+        pct = np.percentile(flat, percentiles, axis=1)
+        for q, row in zip(percentiles, np.atleast_2d(pct)):
+            out[f"p{q:g}"] = row
+    for name, mask in masks.items():
+        out[name] = flat[:, mask.ravel()].sum(axis=1)
+    return out
+
+
+@instrument.timed('stats.frame_reductions')
+def frame_reductions(cube, reductions=('median',), percentiles=(), masks=None,
+                     start=0, stop=None, chunk_frames=None, workers=None,
+                     executor='thread'):
+    """
+    Per-frame reductions over a cube, computed chunk by chunk.
+
+    cube is a path or an array (memmap or in memory).  masks maps a name to
+    a boolean (ny, nx) mask whose pixels are summed per frame, e.g. a
+    position-angle wedge.  executor='process' reopens the memmap in each
+    worker instead of sharing it across threads.
+
+    Returns a DataFrame indexed by frame number.
+    """
+    masks = {name: np.asarray(m, dtype=bool) for name, m in (masks or {}).items()}
+    pieces = map_chunks(cube, _reduce_chunk, (tuple(reductions), tuple(percentiles), masks),
+                        start=start, stop=stop, chunk_frames=chunk_frames, workers=workers,
+                        executor=executor)
+
+    if not pieces:
+        return pd.DataFrame(index=pd.RangeIndex(start, start, name='frame'))
+    columns = pieces[0][2].keys()
+    data = {c: np.concatenate([out[c] for _, _, out in pieces]) for c in columns}
+    return pd.DataFrame(data, index=pd.RangeIndex(start, pieces[-1][1], name='frame'))
+
+
+def frame_medians(cube, **kwargs):
+    """
+    Per-frame median, the CBI time series plotted in sunspot_time_series.py.
+    """
+    return frame_reductions(cube, ('median',), **kwargs)['median'].to_numpy()
@@ -11,93 +11,94 @@ import numpy as np
 import matplotlib.pyplot as plt
 from scipy.stats import linregress
 
+import config
+from cbi_catalog import load_catalog
+from flare_class import parse_flare_class
+from resample_stats import bootstrap, permutation_test
 
-dirname = '/Users/kfrench/Desktop/LASCO_CBI/'
-fname = 'cbi_wedge_40_sum.xlsx'
-f = dirname + fname
 
+if __name__ == '__main__':
+    f = config.path('cbi_file')
 
-orig_df = pd.read_excel(f)
-orig_df['Date'] = pd.to_datetime(orig_df['Date'])
-orig_df.rename(columns={'Corrected Velocity': 'Vel', 'Median Brightness': 'CBI'}, inplace=True)
 
+    orig_df = load_catalog(f, columns=['Date', 'Vel', 'CBI', 'Cls'])
 
-flare_intensities = np.zeros(len(orig_df), dtype='float')
-for idx, each_flare in enumerate(orig_df['Cls']):
-    fclass = each_flare[0]
-    mult = 10.0 if (fclass == 'X') else 1.0
-    fval = float(each_flare[1:])
-    flare_intensities[idx] = mult * fval
-orig_df['F_Intensity'] = flare_intensities
 
+    orig_df['F_Intensity'], n_bad_cls = parse_flare_class(orig_df['Cls'])  # W/m^2
 
-df = orig_df[orig_df['Vel'] > 0]
 
+    df = orig_df[orig_df['Vel'] > 0]
 
-mean_cbi = df['CBI'].mean()
-std_cbi = df['CBI'].std()
-mean_vel = df['Vel'].mean()
-std_vel = df['Vel'].std()
-sem_cbi = std_cbi / np.sqrt(len(df))
-sem_vel = std_vel / np.sqrt(len(df))
 
+    mean_cbi = df['CBI'].mean()
+    std_cbi = df['CBI'].std()
+    mean_vel = df['Vel'].mean()
+    std_vel = df['Vel'].std()
+    sem_cbi = std_cbi / np.sqrt(len(df))
+    sem_vel = std_vel / np.sqrt(len(df))
 
-slope, intercept, r_value, p_value, std_err = linregress(df['CBI'], df['Vel'])
 
+    slope, intercept, r_value, p_value, std_err = linregress(df['CBI'], df['Vel'])
 
-plt.figure(figsize=(8, 6))
+    # Bootstrap CI and permutation p-value
+    boot = bootstrap(df['CBI'], df['Vel'], n_replicates=10_000)
+    perm = permutation_test(df['CBI'], df['Vel'], n_replicates=10_000)
 
 
-plt.scatter(df['CBI'], df['Vel'], s=10, color='blue', alpha=0.3, zorder=2)
+    plt.figure(figsize=(8, 6))
 
 
-x_min, x_max = df['CBI'].min(), df['CBI'].max()
+    plt.scatter(df['CBI'], df['Vel'], s=10, color='blue', alpha=0.3, zorder=2)
 
 
-x_vals = np.array([x_min, x_max])
-y_vals = slope * x_vals + intercept
+    x_min, x_max = df['CBI'].min(), df['CBI'].max()
 
 
-plt.plot(x_vals, y_vals, color='red', linewidth=2, label='Regression Line')
+    x_vals = np.array([x_min, x_max])
+    y_vals = slope * x_vals + intercept
 
 
-plt.axvspan(mean_cbi - 2*sem_cbi, mean_cbi + 2*sem_cbi,
-            color='red', alpha=0.2, label='CBI ±2 SE')
-plt.axhspan(mean_vel - 2*sem_vel, mean_vel + 2*sem_vel,
-            color='blue', alpha=0.2, label='Velocity ±2 SE')
+    plt.plot(x_vals, y_vals, color='red', linewidth=2, label='Regression Line')
 
 
-x_vals = np.array([df['CBI'].min(), df['CBI'].max()])
-y_vals = intercept + slope * x_vals
-plt.plot(x_vals, y_vals, color='black', linestyle='-', label='Linear Fit')
+    plt.axvspan(mean_cbi - 2*sem_cbi, mean_cbi + 2*sem_cbi,
+                color='red', alpha=0.2, label='CBI ±2 SE')
+    plt.axhspan(mean_vel - 2*sem_vel, mean_vel + 2*sem_vel,
+                color='blue', alpha=0.2, label='Velocity ±2 SE')
 
 
-plt.xlabel("CBI Value (MSB)", fontsize=16)
-plt.ylabel("CME Velocity (km/s)", fontsize=16)
-plt.title("CME Velocity vs. CBI Value", fontsize=16)
+    x_vals = np.array([df['CBI'].min(), df['CBI'].max()])
+    y_vals = intercept + slope * x_vals
+    plt.plot(x_vals, y_vals, color='black', linestyle='-', label='Linear Fit')
 
 
-plt.xticks(fontsize=14)
-plt.yticks(fontsize=14)
+    plt.xlabel("CBI Value (MSB)", fontsize=16)
+    plt.ylabel("CME Velocity (km/s)", fontsize=16)
+    plt.title("CME Velocity vs. CBI Value", fontsize=16)
 
 
-stats_text = (
-    f"CBI Mean ± 2SE:\n{mean_cbi:.2f} ± {2*sem_cbi:.2f}\n\n"
-    f"Velocity Mean ± 2SE:\n{mean_vel:.1f} ± {2*sem_vel:.1f} km/s\n\n"
-    f"Fit: Vel = {slope:.2f}·CBI + {intercept:.1f}\n"
-    f"r = {r_value:.2f}, p = {p_value:.3f}"
-)
+    plt.xticks(fontsize=14)
+    plt.yticks(fontsize=14)
 
-plt.text(0.98, 0.98, stats_text,
-         transform=plt.gca().transAxes,
-         fontsize=12,
-         verticalalignment='top',
-         horizontalalignment='right',
-         bbox=dict(boxstyle='round,pad=0.4', facecolor='white', alpha=0.9))
 
+    stats_text = (
+        f"CBI Mean ± 2SE:\n{mean_cbi:.2f} ± {2*sem_cbi:.2f}\n\n"
+        f"Velocity Mean ± 2SE:\n{mean_vel:.1f} ± {2*sem_vel:.1f} km/s\n\n"
+        f"Fit: Vel = {slope:.2f}·CBI + {intercept:.1f}\n"
+        f"r = {r_value:.2f}, p = {p_value:.3f}\n"
+        f"r 95% CI [{boot['r_ci'][0]:.2f}, {boot['r_ci'][1]:.2f}], perm p = {perm['p_value']:.1e}"
+    )
 
-plt.legend(loc='upper left', fontsize=10, frameon=True)
-plt.grid(True, linestyle='--', linewidth=0.5)
-plt.tight_layout()
+    plt.text(0.98, 0.98, stats_text,
+             transform=plt.gca().transAxes,
+             fontsize=12,
+             verticalalignment='top',
+             horizontalalignment='right',
+             bbox=dict(boxstyle='round,pad=0.4', facecolor='white', alpha=0.9))
 
-plt.show()
+
+    plt.legend(loc='upper left', fontsize=10, frameon=True)
+    plt.grid(True, linestyle='--', linewidth=0.5)
+    plt.tight_layout()
+
+    plt.show()
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 21 13:52:17 2026
+
+@author: kfrench
+
+Position-angle wedge brightness from the CBI cube.
+
+    index = polar_index(cube.shape[1:], r_edges=(8, 20, 32))
+    tables = wedge_reductions(cube, np.arange(0, 360, 5), width=40,
+                              stats=('median', 'sum'), index=index)
+    tables['median']          # frames x wedge PA
+
+PolarIndex sorts the pixels inside r_edges once by (PA bin, radius bin).
+Each cell is then a contiguous run of flat pixel indices.  For a chunk of
+frames, one gather puts the pixels in that order:
+
+- Sums, means and counts: np.add.reduceat gives per-cell totals, and a
+  matrix product with the (PA bin x wedge) membership matrix gives every
+  wedge at once.
+- Medians: each frame is sorted once.  Rank histograms per PA bin
+  locate every wedge's middle rank, so no wedge is sorted on its own
+  (_wedge_medians).
+
+NaN pixels are ignored.  Wedge edges snap to the nearest pa_step.  Chunks
+of frames run on cbi_cube.map_chunks (thread or process pool).
+
+PA is measured counter-clockwise from solar north, taken as image up
+(row 0 at the top for origin='upper') and rotated by pa_offset degrees.
+The default centre is the middle of the frame.
+
+    python cbi_wedges.py --width 40 --random 1000 --stats median
+"""
+
+import argparse
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+import instrument
+from cbi_cube import CHUNK_BYTES, map_chunks, open_cube
+
+PA_STEP = 1.0
+# Width of the catalog's wedges (cbi_wedge_40_sum.xlsx)
+WEDGE_WIDTH = 40.0
+STATS = ('sum', 'mean', 'median', 'count')
+
+
+# === Index map ===
+class PolarIndex:
+    """
+    Flat pixel indices of an (ny, nx) frame grouped by position-angle and
+    radius bin.  Cell (p, r) holds pixels[cell_starts[k]:cell_starts[k + 1]]
+    with k = p * n_r + r.
+    """
+
+    def __init__(self, shape, center=None, r_edges=None, pa_step=PA_STEP, pa_offset=0.0,
+                 origin='upper'):
+        ny, nx = shape
+        cy, cx = ((ny - 1) / 2, (nx - 1) / 2) if center is None else center
+        r_edges = np.asarray((0.0, min(ny, nx) / 2) if r_edges is None else r_edges, dtype=float)
+        if r_edges.ndim != 1 or len(r_edges) < 2 or np.any(np.diff(r_edges) <= 0):
+            raise ValueError(f"r_edges must be increasing with at least two edges, got {r_edges}")
+        n_pa = int(round(360.0 / pa_step))
+        if n_pa < 1 or not np.isclose(n_pa * pa_step, 360.0):
+            raise ValueError(f"pa_step must divide 360 degrees, got {pa_step}")
+        if origin not in ('upper', 'lower'):
+            raise ValueError(f"origin must be 'upper' or 'lower', got {origin!r}")
+
+        y, x = np.indices(shape)
+        up = (cy - y) if origin == 'upper' else (y - cy)
+        dx = x - cx
+        r = np.hypot(dx, up).ravel()
+        # Counter-clockwise from north (up) through east (left)
+        pa = ((np.degrees(np.arctan2(-dx, up)) - pa_offset) % 360.0).ravel()
+
+        n_r = len(r_edges) - 1
+        rbin = np.searchsorted(r_edges, r, side='right') - 1
+        inside = np.flatnonzero((rbin >= 0) & (rbin < n_r))
+        pabin = np.floor(pa[inside] / pa_step).astype(np.int64) % n_pa
+        cells = pabin * n_r + rbin[inside]
+        order = np.argsort(cells, kind='stable')
+
+        self.shape = tuple(shape)
+        self.r_edges = r_edges
+        self.pa_step = float(pa_step)
+        self.n_pa, self.n_r = n_pa, n_r
+        self.pixels = inside[order]
+        self.pixel_rbin = rbin[self.pixels]
+        self.pixel_pabin = cells[order] // n_r
+        self.cell_starts = np.searchsorted(cells[order], np.arange(n_pa * n_r + 1))
+        self.counts = np.diff(self.cell_starts).reshape(n_pa, n_r)
+
+    def __repr__(self):
+        return (f"PolarIndex(shape={self.shape}, pixels={len(self.pixels)}, "
+                f"n_pa={self.n_pa}, r_edges={self.r_edges.tolist()})")
+
+    def _radii(self, r_bins):
+        selected = np.zeros(self.n_r, dtype=bool)
+        selected[slice(None) if r_bins is None else np.asarray(r_bins, dtype=int)] = True
+        return selected
+
+    def wedge_bins(self, pas, width=WEDGE_WIDTH):
+        """
+        First PA bin and number of bins of wedges centred on pas.
+        """
+        n_bins = int(round(width / self.pa_step))
+        if not 1 <= n_bins <= self.n_pa:
+            raise ValueError(f"Wedge width must be between {self.pa_step} and 360 degrees, "
+                             f"got {width}")
+        pas = np.atleast_1d(np.asarray(pas, dtype=float))
+        first = np.round((pas - width / 2) / self.pa_step).astype(np.int64) % self.n_pa
+        return first, n_bins
+
+    def membership(self, pas, width=WEDGE_WIDTH):
+        """
+        (n_pa, wedges) 0/1 matrix: PA bin p lies in wedge j.
+        """
+        first, n_bins = self.wedge_bins(pas, width)
+        rows = (first[None, :] + np.arange(n_bins)[:, None]) % self.n_pa
+        weights = np.zeros((self.n_pa, len(first)))
+        weights[rows, np.arange(len(first))[None, :]] = 1.0
+        return weights
+
+    def wedge_positions(self, pas, width=WEDGE_WIDTH, r_bins=None):
+        """
+        Positions into pixels of every wedge's pixels, as a (wedges,
+        max pixels) matrix padded with len(pixels).
+        """
+        first, n_bins = self.wedge_bins(pas, width)
+        keep = self._radii(r_bins)[self.pixel_rbin]
+        starts, n_r = self.cell_starts, self.n_r
+        members = []
+        for f in first:
+            stop = f + n_bins
+            lo, hi = starts[f * n_r], starts[min(stop, self.n_pa) * n_r]
+            pos = np.arange(lo, hi)
+            if stop > self.n_pa:
+                # Wedge wraps through PA 0
+                pos = np.concatenate([pos, np.arange(0, starts[(stop - self.n_pa) * n_r])])
+            members.append(pos[keep[pos]])
+        width_px = max((len(m) for m in members), default=0)
+        positions = np.full((len(members), width_px), len(self.pixels), dtype=np.int64)
+        for j, m in enumerate(members):
+            positions[j, :len(m)] = m
+        return positions
+
+    def wedge_mask(self, pa, width=WEDGE_WIDTH, r_bins=None):
+        """
+        Boolean (ny, nx) mask of one wedge, e.g. for cbi_cube.frame_reductions.
+        """
+        positions = self.wedge_positions([pa], width, r_bins)[0]
+        mask = np.zeros(self.shape[0] * self.shape[1], dtype=bool)
+        mask[self.pixels[positions[positions < len(self.pixels)]]] = True
+        return mask.reshape(self.shape)
+
+
+@lru_cache(maxsize=8)
+def polar_index(shape, center=None, r_edges=None, pa_step=PA_STEP, pa_offset=0.0,
+                origin='upper'):
+    """
+    PolarIndex for a frame geometry, built once per process.  Arguments
+    must be hashable (tuples for center and r_edges).
+    """
+    return PolarIndex(tuple(shape), center, r_edges, pa_step, pa_offset, origin)
+
+
+def random_pas(n, seed=None):
+    """
+    n wedge centres drawn uniformly in [0, 360), for null tests.
+    """
+    return np.random.default_rng(seed).uniform(0.0, 360.0, n)
+
+
+# === Reductions ===
+def _by_pa(values, index, radii):
+    """
+    Per-PA-bin totals over the selected radius bins, (frames, n_pa).
+    """
+    nonempty = index.counts.ravel() > 0
+    totals = np.zeros((len(values), index.n_pa * index.n_r))
+    if nonempty.any():
+        totals[:, nonempty] = np.add.reduceat(values, index.cell_starts[:-1][nonempty], axis=1)
+    return totals.reshape(len(values), index.n_pa, index.n_r)[:, :, radii].sum(axis=2)
+
+
+def _rank_block(n_pixels):
+    return max(1, int(np.sqrt(n_pixels)))
+
+
+def _wedge_medians(px, pabin, n_pa, first, n_bins):
+    """
+    Median of every wedge in every frame without sorting each wedge.
+
+    Each frame's pixels are sorted once.  Counting the sorted pixels per
+    (PA bin, block of ranks) and taking prefix sums over PA gives, for
+    every wedge, the block of ranks that holds its middle pixel; only that
+    block is scanned.  Work per frame is about wedges x 2 sqrt(pixels).
+    """
+    n_f, n_px = px.shape
+    if not n_px:
+        return np.full((n_f, len(first)), np.nan)
+    order = np.argsort(px, axis=1)
+    # NaN sorts last, so the valid pixels are a prefix of each row
+    values = np.take_along_axis(px, order, axis=1)
+    n_valid = np.sum(~np.isnan(values), axis=1)
+
+    block = _rank_block(n_px)
+    n_blocks = -(-n_px // block)
+    # PA bin of each sorted pixel; n_pa marks NaN and padding, which no
+    # wedge contains
+    pa_type = np.int16 if n_pa < np.iinfo(np.int16).max else np.int32
+    pa = np.full((n_f, n_blocks * block), n_pa, dtype=pa_type)
+    pa[:, :n_px] = pabin[order]
+    pa[np.arange(n_blocks * block) >= n_valid[:, None]] = n_pa
+
+    # Sorted pixels per (frame, PA bin, rank block), cumulative over blocks
+    cell = (np.arange(n_f)[:, None] * (n_pa + 1) + pa) * n_blocks + np.arange(n_blocks * block) // block
+    counts = np.bincount(cell.ravel(), minlength=n_f * (n_pa + 1) * n_blocks)
+    below = np.cumsum(counts.reshape(n_f, n_pa + 1, n_blocks)[:, :n_pa], axis=2, dtype=np.int32)
+    # Prefix over PA bins; wedges through PA 0 add the wrapped part
+    prefix = np.zeros((n_f, n_pa + 1, n_blocks), dtype=np.int32)
+    np.cumsum(below, axis=1, out=prefix[:, 1:])
+    last = first + n_bins
+    wedge_below = prefix[:, np.minimum(last, n_pa)] - prefix[:, first]
+    wraps = last > n_pa
+    wedge_below[:, wraps] += prefix[:, last[wraps] - n_pa]
+    n = wedge_below[:, :, -1]
+
+    lo_bin = first.astype(pa_type)[None, :, None]
+    hi_bin = np.minimum(last, n_pa).astype(pa_type)[None, :, None]
+    wrap_bin = (last - n_pa).astype(pa_type)[None, :, None]
+    frames = np.arange(n_f)[:, None]
+    pa_blocks = pa.reshape(n_f, n_blocks, block)
+
+    def select(k):
+        # k-th smallest (0-based) member of each wedge
+        b = np.minimum(np.sum(wedge_below <= k[..., None], axis=2), n_blocks - 1)
+        before = np.take_along_axis(wedge_below, np.maximum(b - 1, 0)[..., None], axis=2)[..., 0]
+        before = np.where(b > 0, before, 0)
+        candidates = pa_blocks[frames, b]
+        member = ((candidates >= lo_bin) & (candidates < hi_bin)) | (candidates < wrap_bin)
+        offset = np.argmax(np.cumsum(member, axis=2, dtype=np.int32) > (k - before)[..., None],
+                           axis=2)
+        return values[frames, np.minimum(b * block + offset, n_px - 1)]
+
+    lo = select((n - 1) // 2).astype(np.float64)
+    hi = select(n // 2).astype(np.float64)
+    return np.where(n > 0, (lo + hi) / 2, np.nan)
+
+
+def _wedge_chunk(chunk, index, weights, first, n_bins, radii, stats):
+    flat = chunk.reshape(len(chunk), -1)
+    px = flat[:, index.pixels]
+    if not np.issubdtype(px.dtype, np.floating):
+        px = px.astype(np.float64)
+
+    out = {}
+    if {'sum', 'mean', 'count'} & set(stats):
+        valid = ~np.isnan(px)
+        total = _by_pa(np.where(valid, px, 0.0).astype(np.float64), index, radii) @ weights
+        count = _by_pa(valid.astype(np.float64), index, radii) @ weights
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out.update(sum=total, count=count, mean=total / count)
+    if 'median' in stats:
+        keep = radii[index.pixel_rbin]
+        out['median'] = _wedge_medians(px[:, keep], index.pixel_pabin[keep], index.n_pa,
+                                       first, n_bins)
+    return {name: out[name] for name in stats}
+
+
+@instrument.timed('stats.wedge_reductions')
+def wedge_reductions(cube, pas, width=WEDGE_WIDTH, stats=('median',), index=None, r_bins=None,
+                     start=0, stop=None, chunk_frames=None, workers=None, executor='thread'):
+    """
+    Sum, mean, median or count of the pixels in wedges of the given width
+    centred on each PA in pas, for every frame.
+
+    cube is a path or an array.  index defaults to polar_index() of the
+    frame shape.  r_bins limits the wedges to some radius bins of the
+    index.  Frames run in chunks on cbi_cube.map_chunks; executor='process'
+    needs the cube path.
+
+    Returns {stat: DataFrame indexed by frame, one column per PA}.
+    """
+    unknown = set(stats) - set(STATS)
+    if unknown:
+        raise ValueError(f"Unknown wedge statistics {sorted(unknown)}, expected some of {STATS}")
+    arr = open_cube(cube) if isinstance(cube, (str, os.PathLike)) else cube
+    index = polar_index(arr.shape[1:]) if index is None else index
+    if index.shape != tuple(arr.shape[1:]):
+        raise ValueError(f"Index built for {index.shape} frames, cube has {arr.shape[1:]}")
+    pas = np.atleast_1d(np.asarray(pas, dtype=float))
+    weights = index.membership(pas, width)
+    first, n_bins = index.wedge_bins(pas, width)
+    radii = index._radii(r_bins)
+
+    if chunk_frames is None:
+        n_px = len(index.pixels)
+        frame_bytes = 8 * 4 * n_px
+        if 'median' in stats:
+            # Rank-block counts per PA bin and per wedge, and the scanned blocks
+            n_blocks = -(-n_px // _rank_block(n_px))
+            frame_bytes += 8 * (3 * index.n_pa * n_blocks + 2 * len(pas) * n_blocks
+                                + 4 * len(pas) * _rank_block(n_px))
+        chunk_frames = max(1, CHUNK_BYTES // frame_bytes)
+    pieces = map_chunks(cube, _wedge_chunk, (index, weights, first, n_bins, radii, tuple(stats)),
+                        start=start, stop=stop, chunk_frames=chunk_frames, workers=workers,
+                        executor=executor)
+
+    end = pieces[-1][1] if pieces else start
+    frames = pd.RangeIndex(start, end, name='frame')
+    columns = pd.Index(pas, name='pa')
+    tables = {}
+    for name in stats:
+        data = (np.concatenate([out[name] for _, _, out in pieces]) if pieces
+                else np.empty((0, len(pas))))
+        tables[name] = pd.DataFrame(data, index=frames, columns=columns)
+    return tables
+
+
+def wedge_series(cube, pa, width=WEDGE_WIDTH, stat='median', **kwargs):
+    """
+    One wedge's statistic per frame, as an array.
+    """
+    return wedge_reductions(cube, [pa], width, (stat,), **kwargs)[stat].iloc[:, 0].to_numpy()
+
+
+if __name__ == '__main__':
+    import config
+
+    parser = argparse.ArgumentParser(description='Wedge statistics of the CBI cube.')
+    parser.add_argument('--pas', type=float, nargs='+', default=[0.0, 90.0, 180.0, 270.0])
+    parser.add_argument('--random', type=int, metavar='N', help='N random wedge PAs instead')
+    parser.add_argument('--width', type=float, default=WEDGE_WIDTH)
+    parser.add_argument('--stats', nargs='+', default=['median'], choices=STATS)
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args()
+
+    pas = random_pas(args.random, seed=0) if args.random else args.pas
+    tables = wedge_reductions(config.path('cube_file'), pas, args.width, tuple(args.stats),
+                              workers=args.workers)
+    for name, table in tables.items():
+        print(name)
+        print(table.describe().T.to_string())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 10:05:17 2026
+
+@author: kfrench
+
+Data paths and database settings.
+
+Defaults are the paths the scripts have always used.  They can be
+overridden by an INI file (astrostats.ini in the working directory, or the
+file named by $ASTROSTATS_CONFIG) and then by environment variables named
+ASTROSTATS_<KEY>, e.g. ASTROSTATS_SWAN_DB=/data/swan_preprocess.db.
+
+    [paths]
+    swan_db = /data/swan/swan_preprocess.db
+
+    [sqlite]
+    pool_size = 8
+    immutable = true
+"""
+
+import configparser
+import os
+
+DEFAULTS = {
+    'paths': {
+        'cbi_file': '/Users/kfrench/Desktop/LASCO_CBI/cbi_wedge_40_sum.xlsx',
+        'cbi_ar_file': '/Users/kfrench/Desktop/LASCO_CBI/cbi_wedge_40_sum_markedAR.xlsx',
+        'swan_db': '/Users/kfrench/Desktop/swan/swan_preprocess.db',
+        'swan_cbi_db': '/Users/kfrench/Desktop/swan/swan_preprocess_cbi.db',
+        'cube_file': '/Users/kfrench/Desktop/LASCO_CBI/cbi_interp_may2023.npy',
+        'dates_file': '/Users/kfrench/Desktop/LASCO_CBI/cbi_dates_interp_Nov2022_rev.npy',
+        'cache_dir': os.path.join(os.path.expanduser('~'), '.cache', 'astrostats'),
+        'match_db': os.path.join('%(cache_dir)s', 'cbi_sharp_matches.db'),
+        'result_cache_dir': os.path.join('%(cache_dir)s', 'results'),
+    },
+    'sqlite': {
+        'pool_size': '4',
+        'mmap_size': str(1024 ** 3),
+        # Negative cache_size is in KiB
+        'cache_size': str(-256 * 1024),
+        'immutable': 'false',
+        # Seconds to wait for a free pooled connection before raising
+        'pool_timeout': '60',
+        # Rows per fetchmany() in sharp_stream.py
+        'chunk_rows': '65536',
+    },
+    'cache': {
+        # result_cache.py: pickles on disk, LRU-evicted above result_cache_mb
+        'result_cache': 'true',
+        'result_cache_mb': '2048',
+        'memo_entries': '32',
+    },
+    'trace': {
+        # off | log | chrome
+        'trace': 'off',
+        # {pid} keeps concurrent runs from overwriting each other's trace
+        'trace_file': 'astrostats_trace.{pid}.json',
+        # off | cprofile | tracemalloc, for stages matching profile_stages
+        'profile': 'off',
+        'profile_stages': '*',
+        'profile_dir': 'profiles',
+    },
+}
+
+CONFIG_FILE = 'astrostats.ini'
+
+_config = None
+
+
+def load(path=None):
+    """
+    (Re)load the configuration.  path overrides $ASTROSTATS_CONFIG and
+    ./astrostats.ini.
+    """
+    global _config
+    parser = configparser.ConfigParser()
+    parser.read_dict(DEFAULTS)
+    path = path or os.environ.get('ASTROSTATS_CONFIG') or CONFIG_FILE
+    parser.read(os.path.expanduser(path))
+
+    for section in parser.sections():
+        for key in parser[section]:
+            env = os.environ.get(f"ASTROSTATS_{key.upper()}")
+            if env is not None:
+                parser[section][key] = env
+    _config = parser
+    return parser
+
+
+def get_config():
+    return _config if _config is not None else load()
+
+
+def path(name):
+    """
+    Configured path for a data file, e.g. path('swan_db').
+    """
+    return os.path.expanduser(get_config()['paths'][name])
+
+
+def paths():
+    return {key: path(key) for key in get_config()['paths']}
+
+
+def sqlite_settings():
+    section = get_config()['sqlite']
+    return {
+        'pool_size': section.getint('pool_size'),
+        'mmap_size': section.getint('mmap_size'),
+        'cache_size': section.getint('cache_size'),
+        'immutable': section.getboolean('immutable'),
+        'pool_timeout': section.getfloat('pool_timeout'),
+        'chunk_rows': section.getint('chunk_rows'),
+    }
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 09:12:44 2026
+
+@author: kfrench
+
+Decimation of long SHARP time series for plotting.
+
+Reduces a series to about the pixel width of the axes before it goes to
+ax.plot, keeping peaks:
+
+  minmax  - per pixel-wide time bucket keep the min and max sample (exact
+            visual envelope, vectorized with reduceat)
+  lttb    - Largest-Triangle-Three-Buckets, one representative point per
+            equal-count bucket
+
+Only the plotted line is decimated; statistics should keep using the
+full-resolution data.  attach() re-decimates the visible slice whenever the
+x range of an interactive plot changes.
+"""
+
+import numpy as np
+
+METHODS = ('minmax', 'lttb')
+
+
+def _as_float(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').astype(np.int64).astype(float)
+    return x.astype(float)
+
+
+def minmax_indices(x, y, n_buckets):
+    """
+    Indices of the min and max y in each of n_buckets equal-width x
+    buckets (x sorted).  Returns sorted unique indices, at most
+    2 * n_buckets of them.
+    """
+    n = len(x)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+    xf = _as_float(x)
+    edges = np.linspace(xf[0], xf[-1], n_buckets + 1)
+    starts = np.searchsorted(xf, edges[:-1], side='left')
+    starts = np.unique(starts[starts < n])
+    bucket = np.searchsorted(starts, np.arange(n), side='right') - 1
+
+    y = np.asarray(y, dtype=float)
+    mins = np.minimum.reduceat(y, starts)
+    maxs = np.maximum.reduceat(y, starts)
+    # First sample hitting the bucket min / max
+    keep = []
+    for target in (mins, maxs):
+        cand = np.flatnonzero(y == target[bucket])
+        _, first = np.unique(bucket[cand], return_index=True)
+        keep.append(cand[first])
+    return np.unique(np.concatenate(keep + [[0, n - 1]]))
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: n_out indices (first and last always
+    kept).  Each step is vectorized over one bucket.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    xf = _as_float(x)
+    y = np.asarray(y, dtype=float)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    out = np.empty(n_out, dtype=np.intp)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point)
+        if i + 2 < len(edges):
+            nlo, nhi = edges[i + 1], edges[i + 2]
+            cx, cy = xf[nlo:nhi].mean(), y[nlo:nhi].mean()
+        else:
+            cx, cy = xf[-1], y[-1]
+        bx, by = xf[lo:hi], y[lo:hi]
+        area = np.abs((xf[a] - cx) * (by - y[a]) - (xf[a] - bx) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def decimate_indices(x, y, n_out=2000, method='minmax'):
+    if method == 'minmax':
+        return minmax_indices(x, y, max(1, n_out // 2))
+    if method == 'lttb':
+        return lttb_indices(x, y, n_out)
+    raise ValueError(f"Unknown method {method!r}, expected one of {METHODS}")
+
+
+def decimate(x, y, n_out=2000, method='minmax'):
+    """
+    Decimated (x, y) for plotting.  NaN y values are dropped first; x must
+    be sorted.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    ok = np.isfinite(y)
+    if not ok.all():
+        x, y = x[ok], y[ok]
+    idx = decimate_indices(x, y, n_out, method)
+    return x[idx], y[idx]
+
+
+def pixel_width(ax):
+    return max(2, int(round(ax.bbox.width)))
+
+
+class DecimatedSeries:
+    """
+    Full-resolution series that hands out decimated views of an x range.
+    The last view is cached, so redraws without a range change are free.
+    """
+
+    def __init__(self, x, y, method='minmax'):
+        x = np.asarray(x)
+        y = np.asarray(y, dtype=float)
+        ok = np.isfinite(y)
+        self.x, self.y = x[ok], y[ok]
+        self.xf = _as_float(self.x)
+        self.method = method
+        self._last = None
+
+    def view(self, lo=None, hi=None, n_out=2000):
+        i0 = 0 if lo is None else max(np.searchsorted(self.xf, lo, 'left') - 1, 0)
+        i1 = len(self.xf) if hi is None else min(np.searchsorted(self.xf, hi, 'right') + 1,
+                                                 len(self.xf))
+        key = (i0, i1, n_out)
+        if self._last is None or self._last[0] != key:
+            idx = i0 + decimate_indices(self.x[i0:i1], self.y[i0:i1], n_out, self.method)
+            self._last = (key, (self.x[idx], self.y[idx]))
+        return self._last[1]
+
+
+def plot_decimated(ax, x, y, *args, method='minmax', n_out=None, live=True, **kwargs):
+    """
+    ax.plot() of a decimated series.  With live=True the line is
+    re-decimated from full resolution whenever the x range changes.
+    """
+    series = DecimatedSeries(x, y, method)
+    n_out = n_out or 2 * pixel_width(ax)
+    line, = ax.plot(*series.view(n_out=n_out), *args, **kwargs)
+    if live:
+        attach(ax, line, series, n_out)
+    return line
+
+
+def attach(ax, line, series, n_out=None):
+    """
+    Re-decimate line from series on every xlim change of ax.
+    """
+    import matplotlib.dates as mdates
+
+    is_date = np.issubdtype(series.x.dtype, np.datetime64)
+
+    def on_xlim(axes):
+        lo, hi = axes.get_xlim()
+        if is_date:
+            lo, hi = (_as_float(np.array([mdates.num2date(v).replace(tzinfo=None) for v in (lo, hi)],
+                                         dtype='datetime64[ns]')))
+        line.set_data(*series.view(lo, hi, n_out or 2 * pixel_width(axes)))
+
+    ax.callbacks.connect('xlim_changed', on_xlim)
+    return on_xlim
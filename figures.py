@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 16:52:30 2026
+
+@author: kfrench
+
+Figure builders for the CBI analyses, written against the object-oriented
+matplotlib API (Figure / Axes, no pyplot state) so they can be rendered
+headless and in parallel by render_figures.py.
+
+Each builder takes input paths plus plain keyword parameters and returns a
+matplotlib.figure.Figure.  The layouts follow the standalone scripts.
+"""
+
+import numpy as np
+from matplotlib.figure import Figure
+import matplotlib.dates as mdates
+from scipy.stats import linregress
+
+from cbi_catalog import load_catalog
+
+
+def sharp_scatter(cbi_file, swan_db, keyword='MEANPOT', xlabel=None, color='darkgreen',
+                  time_window_hours=6, agg='max'):
+    """
+    CBI vs a windowed SHARP keyword with a log-linear fit
+    (cbi_meanpot.py, cbi_totbsq.py).
+    """
+    from matched_events import matched
+
+    df = load_catalog(cbi_file, columns=['Date', 'Vel', 'CBI'])
+    df = df[df['Vel'] > 0].copy()
+    df[keyword] = matched(df, swan_db, keyword, time_window_hours, agg=agg)
+    df = df[df[keyword] > 0]
+
+    fig = Figure(figsize=(8, 6))
+    ax = fig.subplots()
+    ax.scatter(df[keyword], df['CBI'], color=color, alpha=0.5, s=15)
+    ax.set_xlabel(xlabel or keyword, fontsize=14)
+    ax.set_ylabel("CBI (MSB)", fontsize=14)
+    ax.set_title(f"CBI vs. {keyword}", fontsize=16)
+    ax.set_xscale('log')
+    ax.grid(True, which='both', linestyle='--', linewidth=0.5)
+
+    slope, intercept, r_value, p_value, _ = linregress(np.log10(df[keyword]), df['CBI'])
+    x_vals = np.logspace(np.log10(df[keyword].min()), np.log10(df[keyword].max()), 100)
+    ax.plot(x_vals, slope * np.log10(x_vals) + intercept, color='black',
+            label=f"Log-Linear Fit: r={r_value:.2f}, p={p_value:.3f}")
+    ax.legend()
+    fig.tight_layout()
+    return fig
+
+
+def sharp_timeseries(swan_db, spec='USFLUX', ylabel=None, color='tab:red', title=None):
+    """
+    Twin-axis time series of CBI and a SHARP spec with the Pearson r box
+    (cbi_swan_log.py, cbi_current_ratio_timeseries.py,
+    cbi_meanpot_time_series.py).
+    """
+    from sharp_timeseries import load_frame, correlate
+    from decimate import plot_decimated
+
+    # Lines are decimated to the pixel width; the r box uses every sample
+    df = load_frame(swan_db, [spec])
+
+    fig = Figure(figsize=(12, 6))
+    ax1 = fig.subplots()
+    color_cbi = 'tab:blue'
+    ax1.set_xlabel("Date", fontsize=14)
+    ax1.set_ylabel("CBI (MSB)", color=color_cbi, fontsize=14)
+    plot_decimated(ax1, df['Timestamp'], df['CBI'], color=color_cbi, linestyle='-', alpha=0.6,
+                   label='CBI', live=False)
+    ax1.tick_params(axis='y', labelcolor=color_cbi)
+
+    ax2 = ax1.twinx()
+    ax2.set_ylabel(ylabel or spec, color=color, fontsize=14)
+    plot_decimated(ax2, df['Timestamp'], df[spec], color=color, linestyle='--', alpha=0.6,
+                   label=spec, live=False)
+    ax2.tick_params(axis='y', labelcolor=color)
+
+    ax1.xaxis.set_major_locator(mdates.MonthLocator(interval=3))
+    ax1.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m'))
+    fig.autofmt_xdate()
+
+    ax1.grid(True, axis='y', linestyle='--', alpha=0.3)
+    lines1, labels1 = ax1.get_legend_handles_labels()
+    lines2, labels2 = ax2.get_legend_handles_labels()
+    ax1.legend(lines1 + lines2, labels1 + labels2,
+               loc='upper right', fontsize=11,
+               framealpha=0.85, facecolor='white', edgecolor='gray')
+
+    stats = correlate(df, 'CBI', [spec]).iloc[0]
+    ax1.text(0.02, 0.98, f"Pearson r = {stats['r']:.2f} (p = {stats['p']:.2e})",
+             transform=ax1.transAxes, fontsize=11, va='top', ha='left',
+             bbox=dict(boxstyle='round', facecolor='white', alpha=0.85))
+
+    fig.suptitle(title or f"Time Series of CBI and {spec}", fontsize=16)
+    fig.tight_layout()
+    return fig
+
+
+def velocity_scatter(cbi_file, drop_zero_vel=False):
+    """
+    CME velocity vs CBI with the linear fit and +/-2 SE bands
+    (cbi_scatter_stats.py, cbi_scatter_no_zeros.py).
+    """
+    df = load_catalog(cbi_file, columns=['Date', 'Vel', 'CBI'])
+    if drop_zero_vel:
+        df = df[df['Vel'] > 0]
+
+    mean_cbi, mean_vel = df['CBI'].mean(), df['Vel'].mean()
+    sem_cbi = df['CBI'].std() / np.sqrt(len(df))
+    sem_vel = df['Vel'].std() / np.sqrt(len(df))
+    slope, intercept, r_value, p_value, std_err = linregress(df['CBI'], df['Vel'])
+
+    fig = Figure(figsize=(8, 6))
+    ax = fig.subplots()
+    ax.scatter(df['CBI'], df['Vel'], s=10, color='blue', alpha=0.3, label='All Events', zorder=2)
+    ax.axvspan(mean_cbi - 2*sem_cbi, mean_cbi + 2*sem_cbi,
+               color='red', alpha=0.2, label='CBI ±2 SE')
+    ax.axhspan(mean_vel - 2*sem_vel, mean_vel + 2*sem_vel,
+               color='blue', alpha=0.2, label='Velocity ±2 SE')
+    x_vals = np.array([df['CBI'].min(), df['CBI'].max()])
+    ax.plot(x_vals, intercept + slope * x_vals, color='black', linestyle='-', linewidth=2,
+            label='Linear Fit')
+
+    ax.set_xlabel("CBI Value (MSB)", fontsize=16)
+    ax.set_ylabel("CME Velocity (km/s)", fontsize=16)
+    ax.set_title("CME Velocity vs. CBI Value", fontsize=16)
+    ax.tick_params(labelsize=14)
+
+    stats_text = (
+        f"CBI Mean ± 2SE:\n{mean_cbi:.2f} ± {2*sem_cbi:.2f}\n\n"
+        f"Velocity Mean ± 2SE:\n{mean_vel:.1f} ± {2*sem_vel:.1f} km/s\n\n"
+        f"Fit: Vel = {slope:.2f}·CBI + {intercept:.1f}\n"
+        f"Slope SE = {std_err:.2f}, r = {r_value:.2f}, p = {p_value:.3f}"
+    )
+    ax.text(0.98, 0.98, stats_text, transform=ax.transAxes, fontsize=12,
+            verticalalignment='top', horizontalalignment='right',
+            bbox=dict(boxstyle='round,pad=0.4', facecolor='white', alpha=0.9))
+
+    ax.legend(loc='upper left', fontsize=10, frameon=True)
+    ax.grid(True, linestyle='--', linewidth=0.5)
+    fig.tight_layout()
+    return fig
+
+
+def phase_grid(cbi_file, phases='MIN_MAX_PHASES'):
+    """
+    2x2 grid of velocity vs CBI per solar-cycle phase (cbi_min_max.py).
+    """
+    import solar_phases
+
+    phases = getattr(solar_phases, phases)[:4]
+    df = load_catalog(cbi_file, columns=['Date', 'Vel', 'CBI'])
+    df = df[(df['Vel'] > 0) & (df['CBI'] > 0)].copy()
+    df['phase'] = solar_phases.assign_phases(df['Date'], phases)
+    summary = solar_phases.phase_stats(df, phases)
+    groups = dict(tuple(df.groupby('phase', observed=True)))
+
+    fig = Figure(figsize=(12, 10))
+    axs = fig.subplots(2, 2, sharex=True, sharey=True)
+    for (title, _, _), ax in zip(phases, axs.flat):
+        df_phase = groups.get(title, df.iloc[:0])
+        stats = summary.loc[title]
+        ax.scatter(df_phase['CBI'], df_phase['Vel'], s=20)
+        ax.set_title(f"{title} (N={stats['N']:.0f})", fontsize=14)
+        ax.grid(True)
+        textstr = (
+            f"CBI μ={stats['CBI mean']:.2e}, med={stats['CBI median']:.2e}\n"
+            f"Vel μ={stats['Vel mean']:.1f} km/s, med={stats['Vel median']:.1f}"
+        )
+        ax.text(0.98, 0.78, textstr, transform=ax.transAxes,
+                fontsize=10, va='top', ha='right',
+                bbox=dict(boxstyle='round,pad=0.4', facecolor='white', alpha=0.8))
+    for ax in axs[1, :]:
+        ax.set_xlabel("CBI Value (MSB)", fontsize=12)
+    for ax in axs[:, 0]:
+        ax.set_ylabel("CME Velocity (km/s)", fontsize=12)
+
+    fig.tight_layout(rect=[0, 0, 1, 0.96])
+    fig.suptitle("CME Velocity vs CBI During Solar Minimum and Maximum (by Cycle)",
+                 fontsize=16, y=0.995)
+    return fig
+
+
+def cbi_sunspots(cube_file, dates_file, sunspot_file=None, skip=100):
+    """
+    CBI median series and monthly sunspot number (sunspot_time_series.py).
+    sunspot_file is a cached SILSO .npz (sunspots.cache_file()); by default
+    the monthly series comes from sunspots.get_sunspots().
+    """
+    import pandas as pd
+    from cbi_cube import frame_medians
+    from sunspots import get_sunspots
+
+    dates = np.load(dates_file, allow_pickle=True)
+    cbi_ts = frame_medians(cube_file, start=skip)
+    sunspots = get_sunspots('monthly', start=pd.to_datetime(dates[skip]),
+                            end=pd.to_datetime(dates[-1]), data_file=sunspot_file)
+
+    fig = Figure(figsize=(10, 5))
+    ax1 = fig.subplots()
+    ax1.plot(dates[skip:], cbi_ts, color='steelblue', label='CBI')
+    ax1.set_xlabel("Year")
+    ax1.set_ylabel("Mean Solar Brightness (CBI)", color='steelblue')
+    ax1.tick_params(axis='y', labelcolor='steelblue')
+
+    ax2 = ax1.twinx()
+    ax2.plot(sunspots['date'], sunspots['sunspot_number'], color='indianred', alpha=0.7,
+             label='Sunspot Number')
+    ax2.set_ylabel("Monthly Sunspot Number", color='indianred')
+    ax2.tick_params(axis='y', labelcolor='indianred')
+
+    ax1.set_title('Coronal Brightness Index and Sunspot Number Time Series')
+    ax1.grid(True)
+    fig.tight_layout()
+    return fig
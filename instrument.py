@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 16:40:12 2026
+
+@author: kfrench
+
+Stage timers and counters for the analysis pipeline.
+
+    with instrument.stage('match.window_join', keyword='MEANPOT'):
+        ...
+    instrument.count('rows', len(rows))
+
+    @instrument.timed('stats.bootstrap')
+    def bootstrap(...): ...
+
+Each stage records its wall time, the change in every counter while it
+ran (rows, queries, bytes_read, ...) and the process peak RSS.  Finished
+stages go to the 'instrument' logger as one JSON object per line
+(trace = log) or to a Chrome trace file (trace = chrome) that
+chrome://tracing and Perfetto open.  With trace = off, stage() returns a
+shared no-op context and count() returns immediately.
+
+Process pools pass **instrument.pool_kwargs() to ProcessPoolExecutor.
+Workers never run atexit, so each one appends its events to a
+'<trace_file>.<worker pid>.part' file whenever a top-level stage
+finishes, and the parent merges and removes those files when it writes
+its own trace.  '{pid}' in trace_file is the parent's process id.
+
+profile = cprofile | tracemalloc additionally captures the stages that
+match profile_stages (fnmatch pattern): a .prof file per stage in
+profile_dir, or the stage's peak traced memory and top allocation sites.
+
+Settings come from the [trace] section of config.py, e.g.
+
+    ASTROSTATS_TRACE=chrome ASTROSTATS_PROFILE=cprofile python cbi_meanpot.py
+"""
+
+import atexit
+import fnmatch
+import functools
+import glob
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+import config
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger('instrument')
+
+MODES = ('off', 'log', 'chrome')
+PROFILERS = ('off', 'cprofile', 'tracemalloc')
+TOP_ALLOCATIONS = 10
+
+_settings = None
+_counters = {}
+_events = []
+_lock = threading.Lock()
+_local = threading.local()
+_t0 = time.perf_counter()
+_seq = 0
+# Process id of the parent when this is a pool worker, else None
+_parent = None
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullStage()
+
+
+def enabled():
+    return _settings is not None
+
+
+def configure(trace=None, trace_file=None, profile=None, profile_stages=None, profile_dir=None):
+    """
+    (Re)configure from the [trace] config section; arguments override it.
+    """
+    global _settings
+    section = config.get_config()['trace']
+    trace = trace or section.get('trace')
+    profile = profile or section.get('profile')
+    if trace not in MODES:
+        raise ValueError(f"Unknown trace mode {trace!r}, expected one of {MODES}")
+    if profile not in PROFILERS:
+        raise ValueError(f"Unknown profiler {profile!r}, expected one of {PROFILERS}")
+    if trace == 'off':
+        _settings = None
+        return
+    if trace == 'log' and not logger.handlers and not logging.getLogger().handlers:
+        logger.addHandler(logging.StreamHandler())
+        logger.setLevel(logging.INFO)
+    _settings = {
+        'trace': trace,
+        'trace_file': os.path.expanduser(trace_file or section.get('trace_file')),
+        'profile': profile,
+        'profile_stages': profile_stages or section.get('profile_stages'),
+        'profile_dir': os.path.expanduser(profile_dir or section.get('profile_dir')),
+    }
+
+
+def disable():
+    global _settings
+    _settings = None
+
+
+# === Counters ===
+def count(name, n=1):
+    """
+    Add n to a counter.  Free when tracing is off.
+    """
+    if _settings is None:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def counters():
+    with _lock:
+        return dict(_counters)
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process so far, in MiB.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, KiB on Linux
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+# === Stages ===
+class _Stage:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.settings = _settings
+        self.profiler = None
+        self.tracing = False
+        self.started_tracing = False
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        self.depth = len(stack)
+        stack.append(self.name)
+        self.before = counters()
+        if self.settings['profile'] != 'off' and fnmatch.fnmatch(self.name, self.settings['profile_stages']):
+            self._start_profile()
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.t0
+        extra = self._stop_profile() if (self.profiler or self.tracing) else {}
+        _local.stack.pop()
+        after = counters()
+        delta = {k: v - self.before.get(k, 0) for k, v in after.items() if v != self.before.get(k, 0)}
+        record = {
+            'stage': self.name,
+            'seconds': round(elapsed, 6),
+            'depth': self.depth,
+            **delta,
+            'peak_rss_mb': peak_rss_mb(),
+            **self.args,
+            **extra,
+        }
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        _emit(self.settings, record, self.t0, elapsed)
+        if _parent is not None and self.depth == 0 and self.settings['trace'] == 'chrome':
+            _flush_worker()
+        return False
+
+    # --- profiling ---
+    def _start_profile(self):
+        if self.settings['profile'] == 'cprofile':
+            import cProfile
+
+            self.profiler = cProfile.Profile()
+            try:
+                self.profiler.enable()
+            except ValueError:
+                # Another stage (or tool) is already profiling this thread
+                self.profiler = None
+        else:
+            import tracemalloc
+
+            self.started_tracing = not tracemalloc.is_tracing()
+            if self.started_tracing:
+                tracemalloc.start()
+            self.tracing = True
+
+    def _stop_profile(self):
+        global _seq
+        if self.profiler is not None:
+            self.profiler.disable()
+            with _lock:
+                _seq += 1
+                seq = _seq
+            os.makedirs(self.settings['profile_dir'], exist_ok=True)
+            path = os.path.join(self.settings['profile_dir'], f"{self.name}-{os.getpid()}-{seq}.prof")
+            self.profiler.dump_stats(path)
+            return {'profile': path}
+
+        import tracemalloc
+
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        top = [f"{s.traceback[0].filename}:{s.traceback[0].lineno} {s.size / 1024:.0f} KiB"
+               for s in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]]
+        if self.started_tracing:
+            tracemalloc.stop()
+        # Nested stages report the peak since the outermost capture began
+        return {'traced_peak_mb': peak / 1024 ** 2, 'top_allocations': top}
+
+
+def stage(name, **args):
+    """
+    Context manager timing one stage.  Keyword arguments are recorded with
+    it (keep them small and JSON-friendly).
+    """
+    if _settings is None:
+        return _NULL
+    return _Stage(name, args)
+
+
+def timed(name):
+    """
+    Decorator form of stage().
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _settings is None:
+                return func(*args, **kwargs)
+            with _Stage(name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# === Output ===
+def _emit(settings, record, t0, elapsed):
+    if settings['trace'] == 'log':
+        logger.info(json.dumps(record, default=str))
+        return
+    event = {
+        'name': record['stage'],
+        'cat': record['stage'].split('.')[0],
+        'ph': 'X',
+        'ts': (t0 - _t0) * 1e6,
+        'dur': elapsed * 1e6,
+        'pid': os.getpid(),
+        'tid': threading.get_ident(),
+        'args': {k: v for k, v in record.items() if k not in ('stage', 'seconds')},
+    }
+    with _lock:
+        _events.append(event)
+        _events.append({'name': 'counters', 'ph': 'C', 'ts': event['ts'] + event['dur'],
+                        'pid': event['pid'], 'args': dict(_counters)})
+
+
+def _trace_path(path=None, pid=None):
+    return (path or _settings['trace_file']).replace('{pid}', str(pid or os.getpid()))
+
+
+def _worker_parts(path):
+    return sorted(glob.glob(glob.escape(path) + '.*.part'))
+
+
+def write_chrome_trace(path=None):
+    """
+    Write the collected stages, plus those flushed by pool workers, as
+    Chrome trace JSON.  '{pid}' in the path is replaced by the process id,
+    so separate runs don't collide.
+    """
+    path = _trace_path(path)
+    with _lock:
+        events = list(_events)
+    parts = _worker_parts(path)
+    for part in parts:
+        with open(part) as fh:
+            events.extend(json.loads(line) for line in fh if line.strip())
+    with open(path, 'w') as fh:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, fh)
+    for part in parts:
+        os.remove(part)
+    return path
+
+
+def _flush_worker():
+    """
+    Append this worker's events to its part file next to the parent's trace.
+    """
+    with _lock:
+        events = list(_events)
+        _events.clear()
+    if not events:
+        return
+    path = f"{_trace_path(pid=_parent)}.{os.getpid()}.part"
+    with open(path, 'a') as fh:
+        fh.writelines(json.dumps(e, default=str) + '\n' for e in events)
+
+
+# === Process pools ===
+def pool_kwargs():
+    """
+    ProcessPoolExecutor keyword arguments that carry the trace settings
+    into the workers; empty when tracing is off.
+    """
+    if _settings is None:
+        return {}
+    return {'initializer': init_worker, 'initargs': (_settings, _t0, os.getpid())}
+
+
+def init_worker(settings, t0, parent):
+    """
+    Pool initializer: adopt the parent's settings and clock origin and drop
+    any state inherited through fork.
+    """
+    global _settings, _t0, _parent
+    _settings, _t0, _parent = settings, t0, parent
+    with _lock:
+        _events.clear()
+        _counters.clear()
+    _local.stack = []
+
+
+def _at_exit():
+    if _settings is None or _settings['trace'] != 'chrome' or _parent is not None:
+        return
+    if _events or _worker_parts(_trace_path()):
+        path = write_chrome_trace()
+        logger.info("Chrome trace written to %s", path)
+
+
+configure()
+atexit.register(_at_exit)
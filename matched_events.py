@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:48:26 2026
+
+@author: kfrench
+
+Materialized CBI event x SHARP keyword match table.
+
+For every CBI event date, SHARP keyword and window size the table holds
+the sample count and the max / mean / min of the keyword over
+[Date - window, Date + window], exactly what window_join computes on the
+fly.  It lives in its own SQLite file (config path 'match_db') so the SWAN
+databases stay read-only.
+
+Refreshes are incremental on rowid, like sharp_rollup.  Each (source,
+keyword, window) remembers the highest solar_flare_data rowid it has seen.
+A refresh only recomputes events that are not in the table yet, plus
+events whose window holds a row added above that rowid, whatever its
+Timestamp (sharp_ingest writes HARP by HARP, so new rows land anywhere in
+time).  Deleted or edited rows are not detected; use full=True (or
+--full) after rewriting a SWAN database.
+
+    python matched_events.py                 # all keywords, 6 h windows
+    python matched_events.py --windows 3 6 12 --keywords MEANPOT TOTBSQ
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+import config
+import instrument
+import result_cache
+import swan_db
+from window_join import TIME_FMT, load_sharp_column, window_aggregate
+
+logger = logging.getLogger(__name__)
+
+MATCH_TABLE = 'cbi_sharp_matches'
+STATE_TABLE = 'cbi_sharp_match_state'
+DEFAULT_WINDOWS = (6,)
+# aggregate -> column of MATCH_TABLE
+COLUMNS = {'count': 'n', 'max': 'max_value', 'mean': 'mean_value', 'min': 'min_value'}
+# Numeric columns of solar_flare_data that are not SHARP keywords
+NON_SHARP = ('HARPNUM', 'CBI')
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {MATCH_TABLE} (
+    source TEXT NOT NULL,
+    keyword TEXT NOT NULL,
+    window_hours REAL NOT NULL,
+    Date TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    max_value REAL,
+    mean_value REAL,
+    min_value REAL,
+    PRIMARY KEY (source, keyword, window_hours, Date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+    source TEXT NOT NULL,
+    keyword TEXT NOT NULL,
+    window_hours REAL NOT NULL,
+    max_rowid INTEGER NOT NULL,
+    n_events INTEGER NOT NULL,
+    updated TEXT NOT NULL,
+    PRIMARY KEY (source, keyword, window_hours)
+);
+"""
+
+
+def source_id(sharp_db):
+    """
+    Rows are keyed on the resolved path of the SWAN database they came from.
+    """
+    return os.path.realpath(sharp_db)
+
+
+def connect(match_db=None):
+    """
+    Writable connection to the match database, creating it if needed.
+    """
+    match_db = match_db or config.path('match_db')
+    os.makedirs(os.path.dirname(os.path.abspath(match_db)), exist_ok=True)
+    # Parallel figure workers may refresh different keywords at once
+    conn = sqlite3.connect(match_db, timeout=60, cached_statements=swan_db.STATEMENT_CACHE)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def event_dates(dates):
+    """
+    Unique, sorted event dates as TIME_FMT strings.
+    """
+    dates = pd.to_datetime(pd.Series(dates)).dropna()
+    return np.unique(dates.dt.strftime(TIME_FMT).to_numpy(dtype=str))
+
+
+def _shift(dates, hours):
+    return (pd.to_datetime(pd.Series(dates)) + timedelta(hours=hours)).dt.strftime(
+        TIME_FMT).to_numpy(dtype=str)
+
+
+def sharp_keywords(sharp_db):
+    """
+    Numeric SHARP keyword columns of solar_flare_data.
+    """
+    with swan_db.pooled(sharp_db) as conn:
+        return swan_db.numeric_columns(conn, exclude=NON_SHARP)
+
+
+def sharp_max_rowid(conn):
+    """
+    Highest rowid of solar_flare_data (0 for an empty table).
+    """
+    rows = swan_db.execute(conn, f"SELECT MAX(rowid) FROM {swan_db.TABLE}")
+    return rows[0][0] or 0
+
+
+def added_rows(conn, keyword, since):
+    """
+    (rowid, Timestamp) of the rows above rowid since with a non-null
+    value of keyword.
+    """
+    kw = swan_db.check_keyword(keyword)
+    rows = swan_db.execute(conn, f"SELECT rowid, Timestamp FROM {swan_db.TABLE} "
+                                 f"WHERE rowid > ? AND {kw} IS NOT NULL", (since,))
+    if not rows:
+        return np.array([], dtype=np.int64), np.array([], dtype=str)
+    rowids, times = zip(*rows)
+    return np.asarray(rowids, dtype=np.int64), np.asarray(times, dtype=str)
+
+
+def _stored_state(conn, source, keyword, window_hours):
+    row = conn.execute(
+        f"SELECT max_rowid FROM {STATE_TABLE} WHERE source = ? AND keyword = ? AND window_hours = ?",
+        (source, keyword, float(window_hours))).fetchone()
+    return row[0] if row else None
+
+
+def _stored_dates(conn, source, keyword, window_hours):
+    rows = conn.execute(
+        f"SELECT Date FROM {MATCH_TABLE} WHERE source = ? AND keyword = ? AND window_hours = ?",
+        (source, keyword, float(window_hours))).fetchall()
+    return np.array([d for (d,) in rows], dtype=str)
+
+
+def stale_events(dates, stored, new_times, window_hours):
+    """
+    Events that need (re)computing: dates missing from the table, and
+    stored events whose [Date - window, Date + window] holds one of
+    new_times (Timestamps of rows added since the last refresh).
+    """
+    todo = ~np.isin(dates, stored)
+    if len(new_times):
+        new_times = np.sort(new_times)
+        lo = np.searchsorted(new_times, _shift(dates, -window_hours), side='left')
+        hi = np.searchsorted(new_times, _shift(dates, window_hours), side='right')
+        todo |= hi > lo
+    return dates[todo]
+
+
+@instrument.timed('match.refresh')
+def refresh(cbi_dates, sharp_db, keywords=None, windows=DEFAULT_WINDOWS, match_db=None, full=False):
+    """
+    Bring the match table up to date for the given CBI event dates.
+    keywords defaults to every SHARP keyword in sharp_db.  Returns
+    {(keyword, window_hours): number of events recomputed}.
+    """
+    dates = event_dates(cbi_dates)
+    keywords = list(keywords) if keywords is not None else sharp_keywords(sharp_db)
+    windows = [float(w) for w in windows]
+    source = source_id(sharp_db)
+    counts = {}
+
+    conn = connect(match_db)
+    try:
+        for keyword in keywords:
+            with swan_db.pooled(sharp_db) as sconn:
+                top = sharp_max_rowid(sconn)
+                # None: never refreshed, or the table was rebuilt with fewer rows
+                done = {w: None if full else _stored_state(conn, source, keyword, w) for w in windows}
+                done = {w: None if d is None or d > top else d for w, d in done.items()}
+                marks = [d for d in done.values() if d is not None and d < top]
+                rowids, added = added_rows(sconn, keyword, min(marks)) if marks else (None, None)
+                todo = {}
+                for w in windows:
+                    if done[w] is None:
+                        todo[w] = dates
+                    else:
+                        new_times = added[rowids > done[w]] if done[w] < top else []
+                        todo[w] = stale_events(dates, _stored_dates(conn, source, keyword, w),
+                                               new_times, w)
+                # One read of the keyword covers every window that needs work
+                busy = [w for w in windows if len(todo[w])]
+                if busy:
+                    lo = min(_shift(todo[w][:1], -w)[0] for w in busy)
+                    hi = max(_shift(todo[w][-1:], w)[0] for w in busy)
+                    times, values = load_sharp_column(sconn, keyword, lo, hi)
+
+            with conn:
+                for w in windows:
+                    if len(todo[w]):
+                        _store(conn, source, keyword, w, todo[w], times, values)
+                    n_events = conn.execute(
+                        f"SELECT COUNT(*) FROM {MATCH_TABLE} "
+                        "WHERE source = ? AND keyword = ? AND window_hours = ?",
+                        (source, keyword, w)).fetchone()[0]
+                    conn.execute(
+                        f"INSERT OR REPLACE INTO {STATE_TABLE} VALUES (?, ?, ?, ?, ?, ?)",
+                        (source, keyword, w, top, n_events, time.strftime(TIME_FMT)))
+                    counts[(keyword, w)] = len(todo[w])
+            logger.info("%s: recomputed %s", keyword,
+                        ', '.join(f"{counts[(keyword, w)]} @ {w:g} h" for w in windows))
+    finally:
+        conn.close()
+    return counts
+
+
+def _store(conn, source, keyword, window_hours, dates, times, values):
+    start, end = _shift(dates, -window_hours), _shift(dates, window_hours)
+    aggs = window_aggregate(times, values, start, end, tuple(COLUMNS))
+    # NaN (empty window) is stored as NULL
+    as_sql = {agg: [None if np.isnan(v) else float(v) for v in aggs[agg]]
+              for agg in ('max', 'mean', 'min')}
+    rows = zip([source] * len(dates), [keyword] * len(dates), [window_hours] * len(dates),
+               dates.tolist(), aggs['count'].tolist(),
+               as_sql['max'], as_sql['mean'], as_sql['min'])
+    conn.executemany(f"INSERT OR REPLACE INTO {MATCH_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+
+def lookup(cbi_dates, sharp_db, keyword, agg='max', window_hours=6, match_db=None):
+    """
+    Stored aggregate for each entry of cbi_dates (aligned, NaN where the
+    window was empty or the event has not been refreshed).
+    """
+    if agg not in COLUMNS:
+        raise ValueError(f"Unknown aggregate {agg!r}, expected one of {tuple(COLUMNS)}")
+    conn = connect(match_db)
+    try:
+        table = swan_db.read_frame(
+            conn, f"SELECT Date, {COLUMNS[agg]} AS value FROM {MATCH_TABLE} "
+                  "WHERE source = ? AND keyword = ? AND window_hours = ?",
+            (source_id(sharp_db), swan_db.check_keyword(keyword), float(window_hours)))
+    finally:
+        conn.close()
+    keys = pd.to_datetime(pd.Series(cbi_dates)).dt.strftime(TIME_FMT)
+    values = table.set_index('Date')['value'].reindex(keys)
+    return values.to_numpy(dtype=float)
+
+
+@result_cache.cached('match.values', files=('sharp_db',), ignore=('match_db',))
+def matched_values(dates, sharp_db, keyword, time_window_hours=6, agg='max', match_db=None):
+    """
+    refresh() then lookup() for one keyword / window.  Cached on the dates,
+    the SWAN database fingerprint and the parameters, so an unchanged
+    rerun doesn't touch either database.
+    """
+    refresh(dates, sharp_db, [keyword], [time_window_hours], match_db)
+    return lookup(dates, sharp_db, keyword, agg, time_window_hours, match_db)
+
+
+def matched(cbi_df, sharp_db, keyword, time_window_hours=6, agg='max', match_db=None):
+    """
+    Refresh one keyword / window for cbi_df['Date'] and return its
+    aggregate aligned with cbi_df.  Drop-in for
+    window_join.get_sharp_near_times with a single agg.
+    """
+    dates = pd.to_datetime(pd.Series(cbi_df['Date'])).to_numpy(dtype='datetime64[ns]')
+    return matched_values(dates, sharp_db, keyword, time_window_hours, agg, match_db)
+
+
+def load_matches(sharp_db, keywords=None, window_hours=6, agg='max', match_db=None):
+    """
+    Wide table of stored matches: one row per event Date, one column per
+    keyword.
+    """
+    conn = connect(match_db)
+    try:
+        sql = (f"SELECT Date, keyword, {COLUMNS[agg]} AS value FROM {MATCH_TABLE} "
+               "WHERE source = ? AND window_hours = ?")
+        table = swan_db.read_frame(conn, sql, (source_id(sharp_db), float(window_hours)))
+    finally:
+        conn.close()
+    wide = table.pivot(index='Date', columns='keyword', values='value')
+    if keywords is not None:
+        wide = wide.reindex(columns=list(keywords))
+    wide.index = pd.to_datetime(wide.index)
+    return wide.sort_index()
+
+
+if __name__ == '__main__':
+    from cbi_catalog import load_catalog
+
+    parser = argparse.ArgumentParser(description='Refresh the CBI / SHARP match table.')
+    parser.add_argument('--windows', type=float, nargs='+', default=list(DEFAULT_WINDOWS),
+                        help='window half-widths in hours')
+    parser.add_argument('--keywords', nargs='+', help='default: every SHARP keyword')
+    parser.add_argument('--full', action='store_true', help='recompute every event')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    cbi = load_catalog(config.path('cbi_file'), columns=['Date'])
+    t0 = time.perf_counter()
+    counts = refresh(cbi['Date'], config.path('swan_db'), args.keywords, args.windows,
+                     full=args.full)
+    print(f"{sum(counts.values())} event windows recomputed in {time.perf_counter() - t0:.1f} s")
@@ -11,21 +11,8 @@ import pandas as pd
 import numpy as np
 from scipy.stats import linregress, t
 
-
-dirname = '/Users/kfrench/Desktop/LASCO_CBI/'
-fname = 'cbi_wedge_40_sum_markedAR.xlsx'
-# cbi_wedge_40_sum_markedAR.xlsx - spreadsheet from CBI paper
-# cbi_explore_180_shift.xlsx - spreadsheet for shifted events
-
-f = dirname + fname
-
-
-orig_df = pd.read_excel(f)
-orig_df['Date'] = pd.to_datetime(orig_df['Date'])
-orig_df.rename(columns={'Corrected Velocity': 'Vel', 'Median Brightness': 'CBI'}, inplace=True)
-
-
-df = orig_df[orig_df['Vel'] > 0]
+import config
+from cbi_catalog import load_catalog
 
 
 def reg_compare(df, x_col='CBI', y_col='Vel'):
@@ -110,3 +97,17 @@ def reg_compare(df, x_col='CBI', y_col='Vel'):
         'p_value_lib': p_value,
         'p_value_diff': p_manual - p_value
     }
+
+
+if __name__ == '__main__':
+    f = config.path('cbi_ar_file')
+    # cbi_wedge_40_sum_markedAR.xlsx - spreadsheet from CBI paper
+    # cbi_explore_180_shift.xlsx - spreadsheet for shifted events
+
+
+    orig_df = load_catalog(f)
+
+
+    df = orig_df[orig_df['Vel'] > 0]
+
+    reg_compare(df)
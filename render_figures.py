@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 17:31:08 2026
+
+@author: kfrench
+
+Headless batch renderer for the CBI figures.
+
+Every figure in FIGURES names a builder in figures.py, the data inputs it
+reads and its parameters.  A figure is skipped when the hash of its
+inputs, parameters and code matches the one recorded in the output
+directory's manifest and its files exist.  The code is the builder's
+source plus result_cache.code_fingerprint() of every project module it
+uses (imported by figures.py or by the builder, and what those import),
+so editing load_frame, matched, decimate or cbi_catalog re-renders the
+figures built on them.  Inputs fetched rather than configured (FETCHED:
+the SILSO sunspot series) are refreshed once in the parent and passed to
+the workers as their cache file, so a SILSO update re-renders the figures
+that plot it.  Stale figures are rendered in parallel worker processes
+with the Agg backend and written straight to PNG/PDF.
+
+    python render_figures.py                      # everything that changed
+    python render_figures.py cbi_meanpot --force  # one figure, always
+"""
+
+import argparse
+import ast
+import hashlib
+import inspect
+import json
+import logging
+import os
+import textwrap
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import config
+import instrument
+
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+logger = logging.getLogger(__name__)
+
+PATHS = config.paths()
+# Input name -> SILSO series kind; resolved to the sunspots cache file
+FETCHED = {'silso_monthly': 'monthly'}
+
+# name -> (builder, {builder argument: PATHS key}, params)
+FIGURES = {
+    'cbi_meanpot': ('sharp_scatter', {'cbi_file': 'cbi_file', 'swan_db': 'swan_db'},
+                    dict(keyword='MEANPOT', xlabel="MEANPOT (Mx$^2$/cm$^2$)", color='darkgreen')),
+    'cbi_vs_totbsq': ('sharp_scatter', {'cbi_file': 'cbi_file', 'swan_db': 'swan_db'},
+                      dict(keyword='TOTBSQ', xlabel="TOTBSQ (dynes/cm$^2$)", color='darkorange')),
+    'cbi_totpot_timeseries': ('sharp_timeseries', {'swan_db': 'swan_cbi_db'},
+                              dict(spec='log10(TOTPOT)', ylabel="log10(TOTPOT) (Mx$^2$/cm)",
+                                   color='tab:orange', title="Time Series of CBI and log10(TOTPOT)")),
+    'cbi_current_ratio_timeseries': ('sharp_timeseries', {'swan_db': 'swan_cbi_db'},
+                                     dict(spec='TOTUSJZ/USFLUX', ylabel="Current Ratio (TOTUSJZ / USFLUX)",
+                                          color='tab:purple',
+                                          title="Time Series of CBI and Current Ratio (TOTUSJZ / USFLUX)")),
+    'cbi_usflux_timeseries': ('sharp_timeseries', {'swan_db': 'swan_cbi_db'},
+                              dict(spec='USFLUX', ylabel="USFLUX (Mx)", color='tab:red',
+                                   title="Time Series of CBI and USFLUX (Raw Data)")),
+    'cbi_meanpot_timeseries': ('sharp_timeseries', {'swan_db': 'swan_cbi_db'},
+                               dict(spec='MEANPOT', ylabel="MEANPOT (Mx$^2$/cm$^2$)", color='tab:green',
+                                    title="Time Series of CBI and MEANPOT")),
+    'cbi_totbsq_timeseries': ('sharp_timeseries', {'swan_db': 'swan_cbi_db'},
+                              dict(spec='TOTBSQ', ylabel="TOTBSQ (G$^2$)", color='tab:brown',
+                                   title="Time Series of CBI and TOTBSQ")),
+    'cbi_totusjz_timeseries': ('sharp_timeseries', {'swan_db': 'swan_cbi_db'},
+                               dict(spec='TOTUSJZ', ylabel="TOTUSJZ (A)", color='tab:olive',
+                                    title="Time Series of CBI and TOTUSJZ")),
+    'cbi_rvalue_timeseries': ('sharp_timeseries', {'swan_db': 'swan_cbi_db'},
+                              dict(spec='R_VALUE', ylabel="R_VALUE", color='tab:cyan',
+                                   title="Time Series of CBI and R_VALUE")),
+    'cbi_all_errors': ('velocity_scatter', {'cbi_file': 'cbi_file'}, dict(drop_zero_vel=False)),
+    'cbi_all_error_no_zeros': ('velocity_scatter', {'cbi_file': 'cbi_file'}, dict(drop_zero_vel=True)),
+    'cbi_solar_min_max': ('phase_grid', {'cbi_file': 'cbi_ar_file'}, dict(phases='MIN_MAX_PHASES')),
+    'cbi_sunspots_time_series': ('cbi_sunspots', {'cube_file': 'cube_file', 'dates_file': 'dates_file',
+                                                  'sunspot_file': 'silso_monthly'},
+                                 dict(skip=100)),
+}
+
+OUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'images')
+MANIFEST = '.render_manifest.json'
+HASH_LIMIT = 256 * 1024 ** 2
+
+
+def input_fingerprint(path):
+    """
+    sha256 of the file contents for inputs up to HASH_LIMIT bytes; larger
+    inputs (the SWAN databases, the cube) are keyed on size and mtime.
+    """
+    st = os.stat(path)
+    if st.st_size > HASH_LIMIT:
+        return f"{st.st_size}:{st.st_mtime_ns}"
+    h = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def builder_code(builder):
+    """
+    Source of a figures.py builder and the code fingerprints of the project
+    modules it uses: figures.py's module-level imports plus the builder's
+    own (lazy) imports.
+    """
+    import figures
+    import result_cache
+
+    source = inspect.getsource(getattr(figures, builder))
+    with open(figures.__file__, 'rb') as fh:
+        module = ast.parse(fh.read())
+    top = ast.Module(body=[node for node in module.body
+                           if isinstance(node, (ast.Import, ast.ImportFrom))], type_ignores=[])
+    used = result_cache.project_imports(top) | \
+        result_cache.project_imports(ast.parse(textwrap.dedent(source)))
+    return {'source': source,
+            'modules': {os.path.basename(p): result_cache.code_fingerprint(p) for p in used}}
+
+
+def fetch_inputs(names, paths):
+    """
+    paths plus the FETCHED inputs the named figures read, each refreshed
+    once (at most one SILSO request) so every worker reads the file the
+    key was computed from.  Inputs that can't be fetched are left out and
+    their figures fail.
+    """
+    import sunspots
+
+    paths = dict(paths)
+    for key in {k for name in names for k in FIGURES[name][1].values() if k in FETCHED}:
+        try:
+            sunspots.load_series(FETCHED[key])
+        except OSError as err:
+            logger.warning("Could not fetch %s: %s", key, err)
+            continue
+        paths[key] = sunspots.cache_file(FETCHED[key])
+    return paths
+
+
+def figure_key(name, paths=PATHS):
+    builder, inputs, params = FIGURES[name]
+    payload = {
+        'builder': builder,
+        'code': builder_code(builder),
+        'inputs': {arg: input_fingerprint(paths[key]) for arg, key in inputs.items()},
+        'params': params,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def render_one(name, out_dir, formats, paths=PATHS):
+    """
+    Build one figure and write it in every format.  Runs in a worker.
+    """
+    import figures
+
+    builder, inputs, params = FIGURES[name]
+    t0 = time.perf_counter()
+    kwargs = {arg: paths[key] for arg, key in inputs.items()}
+    with instrument.stage('plot.build', figure=name):
+        fig = getattr(figures, builder)(**kwargs, **params)
+    written = []
+    for fmt in formats:
+        out = os.path.join(out_dir, f"{name}.{fmt}")
+        with instrument.stage('plot.save', figure=name, format=fmt):
+            fig.savefig(out, dpi=150 if fmt == 'png' else None)
+        written.append(out)
+    return name, written, time.perf_counter() - t0
+
+
+def _read_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST)) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST)
+    with open(path + '.tmp', 'w') as fh:
+        json.dump(manifest, fh, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def render(names=None, out_dir=OUT_DIR, formats=('png',), workers=None, force=False, paths=PATHS):
+    """
+    Render the named figures (default: all) that are out of date.
+    Returns {name: 'rendered' | 'skipped' | 'failed: ...'}.
+    """
+    names = list(names or FIGURES)
+    unknown = set(names) - set(FIGURES)
+    if unknown:
+        raise KeyError(f"Unknown figures: {', '.join(sorted(unknown))}")
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = _read_manifest(out_dir)
+    paths = fetch_inputs(names, paths)
+
+    status, todo, keys = {}, [], {}
+    for name in names:
+        missing = [key for key in FIGURES[name][1].values() if key not in paths]
+        if missing:
+            status[name] = f"failed: no {', '.join(missing)}"
+            continue
+        try:
+            keys[name] = figure_key(name, paths)
+        except OSError as err:
+            status[name] = f"failed: {err}"
+            continue
+        outputs = [os.path.join(out_dir, f"{name}.{fmt}") for fmt in formats]
+        if not force and manifest.get(name) == keys[name] and all(map(os.path.exists, outputs)):
+            status[name] = 'skipped'
+        else:
+            todo.append(name)
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers, **instrument.pool_kwargs()) as pool:
+            futures = {pool.submit(render_one, name, out_dir, tuple(formats), paths): name
+                       for name in todo}
+            for fut in as_completed(futures):
+                name = futures[fut]
+                try:
+                    _, written, elapsed = fut.result()
+                except Exception as err:
+                    status[name] = f"failed: {err!r}"
+                    continue
+                manifest[name] = keys[name]
+                status[name] = 'rendered'
+                logger.info("%s: %.1f s -> %s", name, elapsed, ', '.join(written))
+        _write_manifest(out_dir, manifest)
+    return status
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1].strip(),
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('figures', nargs='*', help=f"subset of: {', '.join(FIGURES)}")
+    parser.add_argument('--out-dir', default=OUT_DIR)
+    parser.add_argument('--format', action='append', dest='formats', choices=['png', 'pdf'])
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--force', action='store_true', help='ignore the manifest')
+    parser.add_argument('--config', help='INI file with [paths] overrides')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if args.config:
+        config.load(args.config)
+    status = render(args.figures, args.out_dir, args.formats or ['png'], args.workers, args.force,
+                    paths=config.paths())
+    for name in sorted(status):
+        print(f"{name:32s} {status[name]}")
+    return 0 if not any(s.startswith('failed') for s in status.values()) else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
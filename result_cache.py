@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 11:32:08 2026
+
+@author: kfrench
+
+Content-addressed cache of intermediate results (parsed catalogs, matched
+SHARP values, regression and resampling outputs).
+
+    @result_cache.cached('stats.bootstrap', files=('path',), ignore=('workers',))
+    def bootstrap(...): ...
+
+The key of a call is the sha256 of the function's name, its code
+fingerprint, its bound arguments (DataFrames and arrays hashed by content)
+and a fingerprint of every argument named in files.  The code fingerprint
+hashes the source of the function's module and of every project module it
+imports, directly or through other project modules (function-level imports
+included), plus the NumPy and pandas versions, so editing a helper such as
+window_join or resample_stats.run_batches changes the key of everything that
+uses it.  Files up to HASH_LIMIT bytes are hashed by content; larger ones
+(the SWAN databases) by size, mtime and inode, plus their -wal file.
+
+Anything else a result depends on is not seen: other libraries, or files
+read without being named in files.  After changing those, clear the cache
+(python result_cache.py --clear).
+
+Results are looked up in an in-process LRU memo first, then in a pickle
+per key under the result_cache_dir path.  Reading a pickle touches its
+mtime; after each write the least recently used pickles are deleted until
+the directory is under result_cache_mb.  Callers get copies of cached
+DataFrames and arrays, so mutating a result does not corrupt the cache.
+
+Settings come from the [cache] section of config.py, e.g.
+
+    ASTROSTATS_RESULT_CACHE=false python cbi_meanpot.py
+
+    python result_cache.py            # entries and size on disk
+    python result_cache.py --clear
+"""
+
+import argparse
+import ast
+import functools
+import hashlib
+import inspect
+import logging
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import config
+import instrument
+
+logger = logging.getLogger(__name__)
+
+# Files larger than this are fingerprinted by stat instead of content
+HASH_LIMIT = 256 * 1024 ** 2
+# Modules imported from here count as project code in code_fingerprint()
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+SUFFIX = '.pkl'
+# Evict down to this fraction of the limit so every write doesn't evict
+EVICT_TO = 0.9
+
+_MISSING = object()
+_memo = OrderedDict()
+_file_digests = {}
+_lock = threading.Lock()
+
+
+def settings():
+    section = config.get_config()['cache']
+    return {
+        'enabled': section.getboolean('result_cache'),
+        'max_bytes': int(section.getfloat('result_cache_mb') * 1024 ** 2),
+        'memo_entries': section.getint('memo_entries'),
+        'directory': config.path('result_cache_dir'),
+    }
+
+
+# === Fingerprints ===
+def file_sha256(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(chunk_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def file_fingerprint(path):
+    """
+    Content hash of a file (stat-based above HASH_LIMIT), remembered per
+    (path, size, mtime) for the life of the process.
+    """
+    path = os.path.realpath(os.path.expanduser(path))
+    st = os.stat(path)
+    stat_key = (path, st.st_size, st.st_mtime_ns, st.st_ino)
+    with _lock:
+        digest = _file_digests.get(stat_key)
+    if digest is not None:
+        return digest
+
+    if st.st_size <= HASH_LIMIT:
+        digest = file_sha256(path)
+        instrument.count('bytes_read', st.st_size)
+    else:
+        parts = [f"{st.st_size}:{st.st_mtime_ns}:{st.st_ino}"]
+        wal = path + '-wal'
+        if os.path.exists(wal):
+            wst = os.stat(wal)
+            parts.append(f"{wst.st_size}:{wst.st_mtime_ns}")
+        digest = 'stat:' + hashlib.sha256('|'.join(parts).encode()).hexdigest()
+    with _lock:
+        _file_digests[stat_key] = digest
+    return digest
+
+
+def _update(h, value):
+    """
+    Feed a canonical encoding of value into the hash h.
+    """
+    if isinstance(value, pd.DataFrame):
+        h.update(b'DataFrame')
+        _update(h, [str(c) for c in value.columns])
+        _update(h, [str(t) for t in value.dtypes])
+        h.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, (pd.Series, pd.Index)):
+        h.update(type(value).__name__.encode())
+        _update(h, [str(value.dtype), str(value.name)])
+        h.update(pd.util.hash_pandas_object(value, index=isinstance(value, pd.Series)).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        if value.dtype == object:
+            _update(h, pd.Series(value.ravel()))
+        else:
+            h.update(f"ndarray{value.dtype.str}{value.shape}".encode())
+            h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        h.update(b'dict')
+        for k in sorted(value, key=repr):
+            _update(h, k)
+            _update(h, value[k])
+    elif isinstance(value, (list, tuple)):
+        h.update(f"{type(value).__name__}{len(value)}".encode())
+        for v in value:
+            _update(h, v)
+    elif isinstance(value, np.random.SeedSequence):
+        _update(h, ('SeedSequence', value.entropy, value.spawn_key))
+    else:
+        # Scalars, strings, None, np.generic
+        h.update(f"{type(value).__name__}:{value!r}".encode())
+    h.update(b';')
+
+
+def make_key(namespace, params):
+    h = hashlib.sha256(namespace.encode())
+    _update(h, params)
+    return h.hexdigest()
+
+
+def project_imports(tree):
+    """
+    Paths of the project modules (PROJECT_DIR/<name>.py) imported anywhere
+    in an ast tree, inside functions included.
+    """
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names.add(node.module.split('.')[0])
+    paths = (os.path.join(PROJECT_DIR, name + '.py') for name in names)
+    return {p for p in paths if os.path.exists(p)}
+
+
+def _project_imports(path):
+    with open(path, 'rb') as fh:
+        return project_imports(ast.parse(fh.read(), path))
+
+
+@functools.lru_cache(maxsize=None)
+def code_fingerprint(path):
+    """
+    Hash of the source file at path and of every project module it imports,
+    transitively, plus the NumPy and pandas versions.  Computed once per
+    process.
+    """
+    seen, todo = set(), [os.path.realpath(path)]
+    while todo:
+        current = todo.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        todo.extend(os.path.realpath(p) for p in _project_imports(current))
+    h = hashlib.sha256(f"numpy {np.__version__} pandas {pd.__version__}".encode())
+    for current in sorted(seen):
+        h.update(os.path.basename(current).encode())
+        with open(current, 'rb') as fh:
+            h.update(hashlib.sha256(fh.read()).digest())
+    return h.hexdigest()[:16]
+
+
+# === Storage ===
+def _detach(value):
+    """
+    Copy of the mutable parts of a cached value.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series, np.ndarray)):
+        return value.copy()
+    if isinstance(value, dict):
+        return {k: _detach(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_detach(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_detach(v) for v in value)
+    return value
+
+
+def _entry_path(directory, key):
+    return os.path.join(directory, key[:2], key + SUFFIX)
+
+
+def _memo_get(key):
+    with _lock:
+        if key not in _memo:
+            return _MISSING
+        _memo.move_to_end(key)
+        return _memo[key]
+
+
+def _memo_put(key, value, max_entries):
+    with _lock:
+        _memo[key] = value
+        _memo.move_to_end(key)
+        while len(_memo) > max_entries:
+            _memo.popitem(last=False)
+
+
+def _disk_get(directory, key):
+    path = _entry_path(directory, key)
+    try:
+        with open(path, 'rb') as fh:
+            size = os.fstat(fh.fileno()).st_size
+            value = pickle.load(fh)
+    except FileNotFoundError:
+        return _MISSING
+    except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as exc:
+        logger.warning("Discarding unreadable cache entry %s (%s)", path, exc)
+        _remove(path)
+        return _MISSING
+    instrument.count('bytes_read', size)
+    try:
+        # mtime is the LRU clock
+        os.utime(path)
+    except OSError:
+        pass
+    return value
+
+
+def _disk_put(directory, key, value, max_bytes):
+    path = _entry_path(directory, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        size = os.path.getsize(tmp)
+        if size > max_bytes:
+            # Would evict everything else and then itself
+            logger.info("Not caching %s: %d bytes exceeds the cache size", key, size)
+            _remove(tmp)
+            return
+        os.replace(tmp, path)
+    except BaseException:
+        _remove(tmp)
+        raise
+    evict(directory, max_bytes)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _entries(directory):
+    """
+    (mtime, size, path) of every cache file.
+    """
+    found = []
+    if not os.path.isdir(directory):
+        return found
+    for sub in os.scandir(directory):
+        if not sub.is_dir():
+            continue
+        for entry in os.scandir(sub.path):
+            if entry.name.endswith(SUFFIX):
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                found.append((st.st_mtime_ns, st.st_size, entry.path))
+    return found
+
+
+def evict(directory=None, max_bytes=None):
+    """
+    Delete least recently used entries until the cache fits in max_bytes
+    (to EVICT_TO of it).  Returns the number of entries removed.
+    """
+    s = settings()
+    directory = directory or s['directory']
+    max_bytes = s['max_bytes'] if max_bytes is None else max_bytes
+    entries = _entries(directory)
+    total = sum(size for _, size, _ in entries)
+    if total <= max_bytes:
+        return 0
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes * EVICT_TO:
+            break
+        _remove(path)
+        total -= size
+        removed += 1
+    logger.info("Evicted %d cache entries, %.1f MiB left", removed, total / 1024 ** 2)
+    return removed
+
+
+def clear(directory=None):
+    """
+    Drop the in-process memo and every entry on disk.
+    """
+    with _lock:
+        _memo.clear()
+    entries = _entries(directory or settings()['directory'])
+    for _, _, path in entries:
+        _remove(path)
+    return len(entries)
+
+
+def stats(directory=None):
+    entries = _entries(directory or settings()['directory'])
+    with _lock:
+        memo_entries = len(_memo)
+    return {'entries': len(entries), 'bytes': sum(size for _, size, _ in entries),
+            'memo_entries': memo_entries}
+
+
+# === Decorator ===
+def cached(namespace, files=(), ignore=(), refresh=None, disk=True):
+    """
+    Cache a function's results by content.
+
+    files names parameters holding input file paths (fingerprinted rather
+    than compared by name), ignore names parameters that do not change the
+    result (worker counts, output locations), and refresh names a boolean
+    parameter that forces recomputation when true.  disk=False keeps only
+    the in-process memo (for results that already have their own file
+    cache).  Every other argument
+    must be hashable by _update: scalars, strings, containers, arrays or
+    pandas objects.
+    """
+    files, ignore = set(files), set(ignore)
+
+    def decorate(func):
+        signature = inspect.signature(func)
+        source = inspect.getsourcefile(inspect.unwrap(func))
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            s = settings()
+            if not s['enabled']:
+                return func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            force = refresh is not None and bool(bound.arguments.get(refresh))
+
+            params = {}
+            for name, value in bound.arguments.items():
+                if name in ignore or name == refresh:
+                    continue
+                if name in files and value is not None:
+                    value = ('file', file_fingerprint(value))
+                params[name] = value
+            code = code_fingerprint(source)
+            key = make_key(f"{namespace}:{func.__module__}.{func.__qualname__}:{code}", params)
+
+            if not force:
+                value = _memo_get(key)
+                if value is not _MISSING:
+                    instrument.count('cache_memo_hits')
+                    return _detach(value)
+                if disk:
+                    with instrument.stage('cache.load', namespace=namespace):
+                        value = _disk_get(s['directory'], key)
+                if value is not _MISSING:
+                    instrument.count('cache_disk_hits')
+                    _memo_put(key, value, s['memo_entries'])
+                    return _detach(value)
+
+            instrument.count('cache_misses')
+            value = func(*args, **kwargs)
+            # Stored before the caller can mutate it
+            stored = _detach(value)
+            _memo_put(key, stored, s['memo_entries'])
+            if not disk:
+                return value
+            try:
+                _disk_put(s['directory'], key, stored, s['max_bytes'])
+            except (OSError, pickle.PicklingError, TypeError, AttributeError) as exc:
+                logger.warning("Could not store %s in the result cache: %s", namespace, exc)
+            return value
+
+        wrapper.uncached = func
+        return wrapper
+    return decorate
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Inspect or clear the result cache.')
+    parser.add_argument('--clear', action='store_true', help='delete every entry')
+    parser.add_argument('--evict', action='store_true', help='enforce result_cache_mb now')
+    args = parser.parse_args()
+
+    directory = settings()['directory']
+    if args.clear:
+        print(f"Removed {clear()} entries from {directory}")
+    elif args.evict:
+        print(f"Evicted {evict()} entries from {directory}")
+    s = stats()
+    print(f"{directory}: {s['entries']} entries, {s['bytes'] / 1024 ** 2:.1f} MiB")
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 18:02:47 2026
+
+@author: kfrench
+
+Rolling Pearson r, slope and p-value between two series in O(n).
+
+Prefix moments (mean, M2 = sum of squared deviations, co-moment) are built
+with Welford's update in vectorized form, and each window's moments come
+out of two prefixes with the Chan et al. merge formula run backwards.  The
+data are centred on their overall mean first.  Windows whose variance is
+tiny next to the prefix it was taken from (where the subtraction can lose
+digits) are recomputed directly.
+
+Windows are either a number of valid samples (count-based) or a duration
+such as '27D' (time-based, trailing or centred), so irregular SHARP
+cadence and gaps are handled by the timestamps themselves.  Pairs where
+either value is NaN are dropped before anything else.
+
+    python rolling_corr.py R_VALUE 27D
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+from scipy.stats import t as t_dist
+
+import instrument
+
+# Recompute a window directly when its M2 is below this fraction of the
+# prefix M2 it was subtracted from
+CANCELLATION = 1e-8
+RESULT_COLUMNS = ['n', 'r', 'slope', 'intercept', 'p', 'x_mean', 'y_mean']
+
+
+def _prefix_moments(x, y):
+    """
+    Welford prefix statistics: element k describes the first k samples
+    (k = 0 .. n).  Returns n, mean_x, mean_y, M2_x, M2_y, C_xy.
+    """
+    count = np.arange(1, len(x) + 1, dtype=float)
+    mx = np.cumsum(x) / count
+    my = np.cumsum(y) / count
+    mx_prev = np.concatenate([[0.0], mx[:-1]])
+    my_prev = np.concatenate([[0.0], my[:-1]])
+    dx = x - mx_prev
+    # M2_k = M2_{k-1} + (x_k - mean_{k-1}) (x_k - mean_k), and likewise C
+    m2x = np.cumsum(dx * (x - mx))
+    m2y = np.cumsum((y - my_prev) * (y - my))
+    cxy = np.cumsum(dx * (y - my))
+
+    def pad(a):
+        return np.concatenate([[0.0], a])
+    return pad(count), pad(mx), pad(my), pad(m2x), pad(m2y), pad(cxy)
+
+
+def window_moments(x, y, lo, hi):
+    """
+    n, means, M2s and co-moment of every window x[lo:hi], y[lo:hi].
+    """
+    n, mx, my, m2x, m2y, cxy = _prefix_moments(x, y)
+    n_lo, n_hi = n[lo], n[hi]
+    n_w = n_hi - n_lo
+    with np.errstate(divide='ignore', invalid='ignore'):
+        wx = (n_hi * mx[hi] - n_lo * mx[lo]) / n_w
+        wy = (n_hi * my[hi] - n_lo * my[lo]) / n_w
+        # prefix(hi) = prefix(lo) merged with the window; solve for the window
+        f = np.where(n_hi > 0, n_lo * n_w / n_hi, 0.0)
+        sxx = m2x[hi] - m2x[lo] - f * (wx - mx[lo]) ** 2
+        syy = m2y[hi] - m2y[lo] - f * (wy - my[lo]) ** 2
+        sxy = cxy[hi] - cxy[lo] - f * (wx - mx[lo]) * (wy - my[lo])
+
+    suspect = np.flatnonzero((n_w >= 2) & ((sxx < CANCELLATION * m2x[hi]) |
+                                           (syy < CANCELLATION * m2y[hi])))
+    for i in suspect:
+        xs, ys = x[lo[i]:hi[i]], y[lo[i]:hi[i]]
+        wx[i], wy[i] = xs.mean(), ys.mean()
+        dx, dy = xs - wx[i], ys - wy[i]
+        sxx[i], syy[i], sxy[i] = dx @ dx, dy @ dy, dx @ dy
+    return n_w, wx, wy, np.maximum(sxx, 0.0), np.maximum(syy, 0.0), sxy
+
+
+def _stats(n, x_mean, y_mean, sxx, syy, sxy, min_periods):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = np.clip(sxy / np.sqrt(sxx * syy), -1.0, 1.0)
+        slope = sxy / sxx
+        intercept = y_mean - slope * x_mean
+        dof = n - 2
+        t_stat = r * np.sqrt(dof / ((1.0 - r) * (1.0 + r)))
+        p = np.where(np.abs(r) == 1.0, 0.0, 2 * t_dist.sf(np.abs(t_stat), dof))
+    small = n < max(min_periods, 3)
+    for a in (r, slope, intercept, p):
+        a[small] = np.nan
+    return {'n': n.astype(int), 'r': r, 'slope': slope, 'intercept': intercept, 'p': p,
+            'x_mean': x_mean, 'y_mean': y_mean}
+
+
+def _window_bounds(times, window, at, center):
+    """
+    [lo, hi) bounds into the sorted times for windows ending (or centred)
+    at each entry of at.
+    """
+    if isinstance(window, (int, np.integer)):
+        if at is not None or center:
+            raise ValueError("Count-based windows are evaluated at every sample; "
+                             "use a duration for at= or center=")
+        hi = np.arange(1, len(times) + 1)
+        return np.maximum(hi - window, 0), hi
+    at = times if at is None else at
+    width = pd.Timedelta(window).as_unit('ns').value
+    if center:
+        lo = np.searchsorted(times, at - width // 2, side='left')
+        hi = np.searchsorted(times, at + width // 2, side='right')
+    else:
+        lo = np.searchsorted(times, at - width, side='right')
+        hi = np.searchsorted(times, at, side='right')
+    return lo, hi
+
+
+@instrument.timed('stats.rolling_pearson')
+def rolling_pearson(x, y, window, times=None, min_periods=3, at=None, center=False):
+    """
+    Rolling Pearson r, slope, intercept and two-sided p of y on x.
+
+    window is an int (that many valid samples, trailing) or a duration
+    ('27D', pd.Timedelta) over times.  Results are reported at every valid
+    sample, or at the times in at (e.g. a daily grid) for time windows.
+    Windows with fewer than min_periods pairs give NaN.  Returns a
+    DataFrame with RESULT_COLUMNS indexed by window end (or centre) time,
+    or by sample position when no times are given.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    ok = np.isfinite(x) & np.isfinite(y)
+
+    if times is not None:
+        times = pd.to_datetime(pd.Series(times)).to_numpy(dtype='datetime64[ns]')
+        ok &= ~np.isnat(times)
+        order = np.argsort(times[ok], kind='stable')
+        t = times[ok][order].astype(np.int64)
+        xv, yv = x[ok][order], y[ok][order]
+    else:
+        if not isinstance(window, (int, np.integer)):
+            raise ValueError("Time-based windows need times")
+        t = np.flatnonzero(ok)
+        xv, yv = x[ok], y[ok]
+
+    at_ns = None if at is None else pd.DatetimeIndex(pd.to_datetime(at)).as_unit('ns').asi8
+
+    # Centre on the overall means; windows are shift-invariant
+    if len(xv):
+        xv, yv = xv - xv.mean(), yv - yv.mean()
+        shift_x, shift_y = x[ok].mean(), y[ok].mean()
+    else:
+        shift_x = shift_y = 0.0
+    lo, hi = _window_bounds(t, window, at_ns, center)
+    n, wx, wy, sxx, syy, sxy = window_moments(xv, yv, lo, hi)
+    stats = _stats(n, wx + shift_x, wy + shift_y, sxx, syy, sxy, min_periods)
+
+    if times is not None:
+        ends = t if at_ns is None else at_ns
+        index = pd.DatetimeIndex(ends.astype('datetime64[ns]'), name='Timestamp')
+    else:
+        index = pd.Index(t, name='sample')
+    return pd.DataFrame(stats, index=index)[RESULT_COLUMNS]
+
+
+def rolling_sharp(db_path, y='R_VALUE', x='CBI', window='27D', step=None, min_periods=10,
+                  center=False, start=None, end=None):
+    """
+    Rolling correlation of two SWAN columns (or sharp_timeseries specs such
+    as 'log10(TOTPOT)').  step (e.g. '1D') evaluates the windows on a
+    regular grid instead of at every sample.
+    """
+    from sharp_timeseries import load_frame
+
+    df = load_frame(db_path, [y], x=x, require_all=False, start=start, end=end)
+    at = None
+    if step is not None and len(df):
+        at = pd.date_range(df['Timestamp'].iloc[0].ceil(step), df['Timestamp'].iloc[-1], freq=step)
+    return rolling_pearson(df[x], df[y], window, times=df['Timestamp'], min_periods=min_periods,
+                           at=at, center=center)
+
+
+if __name__ == '__main__':
+    import config
+
+    spec = sys.argv[1] if len(sys.argv) > 1 else 'R_VALUE'
+    window = sys.argv[2] if len(sys.argv) > 2 else '27D'
+    table = rolling_sharp(config.path('swan_cbi_db'), spec, window=window, step='1D')
+    print(table.dropna().describe().to_string())
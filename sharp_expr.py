@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 09:14:33 2026
+
+@author: kfrench
+
+Lazy expressions over SWAN SHARP keywords, evaluated inside SQLite.
+
+    q = (Query(db_path)
+         .select('CBI', ratio('TOTUSJZ', 'USFLUX'), log_totpot=log10('TOTPOT'))
+         .where(col('USFLUX') > 1e21)
+         .between('2012-01-01', '2013-01-01'))
+    df = q.to_frame()
+
+Nothing is read until to_frame().  The plan becomes one SELECT: the
+arithmetic is done in SQL, and every selected expression contributes its
+domain guards (keyword IS NOT NULL, denominator != 0, log argument > 0) to
+the WHERE clause.  So only the surviving rows and the computed columns
+leave SQLite, instead of every base column of every row.  Outputs
+named in allow_missing() are not filtered on; they come back NaN where
+undefined.
+
+parse_spec() turns the sharp_timeseries spec strings ('USFLUX',
+'log10(TOTPOT)', 'TOTUSJZ/USFLUX') into expressions with the same labels.
+"""
+
+import math
+import re
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+import swan_db
+
+
+def _sql_fallback(func):
+    """
+    Wrap a math function for SQLite: NULL in, or an argument outside the
+    domain, gives NULL like the built-in math functions.  SQLite may call
+    it before the WHERE guard that excludes such rows has been checked.
+    """
+    def fallback(x):
+        if x is None:
+            return None
+        try:
+            return func(x)
+        except (ValueError, TypeError, OverflowError):
+            return None
+    fallback.__name__ = func.__name__
+    return fallback
+
+
+SQL_FUNCTIONS = {
+    # name: (python fallback, domain guard on the argument)
+    'log10': (_sql_fallback(math.log10), '> 0'),
+    'ln': (_sql_fallback(math.log), '> 0'),
+    'sqrt': (_sql_fallback(math.sqrt), '>= 0'),
+    'abs': (abs, None),
+}
+NUMPY_FUNCTIONS = {'log10': np.log10, 'ln': np.log, 'sqrt': np.sqrt, 'abs': np.abs}
+BINARY_OPS = {'+': np.add, '-': np.subtract, '*': np.multiply, '/': np.divide}
+
+
+# === Expressions ===
+class Expr:
+    """
+    Base class: an SQL fragment plus the conditions under which it is
+    defined.
+    """
+
+    def sql(self):
+        raise NotImplementedError
+
+    def keywords(self):
+        raise NotImplementedError
+
+    def guards(self):
+        raise NotImplementedError
+
+    def label(self):
+        raise NotImplementedError
+
+    def evaluate(self, df):
+        """
+        The same expression in NumPy over the columns of df.
+        """
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.label()!r})"
+
+    # Arithmetic
+    def __add__(self, other):
+        return BinOp('+', self, other)
+
+    def __radd__(self, other):
+        return BinOp('+', other, self)
+
+    def __sub__(self, other):
+        return BinOp('-', self, other)
+
+    def __rsub__(self, other):
+        return BinOp('-', other, self)
+
+    def __mul__(self, other):
+        return BinOp('*', self, other)
+
+    def __rmul__(self, other):
+        return BinOp('*', other, self)
+
+    def __truediv__(self, other):
+        return BinOp('/', self, other)
+
+    def __rtruediv__(self, other):
+        return BinOp('/', other, self)
+
+    # Comparisons build filter conditions
+    def __gt__(self, other):
+        return Cond(f"{self.sql()} > {as_expr(other).sql()}", self, other)
+
+    def __ge__(self, other):
+        return Cond(f"{self.sql()} >= {as_expr(other).sql()}", self, other)
+
+    def __lt__(self, other):
+        return Cond(f"{self.sql()} < {as_expr(other).sql()}", self, other)
+
+    def __le__(self, other):
+        return Cond(f"{self.sql()} <= {as_expr(other).sql()}", self, other)
+
+
+class Col(Expr):
+    def __init__(self, name):
+        self.name = swan_db.check_keyword(name)
+
+    def sql(self):
+        return self.name
+
+    def keywords(self):
+        return (self.name,)
+
+    def guards(self):
+        return (f"{self.name} IS NOT NULL",)
+
+    def label(self):
+        return self.name
+
+    def evaluate(self, df):
+        return df[self.name].to_numpy(dtype=float)
+
+
+class Const(Expr):
+    def __init__(self, value):
+        self.value = float(value)
+
+    def sql(self):
+        return repr(self.value)
+
+    def keywords(self):
+        return ()
+
+    def guards(self):
+        return ()
+
+    def label(self):
+        return f"{self.value:g}"
+
+    def evaluate(self, df):
+        return np.full(len(df), self.value)
+
+
+class BinOp(Expr):
+    def __init__(self, op, left, right):
+        self.op, self.left, self.right = op, as_expr(left), as_expr(right)
+
+    def sql(self):
+        left = self.left.sql()
+        if self.op == '/':
+            # Integer columns would otherwise divide as integers
+            left = f"CAST({left} AS REAL)"
+        return f"({left} {self.op} {self.right.sql()})"
+
+    def keywords(self):
+        return _unique(self.left.keywords() + self.right.keywords())
+
+    def guards(self):
+        extra = (f"{self.right.sql()} != 0",) if self.op == '/' else ()
+        return _unique(self.left.guards() + self.right.guards() + extra)
+
+    def label(self):
+        return f"{self.left.label()}{self.op}{self.right.label()}"
+
+    def evaluate(self, df):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return BINARY_OPS[self.op](self.left.evaluate(df), self.right.evaluate(df))
+
+
+class Func(Expr):
+    def __init__(self, name, arg):
+        if name not in SQL_FUNCTIONS:
+            raise ValueError(f"Unknown function {name!r}, expected one of {tuple(SQL_FUNCTIONS)}")
+        self.name, self.arg = name, as_expr(arg)
+
+    def sql(self):
+        return f"{self.name}({self.arg.sql()})"
+
+    def keywords(self):
+        return self.arg.keywords()
+
+    def guards(self):
+        domain = SQL_FUNCTIONS[self.name][1]
+        extra = (f"{self.arg.sql()} {domain}",) if domain else ()
+        return _unique(self.arg.guards() + extra)
+
+    def label(self):
+        return f"{self.name}({self.arg.label()})"
+
+    def evaluate(self, df):
+        v = self.arg.evaluate(df)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out = NUMPY_FUNCTIONS[self.name](v)
+        domain = SQL_FUNCTIONS[self.name][1]
+        if domain == '> 0':
+            out[~(v > 0)] = np.nan
+        elif domain == '>= 0':
+            out[~(v >= 0)] = np.nan
+        return out
+
+
+class Cond:
+    """
+    A WHERE condition; combine with & and |.
+    """
+
+    def __init__(self, sql, *operands):
+        self._sql = sql
+        self._keywords = _unique(sum((as_expr(o).keywords() for o in operands), ()))
+
+    def sql(self):
+        return self._sql
+
+    def keywords(self):
+        return self._keywords
+
+    def __and__(self, other):
+        return Cond(f"({self.sql()} AND {other.sql()})", _Keywords(self, other))
+
+    def __or__(self, other):
+        return Cond(f"({self.sql()} OR {other.sql()})", _Keywords(self, other))
+
+    def __repr__(self):
+        return f"Cond({self._sql!r})"
+
+
+class _Keywords(Expr):
+    # Carries the keywords of combined conditions
+    def __init__(self, *conds):
+        self._keywords = _unique(sum((c.keywords() for c in conds), ()))
+
+    def keywords(self):
+        return self._keywords
+
+
+def _unique(items):
+    return tuple(dict.fromkeys(items))
+
+
+def as_expr(value):
+    if isinstance(value, Expr):
+        return value
+    if isinstance(value, str):
+        return parse_spec(value)
+    return Const(value)
+
+
+def col(name):
+    return Col(name)
+
+
+def ratio(num, den):
+    return BinOp('/', as_expr(num), as_expr(den))
+
+
+def log10(arg):
+    return Func('log10', arg)
+
+
+def ln(arg):
+    return Func('ln', arg)
+
+
+def sqrt(arg):
+    return Func('sqrt', arg)
+
+
+_LOG10 = re.compile(r'^log10\((\w+)\)$')
+_RATIO = re.compile(r'^(\w+)\s*/\s*(\w+)$')
+_PLAIN = re.compile(r'^(\w+)$')
+
+
+def parse_spec(spec):
+    """
+    Expression for a sharp_timeseries spec: 'KW', 'log10(KW)' or 'A/B'.
+    """
+    spec = spec.strip()
+    m = _LOG10.match(spec)
+    if m:
+        return log10(Col(m.group(1)))
+    m = _RATIO.match(spec)
+    if m:
+        return ratio(Col(m.group(1)), Col(m.group(2)))
+    if _PLAIN.match(spec):
+        return Col(spec)
+    raise ValueError(f"Cannot parse keyword spec {spec!r}")
+
+
+# === Query plan ===
+def ensure_functions(conn):
+    """
+    Register Python fallbacks on SQLite builds without the math functions.
+    """
+    for name, (func, _) in SQL_FUNCTIONS.items():
+        if name == 'abs':
+            continue
+        try:
+            conn.execute(f"SELECT {name}(1.0)")
+        except sqlite3.OperationalError:
+            conn.create_function(name, 1, func, deterministic=True)
+
+
+class Query:
+    """
+    Immutable, lazy SELECT over solar_flare_data.  Each method returns a
+    new Query.
+    """
+
+    def __init__(self, db_path, outputs=None, conditions=(), bounds=None, optional=()):
+        self.db_path = db_path
+        self.outputs = dict(outputs or {})
+        self.conditions = tuple(conditions)
+        self.bounds = bounds
+        self.optional = frozenset(optional)
+
+    def _replace(self, **changes):
+        state = dict(outputs=self.outputs, conditions=self.conditions, bounds=self.bounds,
+                     optional=self.optional)
+        state.update(changes)
+        return Query(self.db_path, **state)
+
+    def select(self, *exprs, **named):
+        """
+        Add output columns: expressions or spec strings (named by their
+        label) and name=expression pairs.
+        """
+        outputs = dict(self.outputs)
+        for e in exprs:
+            e = as_expr(e)
+            outputs[e.label()] = e
+        outputs.update({name: as_expr(e) for name, e in named.items()})
+        return self._replace(outputs=outputs)
+
+    def where(self, *conds):
+        return self._replace(conditions=self.conditions + conds)
+
+    def between(self, start, end):
+        return self._replace(bounds=(str(start), str(end)))
+
+    def allow_missing(self, *names):
+        """
+        Outputs that may be undefined on a row without dropping it.
+        """
+        return self._replace(optional=self.optional | set(names))
+
+    def keywords(self):
+        kws = ()
+        for e in self.outputs.values():
+            kws += e.keywords()
+        for c in self.conditions:
+            kws += c.keywords()
+        return _unique(kws)
+
+    def to_sql(self, epoch=False):
+        """
+        The SQL text and its parameters.  epoch=True selects Timestamp as
+        Unix seconds (swan_db.EPOCH_SQL) in a column named epoch.
+        """
+        cols = [f"{swan_db.EPOCH_SQL} AS epoch" if epoch else 'Timestamp']
+        where = []
+        for name, e in self.outputs.items():
+            if name in self.optional:
+                guard = ' AND '.join(e.guards())
+                expr = f"CASE WHEN {guard} THEN {e.sql()} END" if guard else e.sql()
+            else:
+                expr = e.sql()
+                where += [g for g in e.guards() if g not in where]
+            cols.append(f'{expr} AS "{name}"')
+        where += [c.sql() for c in self.conditions]
+        params = ()
+        if self.bounds is not None:
+            where.append("Timestamp BETWEEN ? AND ?")
+            params = self.bounds
+        sql = f"SELECT {', '.join(cols)} FROM {swan_db.TABLE}"
+        if where:
+            sql += " WHERE " + ' AND '.join(where)
+        return sql + " ORDER BY Timestamp", params
+
+    def explain(self):
+        sql, params = self.to_sql()
+        with swan_db.pooled(self.db_path) as conn:
+            ensure_functions(conn)
+            return swan_db.explain(conn, sql, params)
+
+    def to_frame(self):
+        """
+        Run the plan.  Non-finite results (overflow, inf stored in the
+        table) come back as NaN; rows where a required output is NaN are
+        dropped.
+        """
+        sql, params = self.to_sql()
+        with swan_db.pooled(self.db_path) as conn:
+            ensure_functions(conn)
+            df = swan_db.read_frame(conn, sql, params)
+        names = list(self.outputs)
+        for name in names:
+            values = pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=float, copy=True)
+            values[~np.isfinite(values)] = np.nan
+            df[name] = values
+        required = [n for n in names if n not in self.optional]
+        if required:
+            df = df.dropna(subset=required).reset_index(drop=True)
+        return df
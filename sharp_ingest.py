@@ -0,0 +1,511 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 13:22:05 2026
+
+@author: kfrench
+
+Asynchronous ingest of SHARP keyword records into a SWAN database.
+
+Records come from a directory of per-HARP files (<HARPNUM>.csv, .json or
+.jsonl, one record per row with Timestamp or T_REC, HARPNUM and keyword
+columns) or from an HTTP server exposing the same data:
+
+    GET <base>/harpnums                          -> JSON list of HARPNUMs
+    GET <base>/sharp/<HARPNUM>?start=..&end=..   -> JSON list of records
+
+serve() is a local stand-in for such a server over a directory.
+
+The work is split into (HARPNUM, time range) tasks that are fetched
+concurrently under a semaphore.  A single writer inserts the rows into
+solar_flare_data with executemany, many tasks per transaction, and records
+each task in a checkpoint table in the same transaction, so an interrupted
+ingest resumes where it stopped.  A UNIQUE (HARPNUM, Timestamp) index and
+INSERT OR IGNORE keep rows unique whatever the task ranges: a record that
+is already stored, e.g. from a run with a different --start/--end or
+--chunk-days, is skipped and counted as a duplicate.  A table that already
+holds duplicate (HARPNUM, Timestamp) rows is refused unless dedupe=True
+(--dedupe), which deletes all but the earliest copy of each.  The
+database's journal mode is left as it is.  Keyword columns
+missing from the table are added as REAL, and existing sharp_rollup tables
+are brought up to date at the end.
+
+    python sharp_ingest.py /data/sharp_csv --start 2011-01-01 --end 2012-01-01
+    python sharp_ingest.py http://localhost:8765 --concurrency 32
+    python sharp_ingest.py /data/sharp_csv --serve 8765
+    python sharp_ingest.py /data/sharp_csv --dedupe   # old table with duplicates
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+import urllib.request
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+from functools import lru_cache
+
+import pandas as pd
+
+import config
+import sharp_rollup
+import swan_db
+from window_join import TIME_FMT
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_TABLE = 'sharp_ingest_checkpoint'
+UNIQUE_INDEX = f'idx_{swan_db.TABLE}_HARPNUM_Timestamp'
+CONCURRENCY = 16
+BATCH_ROWS = 50_000
+CHUNK_DAYS = 30
+TIME_KEYS = ('Timestamp', 'T_REC')
+FILE_TYPES = ('.csv', '.json', '.jsonl')
+MIN_TIME = '0000-01-01 00:00:00'
+MAX_TIME = '9999-12-31 23:59:59'
+
+Task = namedtuple('Task', 'harpnum start end')
+
+
+def task_key(task):
+    return f"{task.harpnum}:{task.start}:{task.end}"
+
+
+def plan_tasks(harpnums, start=None, end=None, chunk_days=CHUNK_DAYS):
+    """
+    One task per HARPNUM and chunk_days slice of [start, end).  Without a
+    start/end each HARP is a single task.
+    """
+    if start is None or end is None:
+        bounds = [(pd.Timestamp(start).strftime(TIME_FMT) if start is not None else MIN_TIME,
+                   pd.Timestamp(end).strftime(TIME_FMT) if end is not None else MAX_TIME)]
+    else:
+        edges = pd.date_range(pd.Timestamp(start), pd.Timestamp(end), freq=f"{chunk_days}D")
+        edges = edges.append(pd.DatetimeIndex([pd.Timestamp(end)])).unique()
+        edges = edges.strftime(TIME_FMT)
+        bounds = list(zip(edges[:-1], edges[1:]))
+    return [Task(int(h), lo, hi) for h in harpnums for lo, hi in bounds]
+
+
+# === Records ===
+def parse_timestamp(value):
+    """
+    Timestamp in TIME_FMT from TIME_FMT strings, JSOC T_REC
+    ('2012.03.07_00:00:00_TAI') or anything pandas can parse.
+    """
+    s = str(value).strip()
+    if len(s) == 19 and s[4] == '-' and s[10] == ' ':
+        return s
+    if s.endswith('_TAI') and len(s) >= 23:
+        return s[:10].replace('.', '-') + ' ' + s[11:19]
+    return pd.Timestamp(s).strftime(TIME_FMT)
+
+
+def record_time(record):
+    for key in TIME_KEYS:
+        if record.get(key) not in (None, ''):
+            return parse_timestamp(record[key])
+    raise ValueError(f"Record has no {' or '.join(TIME_KEYS)}: {record!r}")
+
+
+def _as_float(value):
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def numeric_keywords(records):
+    """
+    Fields of records that hold numbers in every record that has them.
+    """
+    skip = set(TIME_KEYS) | {'HARPNUM'}
+    seen, bad = set(), set()
+    for record in records:
+        for key, value in record.items():
+            if key in skip or value is None or value == '':
+                continue
+            seen.add(key)
+            if _as_float(value) is None:
+                bad.add(key)
+    return sorted(k for k in seen - bad if k.replace('_', '').isalnum())
+
+
+def parse_records(text, kind):
+    """
+    Records from a CSV, JSON array or JSON-lines payload.
+    """
+    if kind == '.csv':
+        return list(csv.DictReader(io.StringIO(text)))
+    text = text.strip()
+    if not text:
+        return []
+    if kind == '.json' or text[0] == '[':
+        data = json.loads(text)
+        return data['records'] if isinstance(data, dict) else data
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def in_range(records, start, end):
+    """
+    Records with start <= Timestamp < end, with Timestamp normalized.
+    """
+    out = []
+    for record in records:
+        t = record_time(record)
+        if start <= t < end:
+            record = dict(record)
+            record['Timestamp'] = t
+            out.append(record)
+    return out
+
+
+# === Sources ===
+class DirectorySource:
+    """
+    <root>/<HARPNUM>.csv|.json|.jsonl files.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._cached = lru_cache(maxsize=2 * CONCURRENCY)(self._read_file)
+        self._locks = defaultdict(threading.Lock)
+
+    def _read(self, harpnum):
+        # Concurrent tasks of one HARP wait for a single read of its file
+        with self._locks[harpnum]:
+            return self._cached(harpnum)
+
+    def harpnums(self):
+        stems = {os.path.splitext(name) for name in os.listdir(self.root)}
+        return sorted(int(stem) for stem, ext in stems if ext in FILE_TYPES and stem.isdigit())
+
+    def _read_file(self, harpnum):
+        """
+        Records of one HARP with Timestamp normalized, sorted by time, plus
+        their sorted timestamps (so each task is a bisect, not a scan).
+        """
+        for ext in FILE_TYPES:
+            path = os.path.join(self.root, f"{harpnum}{ext}")
+            if os.path.exists(path):
+                with open(path, encoding='utf-8') as fh:
+                    records = in_range(parse_records(fh.read(), ext), MIN_TIME, MAX_TIME)
+                records.sort(key=lambda r: r['Timestamp'])
+                return [r['Timestamp'] for r in records], records
+        raise FileNotFoundError(f"No SHARP file for HARP {harpnum} in {self.root}")
+
+    def records(self, task):
+        times, records = self._read(task.harpnum)
+        return records[bisect_left(times, task.start):bisect_left(times, task.end)]
+
+    async def fetch(self, task):
+        return await asyncio.to_thread(self.records, task)
+
+
+class HttpSource:
+    """
+    HTTP endpoint laid out like serve().
+    """
+
+    def __init__(self, base_url, timeout=60):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def _get(self, path, params=None):
+        url = f"{self.base_url}/{path}"
+        if params:
+            url += '?' + urllib.parse.urlencode(params)
+        with urllib.request.urlopen(url, timeout=self.timeout) as resp:
+            text = resp.read().decode('utf-8')
+            kind = '.csv' if 'csv' in resp.headers.get('Content-Type', '') else '.json'
+        return parse_records(text, kind)
+
+    def harpnums(self):
+        return [int(h) for h in self._get('harpnums')]
+
+    def records(self, task):
+        records = self._get(f"sharp/{task.harpnum}", {'start': task.start, 'end': task.end})
+        return in_range(records, task.start, task.end)
+
+    async def fetch(self, task):
+        return await asyncio.to_thread(self.records, task)
+
+
+def open_source(spec):
+    if spec.startswith(('http://', 'https://')):
+        return HttpSource(spec)
+    return DirectorySource(spec)
+
+
+def serve(root, port=8765, host='127.0.0.1'):
+    """
+    Serve a DirectorySource over HTTP (stand-in for a remote archive).
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    source = DirectorySource(root)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urllib.parse.urlparse(self.path)
+            query = dict(urllib.parse.parse_qsl(url.query))
+            parts = url.path.strip('/').split('/')
+            try:
+                if parts == ['harpnums']:
+                    body = source.harpnums()
+                elif len(parts) == 2 and parts[0] == 'sharp':
+                    task = Task(int(parts[1]), query.get('start', MIN_TIME), query.get('end', MAX_TIME))
+                    body = source.records(task)
+                else:
+                    self.send_error(404)
+                    return
+            except FileNotFoundError:
+                self.send_error(404)
+                return
+            payload = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, fmt, *args):
+            logger.debug(fmt, *args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    logger.info("Serving %s on http://%s:%d", root, host, server.server_address[1])
+    return server
+
+
+# === Writer ===
+class Writer:
+    """
+    Owns the single writable connection.  Only one write() runs at a time.
+    dedupe=True allows deleting duplicate (HARPNUM, Timestamp) rows already
+    in the table; otherwise they raise ValueError.
+    """
+
+    def __init__(self, db_path, keywords=None, dedupe=False):
+        self.keywords = None if keywords is None else [swan_db.check_keyword(k) for k in keywords]
+        self.conn = sqlite3.connect(db_path, check_same_thread=False,
+                                    cached_statements=swan_db.STATEMENT_CACHE)
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {swan_db.TABLE} "
+                          "(Timestamp TEXT, HARPNUM INTEGER)")
+        self.columns = {row[1] for row in self.conn.execute(f"PRAGMA table_info({swan_db.TABLE})")}
+        missing = {'Timestamp', 'HARPNUM'} - self.columns
+        if missing:
+            self.conn.close()
+            raise ValueError(f"{db_path}: {swan_db.TABLE} has no {', '.join(sorted(missing))} column")
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} ("
+                          "task TEXT PRIMARY KEY, harpnum INTEGER, start TEXT, end TEXT, "
+                          "rows INTEGER, finished TEXT)")
+        self.conn.commit()
+        self.duplicates = 0
+        try:
+            self.removed = self._ensure_unique(dedupe)
+        except ValueError:
+            self.conn.close()
+            raise
+
+    def _ensure_unique(self, dedupe):
+        """
+        Create the UNIQUE (HARPNUM, Timestamp) index.  Duplicates already in
+        the table (from ingests before the index existed) raise ValueError,
+        or with dedupe are deleted first, keeping the earliest row.  Returns
+        the number of rows deleted.
+        """
+        create = (f"CREATE UNIQUE INDEX IF NOT EXISTS {UNIQUE_INDEX} "
+                  f"ON {swan_db.TABLE} (HARPNUM, Timestamp)")
+        try:
+            with self.conn:
+                self.conn.execute(create)
+            return 0
+        except sqlite3.IntegrityError:
+            pass
+        if not dedupe:
+            extra = self.conn.execute(
+                f"SELECT COUNT(*) - COUNT(DISTINCT HARPNUM || ' ' || Timestamp) FROM {swan_db.TABLE} "
+                "WHERE HARPNUM IS NOT NULL AND Timestamp IS NOT NULL").fetchone()[0]
+            raise ValueError(f"{swan_db.TABLE} holds {extra} duplicate (HARPNUM, Timestamp) rows; "
+                             "rerun with dedupe=True (--dedupe) to delete them")
+        with self.conn:
+            removed = self.conn.execute(
+                f"DELETE FROM {swan_db.TABLE} WHERE HARPNUM IS NOT NULL AND Timestamp IS NOT NULL "
+                f"AND rowid NOT IN (SELECT MIN(rowid) FROM {swan_db.TABLE} "
+                "GROUP BY HARPNUM, Timestamp)").rowcount
+            self.conn.execute(create)
+        logger.warning("Deleted %d duplicate (HARPNUM, Timestamp) rows", removed)
+        return removed
+
+    def finished(self):
+        return {key for (key,) in self.conn.execute(f"SELECT task FROM {CHECKPOINT_TABLE}")}
+
+    def _ensure_columns(self, keywords):
+        for kw in keywords:
+            if kw not in self.columns:
+                self.conn.execute(f"ALTER TABLE {swan_db.TABLE} ADD COLUMN {kw} REAL")
+                self.columns.add(kw)
+                logger.info("Added column %s", kw)
+
+    def write(self, batch):
+        """
+        Insert the records of a list of (task, records) and checkpoint the
+        tasks, all in one transaction.  Records already stored are skipped.
+        Returns the number of rows inserted.
+        """
+        records = [r for _, recs in batch for r in recs]
+        keywords = self.keywords or numeric_keywords(records)
+        cols = ['Timestamp', 'HARPNUM'] + keywords
+        sql = (f"INSERT OR IGNORE INTO {swan_db.TABLE} ({', '.join(cols)}) "
+               f"VALUES ({', '.join('?' * len(cols))})")
+        now = time.strftime(TIME_FMT)
+        inserted = []
+        with self.conn:
+            self._ensure_columns(keywords)
+            for task, recs in batch:
+                before = self.conn.total_changes
+                self.conn.executemany(sql, ((r['Timestamp'], task.harpnum,
+                                             *(_as_float(r.get(k)) for k in keywords))
+                                            for r in recs))
+                inserted.append(self.conn.total_changes - before)
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO {CHECKPOINT_TABLE} VALUES (?, ?, ?, ?, ?, ?)",
+                [(task_key(t), t.harpnum, t.start, t.end, n, now)
+                 for (t, _), n in zip(batch, inserted)])
+        self.duplicates += len(records) - sum(inserted)
+        return sum(inserted)
+
+    def finish(self):
+        swan_db.ensure_indexes(self.conn)
+        if sharp_rollup.has_rollups(self.conn):
+            # Only the hours the new rows fall in are re-aggregated, unless
+            # duplicates were deleted (rollups don't see deletions)
+            sharp_rollup.update(self.conn, full=bool(self.removed))
+        self.conn.close()
+
+
+async def ingest(source, db_path, tasks, keywords=None, concurrency=CONCURRENCY,
+                 batch_rows=BATCH_ROWS, dedupe=False):
+    """
+    Fetch tasks from source with at most `concurrency` requests in flight
+    and write them to db_path.  Tasks already checkpointed are skipped;
+    failed tasks are logged and left for the next run.  Returns a summary
+    dict with tasks, rows (inserted), duplicates (skipped), removed
+    (existing duplicates deleted with dedupe), failed, seconds and
+    rows_per_s.
+    """
+    writer = Writer(db_path, keywords, dedupe)
+    done = writer.finished()
+    todo = [t for t in tasks if task_key(t) not in done]
+    logger.info("%d tasks, %d already done", len(tasks), len(tasks) - len(todo))
+
+    sem = asyncio.Semaphore(concurrency)
+    queue = asyncio.Queue(maxsize=2 * concurrency)
+    t0 = time.perf_counter()
+    totals = {'rows': 0, 'tasks': 0}
+    failed = []
+
+    async def fetch(task):
+        try:
+            async with sem:
+                records = await source.fetch(task)
+        except Exception as err:
+            logger.warning("HARP %d %s..%s failed: %r", task.harpnum, task.start, task.end, err)
+            failed.append(task)
+            return
+        await queue.put((task, records))
+
+    async def flush(pending):
+        totals['rows'] += await asyncio.to_thread(writer.write, pending)
+        totals['tasks'] += len(pending)
+        elapsed = time.perf_counter() - t0
+        logger.info("%d/%d tasks, %d rows, %.0f rows/s", totals['tasks'], len(todo),
+                    totals['rows'], totals['rows'] / elapsed)
+
+    async def write():
+        pending, n, error = [], 0, None
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            if error is not None:
+                continue  # keep draining so fetchers never block
+            pending.append(item)
+            n += len(item[1])
+            if n >= batch_rows:
+                try:
+                    await flush(pending)
+                except Exception as err:
+                    error = err
+                pending, n = [], 0
+        if pending and error is None:
+            await flush(pending)
+        if error is not None:
+            raise error
+
+    writer_task = asyncio.create_task(write())
+    try:
+        await asyncio.gather(*(fetch(t) for t in todo))
+        await queue.put(None)
+        await writer_task
+    finally:
+        await asyncio.to_thread(writer.finish)
+
+    elapsed = time.perf_counter() - t0
+    return {
+        'tasks': totals['tasks'],
+        'rows': totals['rows'],
+        'duplicates': writer.duplicates,
+        'removed': writer.removed,
+        'failed': len(failed),
+        'seconds': elapsed,
+        'rows_per_s': totals['rows'] / elapsed if elapsed > 0 else float('nan'),
+    }
+
+
+def run(source, db_path=None, harpnums=None, start=None, end=None, chunk_days=CHUNK_DAYS,
+        keywords=None, concurrency=CONCURRENCY, batch_rows=BATCH_ROWS, dedupe=False):
+    """
+    Synchronous wrapper: plan the tasks and run ingest().
+    """
+    source = open_source(source) if isinstance(source, str) else source
+    db_path = db_path or config.path('swan_db')
+    harpnums = harpnums or source.harpnums()
+    tasks = plan_tasks(harpnums, start, end, chunk_days)
+    return asyncio.run(ingest(source, db_path, tasks, keywords, concurrency, batch_rows, dedupe))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Ingest SHARP records into the SWAN database.')
+    parser.add_argument('source', help='directory of <HARPNUM>.csv/.json files or http(s) URL')
+    parser.add_argument('--db', help="target database (default: config path 'swan_db')")
+    parser.add_argument('--harpnum', type=int, nargs='+', help='default: every HARP in the source')
+    parser.add_argument('--start')
+    parser.add_argument('--end')
+    parser.add_argument('--chunk-days', type=int, default=CHUNK_DAYS)
+    parser.add_argument('--keywords', nargs='+', help='default: every numeric field')
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY)
+    parser.add_argument('--batch-rows', type=int, default=BATCH_ROWS)
+    parser.add_argument('--dedupe', action='store_true',
+                        help='delete duplicate (HARPNUM, Timestamp) rows already in the table')
+    parser.add_argument('--serve', type=int, metavar='PORT', help='serve the source directory instead')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if args.serve is not None:
+        serve(args.source, args.serve).serve_forever()
+    else:
+        summary = run(args.source, args.db, args.harpnum, args.start, args.end, args.chunk_days,
+                      args.keywords, args.concurrency, args.batch_rows, args.dedupe)
+        print(f"{summary['rows']} rows from {summary['tasks']} tasks in {summary['seconds']:.1f} s "
+              f"({summary['rows_per_s']:.0f} rows/s), {summary['duplicates']} duplicates skipped, "
+              f"{summary['removed']} existing duplicates deleted, {summary['failed']} failed")
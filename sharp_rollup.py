@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 16:48:19 2026
+
+@author: kfrench
+
+Hourly / daily / monthly rollups of solar_flare_data for range queries.
+
+For every numeric keyword (SHARP keywords and CBI) and every hour, day and
+month, the sharp_rollup_<level> tables hold the sample count, sum, sum of
+squares, min and max.  They live next to solar_flare_data in the SWAN
+database.  Hours are rolled up from the raw rows, days from hours and
+months from days, all inside SQLite.
+
+Updates are incremental on rowid.  The state table remembers the highest
+rowid rolled up per keyword; an update re-aggregates only the hours that
+rows above it fall in (in any time order, as sharp_ingest writes them
+HARP by HARP), then the days and months holding those hours.  Deleted or
+edited rows are not detected; use full=True (--full) after rewriting the
+table.  sharp_ingest updates existing rollups after each ingest.
+
+series() answers a range query at a requested resolution from the
+coarsest level whose buckets fit it: month buckets for month-start
+frequencies ('MS', '3MS', 'QS', 'YS'), day buckets for multiples of a day,
+hour buckets for multiples of an hour, raw rows below that.  The range
+edges that don't fill a whole bucket come from the next finer level, down
+to raw rows, and rows added since the last update are read raw, so
+results are exact.  Standard deviations come from the sum of squares and
+lose relative precision when a bin's spread is tiny next to its mean.
+
+    python sharp_rollup.py                       # build / update
+    python sharp_rollup.py --query USFLUX --resolution MS --start 2012-01-01
+"""
+
+import argparse
+import logging
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+import config
+import instrument
+import swan_db
+from window_join import TIME_FMT
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'sharp_rollup'
+STATE_TABLE = f'{PREFIX}_state'
+DIRTY_TABLE = f'{PREFIX}_dirty'
+
+# level -> (bucket of a Timestamp string, SQLite modifier to the next bucket, pandas floor)
+LEVELS = {
+    'hour': ("substr({col}, 1, 13) || ':00:00'", '+1 hour', lambda t: t.floor('h')),
+    'day': ("substr({col}, 1, 10) || ' 00:00:00'", '+1 day', lambda t: t.floor('D')),
+    'month': ("substr({col}, 1, 7) || '-01 00:00:00'", '+1 month',
+              lambda t: t.to_period('M').to_timestamp()),
+}
+# Each level is rolled up from the one before it
+BUILD_ORDER = ('hour', 'day', 'month')
+STATS = ('n', 'sum_value', 'sumsq_value', 'min_value', 'max_value')
+MONTHLY_OFFSETS = (pd.offsets.MonthBegin, pd.offsets.QuarterBegin, pd.offsets.YearBegin)
+
+
+def table(level):
+    return f'{PREFIX}_{level}'
+
+
+SCHEMA = ''.join(f"""
+CREATE TABLE IF NOT EXISTS {table(level)} (
+    keyword TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    sum_value REAL NOT NULL,
+    sumsq_value REAL NOT NULL,
+    min_value REAL,
+    max_value REAL,
+    PRIMARY KEY (keyword, bucket)
+) WITHOUT ROWID;""" for level in BUILD_ORDER) + f"""
+CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+    keyword TEXT PRIMARY KEY,
+    max_rowid INTEGER NOT NULL,
+    updated TEXT NOT NULL
+);
+"""
+
+
+def has_rollups(conn):
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                       (STATE_TABLE,)).fetchone()
+    return row is not None
+
+
+def rolled_up_to(conn, keyword):
+    """
+    Highest rowid of solar_flare_data included in keyword's rollups (0 if
+    it has none).
+    """
+    if not has_rollups(conn):
+        return 0
+    row = conn.execute(f"SELECT max_rowid FROM {STATE_TABLE} WHERE keyword = ?",
+                       (keyword,)).fetchone()
+    return row[0] if row else 0
+
+
+# === Building ===
+def _mark_dirty(conn, level, sql, params=()):
+    """
+    Add the buckets [lo, hi) of level selected by sql (one lo column).
+    """
+    modifier = LEVELS[level][1]
+    conn.execute(f"INSERT OR IGNORE INTO temp.{DIRTY_TABLE} "
+                 f"SELECT '{level}', lo, datetime(lo, '{modifier}') FROM ({sql})", params)
+
+
+def _roll_hours(conn, keywords, since):
+    """
+    Hour buckets from the raw rows: every hour when since is None,
+    otherwise the dirty hours.
+    """
+    aggs = ', '.join(f"COUNT({k}) AS n{i}, TOTAL({k}) AS s{i}, TOTAL(CAST({k} AS REAL) * {k}) AS q{i}, "
+                     f"MIN({k}) AS lo{i}, MAX({k}) AS hi{i}" for i, k in enumerate(keywords))
+    if since is None:
+        bucket = LEVELS['hour'][0].format(col='Timestamp')
+        sql = (f"SELECT {bucket} AS bucket, {aggs} FROM {swan_db.TABLE} "
+               "WHERE Timestamp IS NOT NULL GROUP BY bucket")
+    else:
+        # CROSS JOIN keeps the dirty buckets as the outer loop
+        sql = (f"SELECT d.lo AS bucket, {aggs} FROM temp.{DIRTY_TABLE} AS d "
+               f"CROSS JOIN {swan_db.TABLE} ON Timestamp >= d.lo AND Timestamp < d.hi "
+               "WHERE d.level = 'hour' GROUP BY d.lo")
+    # One pass over the raw rows for all keywords, then one insert per keyword
+    conn.execute(f"DROP TABLE IF EXISTS temp.{PREFIX}_wide")
+    conn.execute(f"CREATE TEMP TABLE {PREFIX}_wide AS {sql}")
+    for i, k in enumerate(keywords):
+        conn.execute(f"INSERT OR REPLACE INTO {table('hour')} "
+                     f"SELECT ?, bucket, n{i}, s{i}, q{i}, lo{i}, hi{i} FROM temp.{PREFIX}_wide "
+                     f"WHERE n{i} > 0", (k,))
+    conn.execute(f"DROP TABLE temp.{PREFIX}_wide")
+
+
+def _roll_level(conn, level, source, keywords, incremental):
+    """
+    level buckets from the buckets of the finer source level.
+    """
+    marks = ', '.join('?' * len(keywords))
+    totals = ("SUM(s.n), SUM(s.sum_value), SUM(s.sumsq_value), "
+              "MIN(s.min_value), MAX(s.max_value)")
+    if incremental:
+        _mark_dirty(conn, level, f"SELECT DISTINCT {LEVELS[level][0].format(col='lo')} AS lo "
+                                 f"FROM temp.{DIRTY_TABLE} WHERE level = '{source}'")
+        sql = (f"SELECT s.keyword, d.lo, {totals} FROM temp.{DIRTY_TABLE} AS d "
+               f"CROSS JOIN {table(source)} AS s ON s.keyword IN ({marks}) "
+               "AND s.bucket >= d.lo AND s.bucket < d.hi "
+               f"WHERE d.level = '{level}' GROUP BY s.keyword, d.lo")
+    else:
+        bucket = LEVELS[level][0].format(col='s.bucket')
+        sql = (f"SELECT s.keyword, {bucket} AS b, {totals} FROM {table(source)} AS s "
+               f"WHERE s.keyword IN ({marks}) GROUP BY s.keyword, b")
+    conn.execute(f"INSERT OR REPLACE INTO {table(level)} {sql}", keywords)
+
+
+def _roll(conn, keywords, since):
+    keywords = list(keywords)
+    if since is None:
+        marks = ', '.join('?' * len(keywords))
+        for level in BUILD_ORDER:
+            conn.execute(f"DELETE FROM {table(level)} WHERE keyword IN ({marks})", keywords)
+    else:
+        conn.execute(f"DELETE FROM temp.{DIRTY_TABLE}")
+        bucket = LEVELS['hour'][0].format(col='Timestamp')
+        _mark_dirty(conn, 'hour', f"SELECT DISTINCT {bucket} AS lo FROM {swan_db.TABLE} "
+                                  "WHERE rowid > ? AND Timestamp IS NOT NULL", (since,))
+    _roll_hours(conn, keywords, since)
+    for source, level in zip(BUILD_ORDER, BUILD_ORDER[1:]):
+        _roll_level(conn, level, source, keywords, since is not None)
+
+
+@instrument.timed('rollup.update')
+def update(conn, keywords=None, full=False):
+    """
+    Bring the rollups up to date on a writable connection to the SWAN
+    database.  keywords defaults to every numeric column.  Returns
+    {keyword: 'full' | 'incremental' | 'current'}.
+    """
+    conn.executescript(SCHEMA)
+    conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {DIRTY_TABLE} "
+                 "(level TEXT, lo TEXT, hi TEXT, PRIMARY KEY (level, lo))")
+    keywords = [swan_db.check_keyword(k) for k in (keywords or swan_db.numeric_columns(conn))]
+    top = conn.execute(f"SELECT MAX(rowid) FROM {swan_db.TABLE}").fetchone()[0] or 0
+
+    # Keywords rolled up to the same rowid are updated together
+    groups = {}
+    for k in keywords:
+        done = 0 if full else rolled_up_to(conn, k)
+        if done > top:
+            # The table was rebuilt with fewer rows
+            done = 0
+        groups.setdefault(done, []).append(k)
+
+    status = {}
+    for done, group in sorted(groups.items()):
+        if done == top and top > 0:
+            status.update(dict.fromkeys(group, 'current'))
+            continue
+        t0 = time.perf_counter()
+        with conn:
+            _roll(conn, group, None if done == 0 else done)
+            now = time.strftime(TIME_FMT)
+            conn.executemany(f"INSERT OR REPLACE INTO {STATE_TABLE} VALUES (?, ?, ?)",
+                             [(k, top, now) for k in group])
+        mode = 'full' if done == 0 else 'incremental'
+        status.update(dict.fromkeys(group, mode))
+        logger.info("%s rollup of %s in %.1f s", mode, ', '.join(group), time.perf_counter() - t0)
+    return status
+
+
+def refresh(db_path=None, keywords=None, full=False):
+    """
+    update() on a new writable connection to db_path (default: config path
+    'swan_db').
+    """
+    conn = sqlite3.connect(db_path or config.path('swan_db'), timeout=60,
+                           cached_statements=swan_db.STATEMENT_CACHE)
+    try:
+        swan_db.ensure_indexes(conn)
+        return update(conn, keywords, full)
+    finally:
+        conn.close()
+
+
+# === Range queries ===
+def levels_for(resolution):
+    """
+    The offset for resolution and the rollup levels whose buckets nest in
+    its bins, coarsest first (empty: raw rows only).
+    """
+    offset = pd.tseries.frequencies.to_offset(resolution)
+    if isinstance(offset, (pd.offsets.Tick, pd.offsets.Day)):
+        # Day is a calendar offset, not a Tick, in pandas >= 3
+        nanos = offset.n * pd.Timedelta('1D').value if isinstance(offset, pd.offsets.Day) else offset.nanos
+        if nanos % pd.Timedelta('1D').value == 0:
+            return offset, ('day', 'hour')
+        if nanos % pd.Timedelta('1h').value == 0:
+            return offset, ('hour',)
+        return offset, ()
+    if isinstance(offset, MONTHLY_OFFSETS):
+        return offset, ('month', 'day', 'hour')
+    raise ValueError(f"Unsupported resolution {resolution!r}: use a fixed frequency ('1h', '6h', "
+                     "'1D', '7D') or a month-start one ('MS', '3MS', 'QS', 'YS')")
+
+
+def _fmt(t):
+    return t.strftime(TIME_FMT)
+
+
+def _next_bucket(level, t):
+    return t + (pd.offsets.MonthBegin(1) if level == 'month' else pd.Timedelta(LEVELS[level][1][1:]))
+
+
+def _level_rows(conn, level, keyword, lo, hi):
+    sql = (f"SELECT bucket AS Timestamp, {', '.join(STATS)} FROM {table(level)} "
+           "WHERE keyword = ? AND bucket >= ? AND bucket < ?")
+    return swan_db.read_frame(conn, sql, (keyword, _fmt(lo), _fmt(hi)))
+
+
+def _raw_rows(conn, keyword, lo, hi, rowids):
+    """
+    Raw samples in [lo, hi) as one-sample partial aggregates.  rowids is
+    ('<=', n) for rows covered by the rollups or ('>', n) for newer ones.
+    """
+    op, n = rowids
+    sql = (f"SELECT Timestamp, {keyword} AS v FROM {swan_db.TABLE} "
+           f"WHERE {keyword} IS NOT NULL AND Timestamp >= ? AND Timestamp < ? AND rowid {op} ?")
+    raw = swan_db.read_frame(conn, sql, (_fmt(lo), _fmt(hi), n))
+    v = raw['v'].to_numpy(dtype=float)
+    return pd.DataFrame({'Timestamp': raw['Timestamp'], 'n': np.ones(len(v), dtype=int),
+                         'sum_value': v, 'sumsq_value': v * v, 'min_value': v, 'max_value': v})
+
+
+def _cover(conn, keyword, lo, hi, levels, covered):
+    """
+    Partial aggregates for [lo, hi): whole buckets of levels[0], and the
+    edges from the finer levels.
+    """
+    if lo >= hi:
+        return []
+    if not levels:
+        return [_raw_rows(conn, keyword, lo, hi, ('<=', covered))]
+    level, finer = levels[0], levels[1:]
+    floor = LEVELS[level][2]
+    first = floor(lo)
+    if first < lo:
+        first = _next_bucket(level, first)
+    last = floor(hi)
+    if first >= last:
+        return _cover(conn, keyword, lo, hi, finer, covered)
+    return (_cover(conn, keyword, lo, first, finer, covered)
+            + [_level_rows(conn, level, keyword, first, last)]
+            + _cover(conn, keyword, last, hi, finer, covered))
+
+
+def plan(db_path, keyword, resolution='1D'):
+    """
+    Name of the coarsest level series() would read ('raw' if none).
+    """
+    _, levels = levels_for(resolution)
+    with swan_db.pooled(db_path) as conn:
+        covered = rolled_up_to(conn, swan_db.check_keyword(keyword))
+    return levels[0] if levels and covered else 'raw'
+
+
+@instrument.timed('load.rollup')
+def series(db_path, keyword, start=None, end=None, resolution='1D'):
+    """
+    n, mean, std, min and max of keyword per resolution bin over
+    [start, end] (both inclusive; default: the whole table), indexed by
+    bin start.  Empty bins have n = 0 and NaN statistics.
+    """
+    kw = swan_db.check_keyword(keyword)
+    offset, levels = levels_for(resolution)
+    with swan_db.pooled(db_path) as conn:
+        if start is None or end is None:
+            first, last = conn.execute(f"SELECT MIN(Timestamp), MAX(Timestamp) FROM {swan_db.TABLE} "
+                                       f"WHERE {kw} IS NOT NULL").fetchone()
+            if first is None:
+                return pd.DataFrame(columns=['n', 'mean', 'std', 'min', 'max'],
+                                    index=pd.DatetimeIndex([], name='Timestamp'))
+            start = first if start is None else start
+            end = last if end is None else end
+        lo = pd.Timestamp(start)
+        # Timestamps have whole seconds, so [start, end] is [start, end + 1 s)
+        hi = pd.Timestamp(end) + pd.Timedelta('1s')
+
+        covered = rolled_up_to(conn, kw)
+        if covered:
+            pieces = _cover(conn, kw, lo, hi, levels, covered)
+            pieces.append(_raw_rows(conn, kw, lo, hi, ('>', covered)))
+        else:
+            pieces = [_raw_rows(conn, kw, lo, hi, ('>', 0))]
+
+    parts = pd.concat([p for p in pieces if len(p)] or pieces[:1], ignore_index=True)
+    parts['Timestamp'] = pd.to_datetime(parts['Timestamp'])
+    bins = parts.set_index('Timestamp').resample(offset).agg(
+        {'n': 'sum', 'sum_value': 'sum', 'sumsq_value': 'sum', 'min_value': 'min', 'max_value': 'max'})
+
+    n = bins['n'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = bins['sum_value'].to_numpy() / n
+        var = (bins['sumsq_value'].to_numpy() - n * mean ** 2) / (n - 1)
+    out = pd.DataFrame({'n': bins['n'].astype(int), 'mean': mean,
+                        'std': np.sqrt(np.maximum(var, 0.0)),
+                        'min': bins['min_value'], 'max': bins['max_value']}, index=bins.index)
+    out.loc[n < 2, 'std'] = np.nan
+    out.index.name = 'Timestamp'
+    return out
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build / update or query the SHARP rollups.')
+    parser.add_argument('--db', help="SWAN database (default: config path 'swan_db')")
+    parser.add_argument('--keywords', nargs='+', help='default: every numeric column')
+    parser.add_argument('--full', action='store_true', help='rebuild from scratch')
+    parser.add_argument('--query', metavar='KEYWORD', help='print a range query instead')
+    parser.add_argument('--resolution', default='MS')
+    parser.add_argument('--start')
+    parser.add_argument('--end')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    db_path = args.db or config.path('swan_db')
+    if args.query:
+        print(f"level: {plan(db_path, args.query, args.resolution)}")
+        print(series(db_path, args.query, args.start, args.end, args.resolution).to_string())
+    else:
+        for keyword, mode in refresh(db_path, args.keywords, args.full).items():
+            print(f"{keyword:12s} {mode}")
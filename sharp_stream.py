@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 21 09:26:44 2026
+
+@author: kfrench
+
+Chunked streaming reads of solar_flare_data.
+
+    chunks = iter_chunks(db_path, ['CBI', 'USFLUX'], start='2012-01-01', end='2013-01-01')
+    chunks = where(chunks, lambda c: c['USFLUX'] > 1e21)
+    print(moments(chunks))
+
+Rows come off the cursor in fetchmany() blocks of chunk_rows ([sqlite]
+chunk_rows in config.py) and each block becomes one chunk: a dict of
+NumPy columns.  SQLite converts Timestamp to int64 Unix seconds while it
+reads (swan_db.EPOCH_SQL), so no timestamp strings are built or parsed in
+Python.  Keyword columns are downcast to float32 while every value
+survives within FLOAT32_RTOL; a column that ever fails the check stays
+float64 for the rest of the stream.  NULL, text and non-finite values
+become NaN.
+
+where(), dropna() and derive() are generator stages; moments(),
+correlate(), binned() and collect() consume a stream.  Only one chunk is
+alive at a time, so peak memory follows chunk_rows rather than the size of
+the table (collect() excepted, which returns the whole result).
+Reductions accumulate in float64.
+
+sharp_expr queries stream the same way through iter_query().  Each
+stream reads over its own read-only connection rather than a pooled one,
+so idle generators cannot exhaust the pool.
+
+    python sharp_stream.py CBI USFLUX MEANPOT --freq 1D
+"""
+
+import argparse
+from contextlib import closing
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+from scipy.stats import t as t_dist
+
+import config
+import instrument
+import swan_db
+from sharp_expr import ensure_functions
+
+# Largest relative change float32 may make to a value
+FLOAT32_RTOL = 1e-6
+STAT_COLUMNS = ['n', 'mean', 'std', 'min', 'max']
+
+
+# === Reading ===
+def _block(rows, width):
+    """
+    One fetchmany() result as a (rows, width) float64 array.
+    """
+    try:
+        flat = np.fromiter(chain.from_iterable(rows), dtype=float, count=len(rows) * width)
+        return flat.reshape(len(rows), width)
+    except (TypeError, ValueError):
+        pass
+    try:
+        # np.array maps NULL (None) to NaN
+        return np.array(rows, dtype=float).reshape(len(rows), width)
+    except (TypeError, ValueError):
+        # Text in a numeric column
+        frame = pd.DataFrame.from_records(rows)
+        return frame.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+
+
+class _Downcast:
+    """
+    Per-column float32 downcasting that remembers which columns did not
+    fit, so a column's dtype only ever widens during a stream.
+    """
+
+    def __init__(self, rtol=FLOAT32_RTOL):
+        self.rtol = rtol
+        self.wide = set()
+
+    def __call__(self, name, values):
+        if name in self.wide:
+            return values
+        with np.errstate(over='ignore', invalid='ignore'):
+            narrow = values.astype(np.float32)
+            # Overflow to inf and underflow to 0 both fail here
+            fits = np.abs(narrow - values) <= self.rtol * np.abs(values)
+        if np.all(fits | np.isnan(values)):
+            return narrow
+        self.wide.add(name)
+        return values
+
+
+def _stream(db_path, sql, params, names, required, chunk_rows, downcast):
+    chunk_rows = chunk_rows or config.sqlite_settings()['chunk_rows']
+    if chunk_rows < 1:
+        raise ValueError(f"chunk_rows must be positive, got {chunk_rows}")
+    required = [names.index(name) + 1 for name in required]
+    shrink = _Downcast() if downcast else None
+    empty = True
+
+    # A suspended generator can hold its connection indefinitely, so each
+    # stream opens its own read-only one instead of starving the pool
+    with closing(swan_db.connect_ro(db_path)) as conn:
+        ensure_functions(conn)
+        cur = conn.execute(sql, params)
+        instrument.count('queries')
+        try:
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                if not rows and not empty:
+                    break
+                instrument.count('rows', len(rows))
+                block = _block(rows, len(names) + 1)
+                del rows
+                values = block[:, 1:]
+                values[~np.isfinite(values)] = np.nan
+                # Rows whose Timestamp SQLite could not parse come back NULL
+                keep = ~np.isnan(block[:, 0])
+                for i in required:
+                    keep &= ~np.isnan(block[:, i])
+                if not keep.all():
+                    block = block[keep]
+
+                chunk = {'Timestamp': block[:, 0].astype(np.int64)}
+                for i, name in enumerate(names, start=1):
+                    column = np.ascontiguousarray(block[:, i])
+                    chunk[name] = shrink(name, column) if shrink else column
+                # An empty result still yields one empty chunk, so
+                # collect() knows the columns
+                if len(block) or empty:
+                    empty = False
+                    yield chunk
+        finally:
+            cur.close()
+
+
+def iter_chunks(db_path, keywords, start=None, end=None, required=None, chunk_rows=None,
+                downcast=True):
+    """
+    Stream Timestamp (Unix seconds) and the given keywords ordered by
+    Timestamp, optionally limited to [start, end].  Rows need every keyword
+    in required (default: all of them) to be non-null, as in
+    swan_db.load_series.  Exhaust or close() the generator to close its
+    read-only connection.
+    """
+    keywords = tuple(keywords)
+    required = None if required is None else tuple(required)
+    bounded = start is not None and end is not None
+    sql = swan_db.series_sql(keywords, bounded=bounded, required=required, epoch=True)
+    params = (str(start), str(end)) if bounded else ()
+    return _stream(db_path, sql, params, list(keywords), (), chunk_rows, downcast)
+
+
+def iter_query(query, chunk_rows=None, downcast=True):
+    """
+    Stream a sharp_expr.Query: the same rows and columns as
+    query.to_frame(), with Timestamp as Unix seconds.
+    """
+    sql, params = query.to_sql(epoch=True)
+    names = list(query.outputs)
+    required = [name for name in names if name not in query.optional]
+    return _stream(query.db_path, sql, params, names, required, chunk_rows, downcast)
+
+
+# === Stages ===
+def _take(chunk, keep):
+    return {name: values[keep] for name, values in chunk.items()}
+
+
+def where(chunks, mask):
+    """
+    Keep the rows where mask(chunk) is true.
+    """
+    for chunk in chunks:
+        keep = np.asarray(mask(chunk), dtype=bool)
+        yield chunk if keep.all() else _take(chunk, keep)
+
+
+def dropna(chunks, names):
+    """
+    Drop rows where any of the named columns is NaN.
+    """
+    return where(chunks, lambda c: ~np.any([np.isnan(c[name]) for name in names], axis=0))
+
+
+def derive(chunks, **columns):
+    """
+    Add columns computed from each chunk, e.g.
+    derive(chunks, log_TOTPOT=lambda c: np.log10(c['TOTPOT'])).
+    """
+    for chunk in chunks:
+        for name, func in columns.items():
+            chunk[name] = np.asarray(func(chunk))
+        yield chunk
+
+
+# === Reductions ===
+def _value_names(chunk, names):
+    return [name for name in chunk if name != 'Timestamp'] if names is None else list(names)
+
+
+def _merge(a, b):
+    """
+    Chan et al. merge of (n, mean_x, mean_y, M2_x, M2_y, C_xy) moments.
+    """
+    na, mxa, mya, sxa, sya, ca = a
+    nb, mxb, myb, sxb, syb, cb = b
+    n = na + nb
+    dx, dy = mxb - mxa, myb - mya
+    f = na * nb / n
+    return (n, mxa + dx * nb / n, mya + dy * nb / n,
+            sxa + sxb + dx * dx * f, sya + syb + dy * dy * f, ca + cb + dx * dy * f)
+
+
+def _moments(x, y):
+    x = x.astype(float)
+    y = y.astype(float)
+    mx, my = x.mean(), y.mean()
+    dx, dy = x - mx, y - my
+    return (len(x), mx, my, dx @ dx, dy @ dy, dx @ dy)
+
+
+@instrument.timed('stream.moments')
+def moments(chunks, names=None):
+    """
+    n, mean, std, min and max of each column (default: all but
+    Timestamp), ignoring NaN.
+    """
+    state, extremes = {}, {}
+    for chunk in chunks:
+        names = _value_names(chunk, names)
+        for name in names:
+            values = chunk[name]
+            values = values[~np.isnan(values)]
+            if not len(values):
+                continue
+            block = _moments(values, values)
+            lo, hi = float(values.min()), float(values.max())
+            if name in state:
+                state[name] = _merge(state[name], block)
+                lo, hi = min(lo, extremes[name][0]), max(hi, extremes[name][1])
+            else:
+                state[name] = block
+            extremes[name] = (lo, hi)
+
+    rows = {}
+    for name in names or ():
+        if name not in state:
+            rows[name] = [0, np.nan, np.nan, np.nan, np.nan]
+            continue
+        n, mean, _, m2, _, _ = state[name]
+        std = np.sqrt(m2 / (n - 1)) if n > 1 else np.nan
+        rows[name] = [n, mean, std, *extremes[name]]
+    table = pd.DataFrame.from_dict(rows, orient='index', columns=STAT_COLUMNS)
+    table['n'] = table['n'].astype(int)
+    return table
+
+
+@instrument.timed('stream.correlate')
+def correlate(chunks, x, names=None):
+    """
+    Pearson r and two-sided p of x against each column, pairwise NaN
+    dropping: the same table as sharp_timeseries.correlate, in one pass
+    over the stream.
+    """
+    state = {}
+    for chunk in chunks:
+        names = [name for name in _value_names(chunk, names) if name != x]
+        xs = chunk[x]
+        x_ok = ~np.isnan(xs)
+        for name in names:
+            ok = x_ok & ~np.isnan(chunk[name])
+            if not ok.any():
+                continue
+            block = _moments(xs[ok], chunk[name][ok])
+            state[name] = _merge(state[name], block) if name in state else block
+
+    names = list(names or ())
+    if not names:
+        return pd.DataFrame(columns=['x', 'keyword', 'n', 'r', 'p', 'x_mean', 'x_std',
+                                     'y_mean', 'y_std'])
+    empty = (0, np.nan, np.nan, np.nan, np.nan, np.nan)
+    n, x_mean, y_mean, sxx, syy, sxy = (np.array(a, dtype=float) for a in
+                                        zip(*[state.get(name, empty) for name in names]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = np.clip(sxy / np.sqrt(sxx * syy), -1.0, 1.0)
+        dof = n - 2
+        t_stat = r * np.sqrt(dof / ((1.0 - r) * (1.0 + r)))
+        p = np.where(np.abs(r) == 1.0, 0.0, 2 * t_dist.sf(np.abs(t_stat), dof))
+        p = np.where(dof > 0, p, np.nan)
+        table = pd.DataFrame({
+            'x': x, 'keyword': names, 'n': n.astype(int), 'r': r, 'p': p,
+            'x_mean': x_mean, 'x_std': np.sqrt(sxx / (n - 1)),
+            'y_mean': y_mean, 'y_std': np.sqrt(syy / (n - 1)),
+        })
+    return table
+
+
+def _bin_width(freq):
+    try:
+        width = pd.Timedelta(freq)
+    except (TypeError, ValueError):
+        width = None
+    if width is None or width.value <= 0 or width.value % 10 ** 9:
+        raise ValueError(f"binned() needs a fixed whole-second width, got {freq!r}; "
+                         "use sharp_rollup.series for calendar bins")
+    return width.value // 10 ** 9
+
+
+@instrument.timed('stream.binned')
+def binned(chunks, keyword, freq='1D'):
+    """
+    n, mean, std, min and max of one column in fixed-width time bins
+    aligned to the Unix epoch (midnight UTC for whole days), like
+    sharp_rollup.series.  Only the per-bin totals are kept, so memory
+    follows the number of bins.
+    """
+    width = _bin_width(freq)
+    parts = []
+    ref = None
+    for chunk in chunks:
+        values = chunk[keyword]
+        ok = ~np.isnan(values)
+        if not ok.any():
+            continue
+        times, values = chunk['Timestamp'][ok], values[ok].astype(float)
+        if np.any(times[1:] < times[:-1]):
+            order = np.argsort(times, kind='stable')
+            times, values = times[order], values[order]
+        if ref is None:
+            # Sums are taken about the first value to keep the variance
+            # of large SHARP magnitudes from cancelling
+            ref = values[0]
+        shifted = values - ref
+        bins = times // width
+        starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+        parts.append((bins[starts], np.diff(np.r_[starts, len(bins)]),
+                      np.add.reduceat(shifted, starts), np.add.reduceat(shifted * shifted, starts),
+                      np.minimum.reduceat(values, starts), np.maximum.reduceat(values, starts)))
+
+    if not parts:
+        index = pd.DatetimeIndex([], dtype='datetime64[ns]', name='Timestamp')
+        return pd.DataFrame(columns=STAT_COLUMNS, index=index, dtype=float)
+    bins, n, s, ss, lo, hi = (np.concatenate(a) for a in zip(*parts))
+    # Bins that straddle chunk boundaries (or unsorted chunks) repeat
+    totals = (pd.DataFrame({'bin': bins, 'n': n, 's': s, 'ss': ss, 'min': lo, 'max': hi})
+              .groupby('bin', sort=True)
+              .agg({'n': 'sum', 's': 'sum', 'ss': 'sum', 'min': 'min', 'max': 'max'}))
+    n = totals['n'].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = totals['s'].to_numpy() / n
+        var = (totals['ss'].to_numpy() - n * mean * mean) / (n - 1)
+    std = np.where(n > 1, np.sqrt(np.maximum(var, 0.0)), np.nan)
+    index = pd.DatetimeIndex((totals.index.to_numpy() * width).astype('datetime64[s]')
+                             .astype('datetime64[ns]'), name='Timestamp')
+    return pd.DataFrame({'n': n.astype(int), 'mean': mean + ref, 'std': std,
+                         'min': totals['min'].to_numpy(), 'max': totals['max'].to_numpy()},
+                        index=index)
+
+
+@instrument.timed('stream.collect')
+def collect(chunks, as_datetime=True):
+    """
+    Concatenate a stream into a DataFrame, with Timestamp as datetime64
+    (or left as Unix seconds with as_datetime=False).
+    """
+    columns = {}
+    for chunk in chunks:
+        for name, values in chunk.items():
+            columns.setdefault(name, []).append(values)
+    df = pd.DataFrame({name: np.concatenate(parts) for name, parts in columns.items()})
+    if as_datetime and 'Timestamp' in df:
+        df['Timestamp'] = df['Timestamp'].to_numpy().astype('datetime64[s]').astype('datetime64[ns]')
+    return df
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[2])
+    parser.add_argument('keywords', nargs='*', default=['CBI', 'USFLUX', 'MEANPOT'],
+                        help='SHARP keywords; the first is correlated with the rest')
+    parser.add_argument('--db', default=None, help='SWAN database (default: swan_cbi_db)')
+    parser.add_argument('--start')
+    parser.add_argument('--end')
+    parser.add_argument('--chunk-rows', type=int, default=None)
+    parser.add_argument('--freq', default=None, help="also bin the second keyword, e.g. '1D'")
+    parser.add_argument('--float64', action='store_true', help='do not downcast to float32')
+    args = parser.parse_args()
+
+    db_path = args.db or config.path('swan_cbi_db')
+
+    def stream():
+        return iter_chunks(db_path, args.keywords, start=args.start, end=args.end,
+                           required=(), chunk_rows=args.chunk_rows, downcast=not args.float64)
+
+    print(moments(stream()).to_string())
+    if len(args.keywords) > 1:
+        print(correlate(stream(), args.keywords[0]).to_string(index=False))
+    if args.freq and len(args.keywords) > 1:
+        print(binned(stream(), args.keywords[1], args.freq).to_string())
+    print(f"peak RSS {instrument.peak_rss_mb():.0f} MiB")
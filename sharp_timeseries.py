@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 13:15:09 2026
+
+@author: kfrench
+
+SHARP-vs-CBI time-series engine.
+
+One query loads CBI plus every requested spec, with derived quantities
+computed and filtered inside SQLite (sharp_expr), and the Pearson
+statistics for all specs come out of one masked NumPy pass.  Specs are
+plain keywords ('USFLUX'), 'log10(KEYWORD)', ratios 'A/B' or sharp_expr
+expressions.
+
+Run this file directly for a keyword sweep against the SWAN database.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.stats import t as t_dist
+
+import config
+import instrument
+import sharp_stream
+from sharp_expr import Query, as_expr
+
+DEFAULT_SPECS = ['USFLUX', 'TOTUSJZ', 'TOTBSQ', 'MEANPOT', 'R_VALUE',
+                 'log10(TOTPOT)', 'TOTUSJZ/USFLUX']
+
+
+def base_keywords(spec):
+    """
+    SHARP columns a spec reads.
+    """
+    return as_expr(spec).keywords()
+
+
+def evaluate(df, spec):
+    """
+    Values of a spec over df as a float array.  Values that are not
+    finite (log of <= 0, division by zero) come back as NaN.
+    """
+    out = np.asarray(as_expr(spec).evaluate(df), dtype=float)
+    out[~np.isfinite(out)] = np.nan
+    return out
+
+
+@instrument.timed('load.frame')
+def load_frame(db_path, specs, x='CBI', require_all=True, start=None, end=None):
+    """
+    Load Timestamp, x and one column per spec in one query, with the
+    arithmetic and filtering done in SQLite (sharp_expr.Query).
+
+    specs is a list of spec strings / sharp_expr expressions (columns named
+    by the string or the expression label) or a dict {column name: spec}.
+    With require_all=True only rows where x and every spec are valid are
+    returned (what the single-keyword scripts did); otherwise only x must
+    be non-null and each spec keeps its own NaN gaps.
+    """
+    if not isinstance(specs, dict):
+        # Spec strings keep their own text as the column name
+        specs = {s if isinstance(s, str) else as_expr(s).label(): s for s in specs}
+    query = Query(db_path).select(x, **{name: as_expr(s) for name, s in specs.items() if name != x})
+    if not require_all:
+        query = query.allow_missing(*[name for name in specs if name != x])
+    if start is not None and end is not None:
+        query = query.between(start, end)
+
+    # Streamed so Timestamp arrives as epoch seconds instead of strings;
+    # kept float64 for the statistics
+    return sharp_stream.collect(sharp_stream.iter_query(query, downcast=False))
+
+
+def batch_pearson(x, Y):
+    """
+    Pearson r and two-sided p-value of x against every column of Y in one
+    pass.  Rows where x or a column is NaN are dropped for that column only.
+    Returns a dict of arrays: n, r, p, x_mean, x_std, y_mean, y_std.
+    """
+    x = np.asarray(x, dtype=float)
+    Y = np.asarray(Y, dtype=float).reshape(len(x), -1)
+    mask = np.isfinite(Y) & np.isfinite(x)[:, None]
+    n = mask.sum(axis=0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        X = np.where(mask, x[:, None], 0.0)
+        Y0 = np.where(mask, Y, 0.0)
+        x_mean = X.sum(axis=0) / n
+        y_mean = Y0.sum(axis=0) / n
+        # Centre before multiplying so large SHARP magnitudes don't cancel
+        dx = np.where(mask, X - x_mean, 0.0)
+        dy = np.where(mask, Y0 - y_mean, 0.0)
+        sxx = (dx * dx).sum(axis=0)
+        syy = (dy * dy).sum(axis=0)
+        sxy = (dx * dy).sum(axis=0)
+
+        r = np.clip(sxy / np.sqrt(sxx * syy), -1.0, 1.0)
+        dof = n - 2
+        t_stat = r * np.sqrt(dof / ((1.0 - r) * (1.0 + r)))
+        p = np.where(np.abs(r) == 1.0, 0.0, 2 * t_dist.sf(np.abs(t_stat), dof))
+        p = np.where(dof > 0, p, np.nan)
+
+        return {
+            'n': n,
+            'r': r,
+            'p': p,
+            'x_mean': x_mean,
+            'x_std': np.sqrt(sxx / (n - 1)),
+            'y_mean': y_mean,
+            'y_std': np.sqrt(syy / (n - 1)),
+        }
+
+
+@instrument.timed('stats.correlate')
+def correlate(df, x, specs):
+    """
+    Tidy table of batch_pearson(df[x], specs), one row per spec.
+    """
+    specs = list(specs)
+    Y = np.column_stack([df[s].to_numpy(dtype=float) if s in df.columns else evaluate(df, s)
+                         for s in specs])
+    stats = batch_pearson(df[x].to_numpy(dtype=float), Y)
+    table = pd.DataFrame(stats)
+    table.insert(0, 'keyword', specs)
+    table.insert(0, 'x', x)
+    return table
+
+
+def correlation_sweep(db_path, specs=DEFAULT_SPECS, x='CBI', start=None, end=None):
+    """
+    Correlate x against every spec with a single database read.
+    """
+    df = load_frame(db_path, specs, x=x, require_all=False, start=start, end=end)
+    return correlate(df, x, specs)
+
+
+if __name__ == '__main__':
+    db_path = config.path('swan_cbi_db')
+    print(correlation_sweep(db_path).to_string(index=False))
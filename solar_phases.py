@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 15:26:40 2026
+
+@author: kfrench
+
+Solar-cycle phase catalog and event-to-phase assignment.
+
+A phase catalog is a list of (label, start, end) tuples, both ends
+inclusive, like the sc23_min / sc24_max tuples in cbi_min_max.py.  Events
+are assigned with one searchsorted over the sorted phase starts
+(O(n log k)), and all per-phase aggregates come from a single groupby.
+"""
+
+import numpy as np
+import pandas as pd
+
+# The expanded min/max periods used in cbi_min_max.py
+MIN_MAX_PHASES = [
+    ('SC23 Min', '1996-05-01', '1998-12-31'),
+    ('SC23 Max', '1999-01-01', '2003-12-31'),
+    ('SC24 Min', '2008-12-01', '2011-12-31'),
+    ('SC24 Max', '2012-01-01', '2015-12-31'),
+]
+
+# Min/rise/max/decline for SC23-SC25, approximate boundaries from the
+# SILSO 13-month smoothed sunspot number
+CYCLE_PHASES = [
+    ('SC23 Min', '1996-05-01', '1997-06-30'),
+    ('SC23 Rise', '1997-07-01', '1999-12-31'),
+    ('SC23 Max', '2000-01-01', '2002-06-30'),
+    ('SC23 Decline', '2002-07-01', '2008-11-30'),
+    ('SC24 Min', '2008-12-01', '2009-12-31'),
+    ('SC24 Rise', '2010-01-01', '2011-12-31'),
+    ('SC24 Max', '2012-01-01', '2014-12-31'),
+    ('SC24 Decline', '2015-01-01', '2019-11-30'),
+    ('SC25 Min', '2019-12-01', '2020-12-31'),
+    ('SC25 Rise', '2021-01-01', '2023-06-30'),
+    ('SC25 Max', '2023-07-01', '2025-12-31'),
+    ('SC25 Decline', '2026-01-01', '2030-12-31'),
+]
+
+
+def phase_table(phases):
+    """
+    Sorted DataFrame (label, start, end) for a phase catalog.  Phases may
+    leave gaps but must not overlap.
+    """
+    table = pd.DataFrame(phases, columns=['label', 'start', 'end'])
+    table['start'] = pd.to_datetime(table['start'])
+    table['end'] = pd.to_datetime(table['end'])
+    table = table.sort_values('start').reset_index(drop=True)
+
+    if (table['end'] < table['start']).any():
+        raise ValueError("Phase ends before it starts")
+    if (table['start'].iloc[1:].to_numpy() <= table['end'].iloc[:-1].to_numpy()).any():
+        raise ValueError("Phases overlap")
+    if table['label'].duplicated().any():
+        raise ValueError("Duplicate phase labels")
+    return table
+
+
+def assign_phases(dates, phases=CYCLE_PHASES):
+    """
+    Phase label of every date (NaN outside all phases), as a Categorical
+    in catalog order.
+    """
+    table = phase_table(phases)
+    dates = pd.to_datetime(pd.Series(dates))
+    t = dates.to_numpy(dtype='datetime64[ns]')
+    starts = table['start'].to_numpy(dtype='datetime64[ns]')
+    ends = table['end'].to_numpy(dtype='datetime64[ns]')
+
+    i = np.searchsorted(starts, t, side='right') - 1
+    inside = (i >= 0) & (t <= ends[np.clip(i, 0, None)]) & ~np.isnat(t)
+    codes = np.where(inside, i, -1)
+
+    labels = pd.Categorical.from_codes(codes, categories=table['label'])
+    return pd.Series(labels, index=dates.index, name='phase')
+
+
+def phase_stats(df, phases=CYCLE_PHASES, cols=('CBI', 'Vel'), date_col='Date', phase_col='phase'):
+    """
+    N, mean and median of cols for every phase in one groupby.  Phases
+    with no events are kept with N = 0.  An existing phase_col (from
+    assign_phases with the same phases) is used as is; otherwise phases
+    are assigned from date_col.
+    """
+    phase = df[phase_col] if phase_col in df else assign_phases(df[date_col], phases)
+    grouped = df[list(cols)].groupby(phase.values, observed=False)
+    stats = grouped.agg(['mean', 'median'])
+    stats.columns = [f"{col} {agg}" for col, agg in stats.columns]
+    stats.insert(0, 'N', grouped.size())
+    stats.index.name = 'phase'
+    return stats
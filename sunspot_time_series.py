@@ -11,40 +11,41 @@ import matplotlib.pyplot as plt
 import pandas as pd
 import datetime
 
+import config
+from cbi_cube import frame_medians
+from sunspots import get_sunspots
 
-cube = np.load('/Users/kfrench/Desktop/LASCO_CBI/cbi_interp_may2023.npy', allow_pickle=True)
-dates = np.load('/Users/kfrench/Desktop/LASCO_CBI/cbi_dates_interp_Nov2022_rev.npy', allow_pickle=True)
-cbi_ts = np.median(cube, axis=[1, 2])  # Or multiply by 1e4 if preferred
 
+if __name__ == '__main__':
+    # Cube is memory-mapped and reduced in chunks; a pickled cube needs a one-off
+    # cbi_cube.convert_cube() first
+    cube_file = config.path('cube_file')
+    dates = np.load(config.path('dates_file'), allow_pickle=True)
+    cbi_ts = frame_medians(cube_file)  # Or multiply by 1e4 if preferred
 
-url = "https://www.sidc.be/SILSO/DATA/SN_m_tot_V2.0.txt"
-col_names = ['year', 'month', 'decimal_date', 'sunspot_number',
-             'std_dev', 'num_obs', 'provisional']
-sunspots = pd.read_csv(url, delim_whitespace=True, header=None, names=col_names)
-sunspots['date'] = pd.to_datetime(dict(year=sunspots.year, month=sunspots.month, day=1))
 
+    # Monthly SILSO sunspot numbers from the local cache (refreshed once a day)
+    start_date = pd.to_datetime(dates[100])  # skip first 100 goofy entries
+    end_date = pd.to_datetime(dates[-1])
+    sunspots = get_sunspots('monthly', start=start_date, end=end_date)
 
-start_date = pd.to_datetime(dates[100])  # skip first 100 goofy entries
-end_date = pd.to_datetime(dates[-1])
-sunspots = sunspots[(sunspots['date'] >= start_date) & (sunspots['date'] <= end_date)]
 
+    fig, ax1 = plt.subplots(figsize=(10, 5))
 
-fig, ax1 = plt.subplots(figsize=(10, 5))
+    # CBI data
+    ax1.plot(dates[100:], cbi_ts[100:], color='steelblue', label='CBI')
+    ax1.set_xlabel("Year")
+    ax1.set_ylabel("Mean Solar Brightness (CBI)", color='steelblue')
+    ax1.tick_params(axis='y', labelcolor='steelblue')
 
-# CBI data
-ax1.plot(dates[100:], cbi_ts[100:], color='steelblue', label='CBI')
-ax1.set_xlabel("Year")
-ax1.set_ylabel("Mean Solar Brightness (CBI)", color='steelblue')
-ax1.tick_params(axis='y', labelcolor='steelblue')
+    #Sunspot data
+    ax2 = ax1.twinx()
+    ax2.plot(sunspots['date'], sunspots['sunspot_number'], color='indianred', alpha=0.7, label='Sunspot Number')
+    ax2.set_ylabel("Monthly Sunspot Number", color='indianred')
+    ax2.tick_params(axis='y', labelcolor='indianred')
 
-#Sunspot data
-ax2 = ax1.twinx()
-ax2.plot(sunspots['date'], sunspots['sunspot_number'], color='indianred', alpha=0.7, label='Sunspot Number')
-ax2.set_ylabel("Monthly Sunspot Number", color='indianred')
-ax2.tick_params(axis='y', labelcolor='indianred')
 
-
-plt.title('Coronal Brightness Index and Sunspot Number Time Series')
-ax1.grid(True)
-fig.tight_layout()
-plt.show()
+    plt.title('Coronal Brightness Index and Sunspot Number Time Series')
+    ax1.grid(True)
+    fig.tight_layout()
+    plt.show()
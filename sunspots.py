@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 16:04:51 2026
+
+@author: kfrench
+
+Local SILSO sunspot-number provider.
+
+Monthly, daily and 13-month smoothed SN series are kept as .npz files in
+<cache_dir>/silso (cache_dir from config.py).  They are refreshed from
+SILSO only once the .npz is older than max_age, with If-None-Match /
+If-Modified-Since so an unchanged file costs a 304 (after which the .npz
+is only touched).  If the network is down the cached copy is used, and
+ingest_file() loads a downloaded file for air-gapped machines.  Any source
+URL can be replaced by a local path (or file:// URL), which is how tests
+stand in for sidc.be.
+
+Files are parsed by the fixed column positions of the SILSO V2.0 format.
+Blank fields are NaN; in get_sunspots() the integer columns num_obs and
+provisional use SILSO's -1 for missing instead.
+"""
+
+import json
+import os
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+import config
+import instrument
+
+SILSO_URL = 'https://www.sidc.be/SILSO/DATA/'
+SOURCES = {
+    'monthly': SILSO_URL + 'SN_m_tot_V2.0.txt',
+    'daily': SILSO_URL + 'SN_d_tot_V2.0.txt',
+    'smoothed': SILSO_URL + 'SN_ms_tot_V2.0.txt',
+}
+COLUMNS = {
+    'monthly': ['year', 'month', 'decimal_date', 'sunspot_number',
+                'std_dev', 'num_obs', 'provisional'],
+    'daily': ['year', 'month', 'day', 'decimal_date', 'sunspot_number',
+              'std_dev', 'num_obs', 'provisional'],
+}
+COLUMNS['smoothed'] = COLUMNS['monthly']
+# 1-based, inclusive character positions from the SILSO V2.0 file headers
+POSITIONS = {
+    'monthly': [(1, 4), (6, 7), (9, 16), (19, 23), (25, 29), (32, 35), (37, 37)],
+    'daily': [(1, 4), (6, 7), (9, 10), (12, 19), (21, 23), (25, 29), (32, 35), (37, 37)],
+}
+POSITIONS['smoothed'] = POSITIONS['monthly']
+INT_COLUMNS = ('year', 'month', 'day', 'num_obs', 'provisional')
+
+MAX_AGE = 24 * 3600.0
+TIMEOUT = 30
+
+
+def _char_matrix(text, width):
+    """
+    Non-blank lines of text as a (lines, width) uint8 matrix, space padded.
+    Equal-length lines (the normal case) are one reshape of the bytes.
+    """
+    raw = text.encode('ascii', errors='replace').replace(b'\r', b'')
+    lines = [line for line in raw.split(b'\n') if line.strip()]
+    if not lines:
+        return np.empty((0, width), dtype=np.uint8)
+    length = len(lines[0])
+    if length >= width and all(len(line) == length for line in lines):
+        chars = np.frombuffer(b''.join(lines), dtype=np.uint8).reshape(len(lines), length)
+        return chars[:, :width]
+    return np.frombuffer(b''.join(line[:width].ljust(width) for line in lines),
+                         dtype=np.uint8).reshape(len(lines), width)
+
+
+def _field(chars, start, end):
+    """
+    Floats from character columns [start, end] (1-based, inclusive); blank
+    fields are NaN.
+    """
+    block = np.ascontiguousarray(chars[:, start - 1:end])
+    values = block.view(f'S{end - start + 1}').ravel()
+    blank = (block == ord(' ')).all(axis=1)
+    values = np.where(blank, b'nan', values)
+    try:
+        return values.astype(float)
+    except ValueError as err:
+        raise ValueError(f"Bad SILSO field in columns {start}-{end}: {err}") from None
+
+
+def parse_silso(text, kind='monthly'):
+    """
+    Parse a SILSO V2.0 text file into a column dict of float arrays.
+
+    Fields are read by their fixed column positions (POSITIONS), so a
+    missing trailing field (e.g. the provisional marker) is just NaN.
+    """
+    names, positions = COLUMNS[kind], POSITIONS[kind]
+    chars = _char_matrix(text, positions[-1][1])
+    data = {name: _field(chars, *pos) for name, pos in zip(names, positions)}
+
+    for name in ('year', 'month', 'day'):
+        if name in data and np.isnan(data[name]).any():
+            raise ValueError(f"SILSO line without a {name}")
+    days = data['day'] if 'day' in data else np.ones_like(data['year'])
+    data['date'] = pd.to_datetime(dict(
+        year=data['year'].astype(int), month=data['month'].astype(int), day=days.astype(int)
+    )).to_numpy(dtype='datetime64[ns]')
+    return data
+
+
+# === Cache ===
+def _cache_files(kind, cache_dir):
+    cache_dir = cache_dir or os.path.join(config.path('cache_dir'), 'silso')
+    base = os.path.join(cache_dir, f"SN_{kind}")
+    return base + '.npz', base + '.json'
+
+
+def cache_file(kind='monthly', cache_dir=None):
+    """
+    Path of the cached .npz for a series (it may not exist yet).
+    """
+    return _cache_files(kind, cache_dir)[0]
+
+
+def read_cache(data_file):
+    """
+    Column dict from a cached .npz, without any refresh.
+    """
+    with np.load(data_file) as npz:
+        return {name: npz[name] for name in npz.files}
+
+
+def _read_meta(meta_file):
+    try:
+        with open(meta_file) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_cache(data, meta, kind, cache_dir):
+    data_file, meta_file = _cache_files(kind, cache_dir)
+    os.makedirs(os.path.dirname(data_file), exist_ok=True)
+    tmp = data_file + '.tmp.npz'
+    np.savez(tmp, **data)
+    os.replace(tmp, data_file)
+    with open(meta_file, 'w') as fh:
+        json.dump(meta, fh)
+
+
+def ingest_file(path, kind='monthly', cache_dir=None):
+    """
+    Load a downloaded SILSO file into the cache (offline ingest).  It is
+    recorded as the SILSO copy, so it is served until max_age runs out.
+    """
+    with open(path) as fh:
+        data = parse_silso(fh.read(), kind)
+    meta = {'source': SOURCES[kind], 'ingested_from': os.path.abspath(path)}
+    _write_cache(data, meta, kind, cache_dir)
+    return data
+
+
+def _is_local(source):
+    return source.startswith('file://') or not source.startswith(('http://', 'https://'))
+
+
+def _fetch(source, meta):
+    """
+    Returns (text, new meta), or (None, None) if the source is unchanged.
+    Raises on network errors.
+    """
+    if _is_local(source):
+        path = source[len('file://'):] if source.startswith('file://') else source
+        mtime = os.path.getmtime(path)
+        if meta.get('source') == source and meta.get('mtime') == mtime:
+            return None, None
+        with open(path) as fh:
+            return fh.read(), {'source': source, 'mtime': mtime}
+
+    request = urllib.request.Request(source)
+    if meta.get('source') == source:
+        if meta.get('etag'):
+            request.add_header('If-None-Match', meta['etag'])
+        if meta.get('last_modified'):
+            request.add_header('If-Modified-Since', meta['last_modified'])
+    try:
+        with urllib.request.urlopen(request, timeout=TIMEOUT) as response:
+            text = response.read().decode('utf-8')
+            headers = response.headers
+    except urllib.error.HTTPError as err:
+        if err.code == 304:
+            return None, None
+        raise
+    return text, {
+        'source': source,
+        'etag': headers.get('ETag'),
+        'last_modified': headers.get('Last-Modified'),
+    }
+
+
+def load_series(kind='monthly', source=None, cache_dir=None, max_age=MAX_AGE, refresh=False):
+    """
+    Column dict for a SILSO series, refreshed from source only when the
+    cached .npz is older than max_age (or refresh=True).
+    """
+    source = source or SOURCES[kind]
+    data_file, meta_file = _cache_files(kind, cache_dir)
+    meta = _read_meta(meta_file)
+    have_cache = os.path.exists(data_file)
+
+    stale = refresh or not have_cache or meta.get('source') != source or \
+        time.time() - os.path.getmtime(data_file) > max_age
+    if stale:
+        try:
+            text, new_meta = _fetch(source, meta if have_cache else {})
+        except (OSError, urllib.error.URLError):
+            if not have_cache:
+                raise
+            # Offline: keep serving the cached copy
+            text = None
+        else:
+            if text is None:
+                # Unchanged upstream: restart the age clock, nothing to rewrite
+                os.utime(data_file)
+        if text is not None:
+            data = parse_silso(text, kind)
+            _write_cache(data, new_meta, kind, cache_dir)
+            return data
+    return read_cache(data_file)
+
+
+@instrument.timed('load.sunspots')
+def get_sunspots(kind='monthly', start=None, end=None, data_file=None, **kwargs):
+    """
+    SILSO series as a DataFrame (columns as in COLUMNS plus 'date'),
+    sliced to [start, end] by binary search on the sorted dates.
+    data_file reads that cached .npz as is instead of load_series().
+    """
+    data = read_cache(data_file) if data_file else load_series(kind, **kwargs)
+    dates = data['date']
+    lo = 0 if start is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(start)), 'left')
+    hi = len(dates) if end is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(end)), 'right')
+
+    df = pd.DataFrame({name: data[name][lo:hi] for name in COLUMNS[kind] + ['date']})
+    for col in INT_COLUMNS:
+        if col in df:
+            # Blank fields keep SILSO's own missing-value marker
+            df[col] = df[col].fillna(-1).astype(int)
+    return df
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 10:41:37 2026
+
+@author: kfrench
+
+Access layer for the SWAN solar_flare_data SQLite database.
+
+prepare() (or `astrostats.py index KEYWORD ...`) builds the Timestamp
+index and, optionally, one (Timestamp, keywords...) covering index for a
+keyword set, and ANALYZEs just the new indexes.  It is the only code that
+writes to the database here: queries never build indexes, they log the
+EXPLAIN QUERY PLAN of anything slower than SLOW_QUERY_MS instead.  SQL
+text is built once per keyword set and bound with ? parameters, so
+sqlite3's per-connection statement cache reuses the prepared statements.
+
+Reads go through a per-database pool of read-only connections
+(mode=ro URI, optionally immutable=1) with the mmap_size / cache_size
+pragmas from config.py; the journal mode is left as it is.  A connection
+is checked out by one thread at a time, so parallel workers can share a
+pool safely, and a checkout that waits longer than pool_timeout raises.
+"""
+
+import logging
+import os
+import pathlib
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+import pandas as pd
+
+import config
+import instrument
+
+logger = logging.getLogger(__name__)
+
+TABLE = 'solar_flare_data'
+SLOW_QUERY_MS = 500.0
+STATEMENT_CACHE = 256
+# Wider keyword sets only get the plain Timestamp index
+MAX_COVERING = 4
+COVERING_PREFIX = f'idx_{TABLE}_Timestamp_'
+# Timestamp as int64 Unix seconds, converted by SQLite while reading
+if sqlite3.sqlite_version_info >= (3, 38, 0):
+    EPOCH_SQL = "unixepoch(Timestamp)"
+else:
+    EPOCH_SQL = "CAST(strftime('%s', Timestamp) AS INTEGER)"
+
+
+def check_keyword(keyword):
+    """
+    Column names cannot be bound as SQL parameters, so only accept plain
+    identifiers (MEANPOT, TOTBSQ, R_VALUE, ...).
+    """
+    if not isinstance(keyword, str) or not keyword.replace('_', '').isalnum():
+        raise ValueError(f"Invalid SHARP keyword: {keyword!r}")
+    return keyword
+
+
+def numeric_columns(conn, exclude=('HARPNUM',)):
+    """
+    Numeric columns of the table (SHARP keywords and CBI), in table order.
+    """
+    rows = conn.execute(f"PRAGMA table_info({TABLE})").fetchall()
+    numeric = ('REAL', 'FLOA', 'DOUB', 'INT', 'NUM', 'DEC')
+    return [name for _, name, decl, *_ in rows
+            if name != 'Timestamp' and name not in exclude
+            and any(t in (decl or '').upper() for t in numeric)]
+
+
+# === Index management ===
+def index_name(columns):
+    return 'idx_' + TABLE + '_' + '_'.join(columns)
+
+
+def existing_indexes(conn):
+    rows = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?", (TABLE,)
+    ).fetchall()
+    return {name for (name,) in rows}
+
+
+def covering_columns(keywords):
+    """
+    Columns of the covering index for a keyword set: Timestamp, then the
+    keywords sorted, so every ordering of a set shares one index.  None if
+    the set is empty or wider than MAX_COVERING.
+    """
+    keywords = sorted({check_keyword(k) for k in keywords if k != 'Timestamp'})
+    if not keywords or len(keywords) > MAX_COVERING:
+        return None
+    return ('Timestamp',) + tuple(keywords)
+
+
+def ensure_indexes(conn, keywords=()):
+    """
+    Create the Timestamp index and, for a non-empty keyword set, its
+    covering index if they are missing, then ANALYZE the new indexes so the
+    planner picks them up.  Needs a writable connection.  Returns the
+    names of the indexes that were built.
+    """
+    wanted = [('Timestamp',)]
+    covering = covering_columns(keywords)
+    if covering:
+        wanted.append(covering)
+
+    have = existing_indexes(conn)
+    built = []
+    for columns in wanted:
+        name = index_name(columns)
+        if name in have:
+            continue
+        try:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {TABLE} ({', '.join(columns)})")
+        except sqlite3.OperationalError as err:
+            # Read-only copies of the database just keep scanning
+            logger.warning("Could not create %s: %s", name, err)
+            return built
+        built.append(name)
+
+    if built:
+        for name in built:
+            conn.execute(f"ANALYZE {name}")
+        conn.commit()
+        logger.info("Built indexes %s", ', '.join(built))
+    return built
+
+
+def drop_covering_indexes(conn, keep=()):
+    """
+    Drop the covering indexes prepare() built, except those for the keyword
+    sets in keep.  Returns the names dropped.
+    """
+    keep = {index_name(covering_columns(k)) for k in keep if covering_columns(k)}
+    dropped = sorted(name for name in existing_indexes(conn)
+                     if name.startswith(COVERING_PREFIX) and name not in keep)
+    for name in dropped:
+        conn.execute(f"DROP INDEX {name}")
+    conn.commit()
+    return dropped
+
+
+def connect(db_path):
+    """
+    Open the SWAN database for writing, with a larger statement cache.
+    """
+    return sqlite3.connect(db_path, cached_statements=STATEMENT_CACHE)
+
+
+def connect_ro(db_path, immutable=None, mmap_size=None, cache_size=None):
+    """
+    Open the SWAN database read-only (mode=ro URI, optionally immutable=1)
+    with the mmap_size / cache_size pragmas from config.py.
+    """
+    settings = config.sqlite_settings()
+    immutable = settings['immutable'] if immutable is None else immutable
+    uri = pathlib.Path(db_path).resolve().as_uri() + '?mode=ro'
+    if immutable:
+        # Skips all locking: only safe while nothing writes the file
+        uri += '&immutable=1'
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                           cached_statements=STATEMENT_CACHE)
+    mmap_size = settings['mmap_size'] if mmap_size is None else mmap_size
+    cache_size = settings['cache_size'] if cache_size is None else cache_size
+    conn.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+    conn.execute(f"PRAGMA cache_size = {int(cache_size)}")
+    conn.execute("PRAGMA query_only = 1")
+    return conn
+
+
+# === Read-only connection pool ===
+class ConnectionPool:
+    """
+    Fixed-size pool of read-only connections to one database.
+    """
+
+    def __init__(self, db_path, size=None, immutable=None, mmap_size=None, cache_size=None,
+                 timeout=None):
+        settings = config.sqlite_settings()
+        self.db_path = db_path
+        self.size = size or settings['pool_size']
+        self.timeout = settings['pool_timeout'] if timeout is None else timeout
+        self.immutable = settings['immutable'] if immutable is None else immutable
+        self.mmap_size = settings['mmap_size'] if mmap_size is None else mmap_size
+        self.cache_size = settings['cache_size'] if cache_size is None else cache_size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        return connect_ro(self.db_path, self.immutable, self.mmap_size, self.cache_size)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Check a connection out for the duration of a with block.  Waits at
+        most timeout seconds (default: the pool's) for one to come back.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        conn = None
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    conn = self._open()
+            if conn is None:
+                try:
+                    conn = self._idle.get(timeout=timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"No free connection to {self.db_path} after {timeout} s "
+                                       f"(all {self.size} checked out)") from None
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._created = 0
+
+
+_pools = {}
+_prepared = set()
+_pools_lock = threading.Lock()
+_prepare_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    # Connections and locks inherited from the parent must not be used
+    global _pools_lock, _prepare_lock
+    _pools.clear()
+    _prepared.clear()
+    _pools_lock = threading.Lock()
+    _prepare_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def prepare(db_path, keywords=()):
+    """
+    Explicit writable pass: build the Timestamp index and the covering index
+    for keywords (see ensure_indexes), once per process and keyword set.
+    Read-only files are left as they are.  Returns the indexes built.
+    """
+    columns = covering_columns(keywords)
+    key = (str(db_path), columns)
+    if key in _prepared:
+        return []
+    with _prepare_lock:
+        if key in _prepared:
+            return []
+        built = []
+        try:
+            conn = connect(db_path)
+            try:
+                built = ensure_indexes(conn, keywords)
+            finally:
+                conn.close()
+        except sqlite3.OperationalError as err:
+            logger.warning("Could not prepare %s: %s", db_path, err)
+        _prepared.add(key)
+        return built
+
+
+def get_pool(db_path):
+    with _pools_lock:
+        pool = _pools.get(str(db_path))
+        if pool is None:
+            pool = _pools[str(db_path)] = ConnectionPool(db_path)
+        return pool
+
+
+@contextmanager
+def pooled(db_path, timeout=None):
+    """
+    Read-only pooled connection to db_path.  Queries never build indexes:
+    run prepare() first for those.
+
+        with swan_db.pooled(db_path) as conn:
+            rows = swan_db.execute(conn, sql, params)
+    """
+    with get_pool(db_path).connection(timeout) as conn:
+        yield conn
+
+
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+# === Query planning ===
+def explain(conn, sql, params=()):
+    """
+    Return the EXPLAIN QUERY PLAN detail lines for a query.
+    """
+    rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    return [row[-1] for row in rows]
+
+
+def _log_if_slow(conn, sql, params, elapsed, slow_ms):
+    if elapsed > slow_ms:
+        plan = '\n    '.join(explain(conn, sql, params))
+        logger.warning("Slow query (%.0f ms):\n%s\n  plan:\n    %s\n  (missing indexes are built "
+                       "by astrostats.py index)", elapsed, sql.strip(), plan)
+
+
+def execute(conn, sql, params=(), slow_ms=SLOW_QUERY_MS):
+    """
+    Run a parameterized query and return all rows.  Queries slower than
+    slow_ms have their plan logged.
+    """
+    t0 = time.perf_counter()
+    rows = conn.execute(sql, params).fetchall()
+    _log_if_slow(conn, sql, params, (time.perf_counter() - t0) * 1e3, slow_ms)
+    instrument.count('queries')
+    instrument.count('rows', len(rows))
+    return rows
+
+
+def read_frame(conn, sql, params=(), slow_ms=SLOW_QUERY_MS):
+    """
+    execute() into a DataFrame, keeping the cursor's column names.
+    """
+    t0 = time.perf_counter()
+    cur = conn.execute(sql, params)
+    df = pd.DataFrame(cur.fetchall(), columns=[d[0] for d in cur.description])
+    _log_if_slow(conn, sql, params, (time.perf_counter() - t0) * 1e3, slow_ms)
+    instrument.count('queries')
+    instrument.count('rows', len(df))
+    return df
+
+
+# === Statements ===
+@lru_cache(maxsize=None)
+def series_sql(keywords, bounded=False, required=None, epoch=False):
+    """
+    SELECT Timestamp, keywords... ordered by Timestamp, keeping rows where
+    every keyword in required (default: all of them) is non-null.  With
+    bounded=True the query takes (start, end) parameters.  epoch=True
+    returns Timestamp as Unix seconds (column named epoch, so ORDER BY
+    still uses the Timestamp index).
+    """
+    cols = ', '.join(check_keyword(k) for k in keywords)
+    required = keywords if required is None else required
+    time_col = f"{EPOCH_SQL} AS epoch" if epoch else 'Timestamp'
+    sql = f"SELECT {time_col}, {cols} FROM {TABLE}"
+    clauses = [f"{check_keyword(k)} IS NOT NULL" for k in required]
+    if bounded:
+        clauses.append("Timestamp BETWEEN ? AND ?")
+    if clauses:
+        sql += " WHERE " + ' AND '.join(clauses)
+    return sql + " ORDER BY Timestamp"
+
+
+@instrument.timed('load.swan')
+def load_series(db_path, keywords, start=None, end=None, required=None):
+    """
+    Load Timestamp plus the given keywords ordered by Timestamp, optionally
+    limited to [start, end].  Rows need every keyword in required (default:
+    all of them) to be non-null.
+    """
+    keywords = tuple(keywords)
+    required = None if required is None else tuple(required)
+    with pooled(db_path) as conn:
+        if start is not None and end is not None:
+            sql = series_sql(keywords, bounded=True, required=required)
+            return read_frame(conn, sql, (str(start), str(end)))
+        return read_frame(conn, series_sql(keywords, required=required))
+
@@ -0,0 +1,45 @@
+"""
+Shared fixtures: every test gets its own config (cache_dir under
+tmp_path, no astrostats.ini) so nothing reads or writes the real caches.
+"""
+
+import os
+
+import pytest
+
+import config
+from tests import synthetic
+
+# Figures are only drawn, never shown
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+
+@pytest.fixture(autouse=True)
+def isolated_config(tmp_path, monkeypatch):
+    monkeypatch.setenv('ASTROSTATS_CONFIG', str(tmp_path / 'none.ini'))
+    monkeypatch.setenv('ASTROSTATS_CACHE_DIR', str(tmp_path / 'cache'))
+    config.load()
+    yield config.get_config()
+    monkeypatch.undo()
+    config.load()
+
+
+@pytest.fixture(scope='session')
+def swan_path(tmp_path_factory):
+    """
+    Small synthetic solar_flare_data database (synthetic.swan_db).
+    Tests must not write to it; copy it first.
+    """
+    path = str(tmp_path_factory.mktemp('swan') / 'swan.db')
+    synthetic.swan_db(path, 5000, seed=1)
+    return path
+
+
+@pytest.fixture(scope='session')
+def cube_path(tmp_path_factory):
+    """
+    Synthetic float32 CBI cube, 40 frames of 48 x 48 (synthetic.cube).
+    """
+    path = str(tmp_path_factory.mktemp('cube') / 'cube.npy')
+    synthetic.cube(path, 40, 48, seed=1)
+    return path
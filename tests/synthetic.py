@@ -0,0 +1,81 @@
+"""
+Small synthetic inputs for the tests: a CBI catalog, a SWAN
+solar_flare_data database and a CBI cube, deterministic per seed.
+"""
+
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+SPAN = ('2010-05-01', '2024-12-31')
+KEYWORDS = ('USFLUX', 'TOTUSJZ', 'TOTBSQ', 'MEANPOT', 'TOTPOT', 'R_VALUE')
+CLASSES = np.array(list('ABCMX'))
+
+
+def _span():
+    lo, hi = (pd.Timestamp(s) for s in SPAN)
+    return lo, int((hi - lo).total_seconds())
+
+
+def catalog(n, seed=0):
+    """
+    n CME events as load_catalog returns them: sorted Date on the minute,
+    Vel (about 10% zero), CBI (lognormal) and Cls (GOES class, about 5%
+    missing).
+    """
+    rng = np.random.default_rng([seed, 1])
+    lo, span = _span()
+    seconds = np.sort(rng.integers(0, span, n))
+    dates = lo + pd.to_timedelta(seconds - seconds % 60, unit='s')
+    cbi = rng.lognormal(0.5, 0.8, n)
+    vel = np.maximum(0, 300 + 60 * cbi + rng.normal(0, 200, n)).round()
+    vel[rng.random(n) < 0.1] = 0
+    cls = np.char.add(CLASSES[rng.integers(0, len(CLASSES), n)],
+                      np.char.mod('%.1f', rng.uniform(1, 9.9, n))).astype(object)
+    cls[rng.random(n) < 0.05] = None
+    return pd.DataFrame({'Date': dates, 'Vel': vel.astype(int), 'CBI': cbi, 'Cls': cls})
+
+
+def write_workbook(df, path):
+    """
+    Save a catalog as the LASCO workbook: original column names, Date as
+    text.
+    """
+    out = df.rename(columns={'Vel': 'Corrected Velocity', 'CBI': 'Median Brightness'})
+    out['Date'] = out['Date'].dt.strftime('%Y-%m-%d %H:%M')
+    out.to_excel(path, index=False)
+
+
+def swan_db(path, n, seed=0, keywords=KEYWORDS):
+    """
+    solar_flare_data with n rows: evenly spaced Timestamps over SPAN, a few
+    hundred HARPNUMs, CBI and lognormal keywords with about 2% NULLs.
+    """
+    rng = np.random.default_rng([seed, 2])
+    lo, span = _span()
+    seconds = np.arange(n, dtype=np.int64) * span // n
+    frame = pd.DataFrame({
+        'Timestamp': (lo + pd.to_timedelta(seconds, unit='s')).strftime('%Y-%m-%d %H:%M:%S'),
+        'HARPNUM': rng.integers(1, 400, n),
+        'CBI': rng.lognormal(0.5, 0.8, n),
+    })
+    for k in keywords:
+        values = rng.lognormal(20 if k in ('USFLUX', 'TOTPOT') else 5, 1.0, n)
+        values[rng.random(n) < 0.02] = np.nan
+        frame[k] = values
+    frame = frame.astype(object).where(frame.notna(), None)
+    with sqlite3.connect(path) as conn:
+        conn.execute(f"CREATE TABLE solar_flare_data (Timestamp TEXT, HARPNUM INTEGER, CBI REAL, "
+                     f"{', '.join(k + ' REAL' for k in keywords)})")
+        conn.executemany(f"INSERT INTO solar_flare_data VALUES ({', '.join('?' * len(frame.columns))})",
+                         frame.itertuples(index=False, name=None))
+    conn.close()
+
+
+def cube(path, frames, side, seed=0):
+    """
+    float32 (frames, side, side) lognormal cube saved as a plain .npy.
+    """
+    rng = np.random.default_rng([seed, 3])
+    np.save(path, rng.lognormal(0, 0.5, (frames, side, side)).astype(np.float32))
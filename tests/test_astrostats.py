@@ -0,0 +1,50 @@
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import astrostats
+import cbi_cube
+import sharp_timeseries
+
+
+def test_parser_imports_nothing_heavy():
+    code = ("import sys, astrostats; astrostats.build_parser(); "
+            "heavy = ('numpy', 'pandas', 'scipy', 'matplotlib'); "
+            "print(sorted(m for m in heavy if m in sys.modules))")
+    out = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(astrostats.__file__),
+                         capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == '[]'
+
+
+def test_timeseries_with_set_override(swan_path, tmp_path):
+    out = str(tmp_path / 'sweep.csv')
+    assert astrostats.main(['--set', f'paths.swan_cbi_db={swan_path}',
+                            'timeseries', 'USFLUX', 'log10(TOTPOT)', '-o', out]) == 0
+    expected = sharp_timeseries.correlation_sweep(swan_path, ['USFLUX', 'log10(TOTPOT)'])
+    pd.testing.assert_frame_equal(pd.read_csv(out), expected, check_dtype=False)
+
+
+def test_cube_to_json(cube_path, tmp_path):
+    out = str(tmp_path / 'frames.json')
+    assert astrostats.main(['cube', '--cube-file', cube_path,
+                            '--dates-file', str(tmp_path / 'none.npy'),
+                            '--skip', '5', '--reductions', 'median', 'max', '-o', out]) == 0
+    with open(out) as fh:
+        records = json.load(fh)
+    expected = cbi_cube.frame_reductions(cube_path, ('median', 'max'), start=5)
+    assert [r['frame'] for r in records] == expected.index.tolist()
+    np.testing.assert_allclose([r['median'] for r in records], expected['median'], rtol=1e-6)
+
+
+def test_errors(tmp_path, capsys):
+    assert astrostats.main(['cube', '--cube-file', str(tmp_path / 'missing.npy')]) == 2
+    assert 'astrostats cube' in capsys.readouterr().err
+    with pytest.raises(SystemExit):
+        astrostats.main(['--set', 'swan_db=/tmp/x.db', 'index'])
+    with pytest.raises(SystemExit):
+        astrostats.main(['phases', '--phases', 'NO_SUCH'])
@@ -0,0 +1,31 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import benchmark
+
+
+def test_catalog_chunks_are_sorted_and_bounded():
+    chunks = list(benchmark.iter_catalog(2500, seed=3, chunk_rows=1000))
+    assert [len(c) for c in chunks] == [1000, 1000, 500]
+    df = pd.concat(chunks, ignore_index=True)
+    assert df['Date'].is_monotonic_increasing
+    lo, hi = (pd.Timestamp(s) for s in benchmark.SPAN)
+    assert lo <= df['Date'].min() and df['Date'].max() <= hi
+    assert (df['Date'].dt.second == 0).all()
+    assert 0.05 < (df['Vel'] == 0).mean() < 0.15 and 0.02 < df['Cls'].isna().mean() < 0.08
+
+
+def test_generate_reuses_files(tmp_path):
+    work_dir = str(tmp_path / 'bench')
+    catalog, paths = benchmark.generate(500, work_dir, seed=2)
+    expected = benchmark.synth_catalog(500, 2)
+    pd.testing.assert_frame_equal(catalog[['Vel', 'Cls']], expected[['Vel', 'Cls']])
+    np.testing.assert_allclose(catalog['CBI'], expected['CBI'], rtol=1e-15)
+    stamps = {k: os.stat(p).st_mtime_ns for k, p in paths.items() if p and os.path.exists(p)}
+    assert {'catalog', 'catalog_csv', 'swan_db', 'cube_file'} <= set(stamps)
+
+    again, _ = benchmark.generate(500, work_dir, seed=2)
+    assert {k: os.stat(paths[k]).st_mtime_ns for k in stamps} == stamps
+    pd.testing.assert_frame_equal(again, catalog)
@@ -0,0 +1,84 @@
+import os
+
+import pandas as pd
+import pytest
+
+import cbi_catalog
+import config
+from tests import synthetic
+
+pytest.importorskip('pyarrow')
+pytest.importorskip('openpyxl')
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    df = synthetic.catalog(200, seed=4)
+    # A mixed column, like the notes in the marked-AR catalog
+    df['Note'] = [7 if i % 3 == 0 else ('AR' if i % 3 == 1 else None) for i in range(len(df))]
+    path = str(tmp_path / 'cbi.xlsx')
+    synthetic.write_workbook(df, path)
+    return path
+
+
+def load(path, **kwargs):
+    return cbi_catalog.load_catalog.uncached(path, **kwargs)
+
+
+def test_miss_and_hit_return_the_same_frame(workbook, tmp_path):
+    cache_dir = str(tmp_path / 'arrow')
+    os.makedirs(cache_dir)
+    miss = load(workbook, cache_dir=cache_dir)
+    assert os.path.exists(cbi_catalog.cache_path(workbook, cache_dir))
+    hit = load(workbook, cache_dir=cache_dir)
+    pd.testing.assert_frame_equal(miss, hit)
+    assert {'Date', 'Vel', 'CBI', 'Cls'} <= set(hit.columns)
+    assert hit['Date'].dtype.kind == 'M'
+
+    excel = cbi_catalog.read_catalog_excel(workbook)
+    pd.testing.assert_frame_equal(hit[['Date', 'Vel', 'CBI']], excel[['Date', 'Vel', 'CBI']],
+                                  check_dtype=False)
+
+
+def test_columns_on_miss_and_hit(workbook):
+    miss = load(workbook, columns=['Date', 'CBI'], refresh=True)
+    hit = load(workbook, columns=['Date', 'CBI'])
+    assert list(miss.columns) == ['Date', 'CBI']
+    pd.testing.assert_frame_equal(miss, hit)
+
+
+def test_fingerprint_invalidation(workbook):
+    load(workbook)
+    cache_file = cbi_catalog.cache_path(workbook)
+    # Touched but unchanged: the sha256 keeps the cache
+    os.utime(workbook, (1e9, 1e9))
+    assert cbi_catalog.is_fresh(workbook, cache_file)
+
+    df = cbi_catalog.read_catalog_excel(workbook)
+    df.loc[0, 'CBI'] = 1e6
+    synthetic.write_workbook(df.drop(columns=['Note']), workbook)
+    assert not cbi_catalog.is_fresh(workbook, cache_file)
+    assert load(workbook)['CBI'].iloc[0] == 1e6
+    assert cbi_catalog.is_fresh(workbook, cache_file)
+
+
+def test_default_cache_under_config_cache_dir(workbook):
+    load(workbook)
+    cache_file = cbi_catalog.cache_path(workbook)
+    assert os.path.dirname(cache_file) == os.path.join(config.path('cache_dir'), 'catalog')
+    assert os.path.exists(cache_file)
+    assert not os.path.exists(os.path.splitext(workbook)[0] + cbi_catalog.CACHE_SUFFIX)
+
+
+def test_unwritable_cache_still_loads(workbook, tmp_path, monkeypatch, caplog):
+    cache_dir = str(tmp_path / 'arrow')
+
+    def full_disk(src, dst):
+        raise OSError(28, 'No space left on device')
+
+    monkeypatch.setattr(os, 'replace', full_disk)
+    df = load(workbook, cache_dir=cache_dir)
+    monkeypatch.undo()
+    pd.testing.assert_frame_equal(df, load(workbook, cache_dir=cache_dir))
+    assert 'Could not write the catalog cache' in caplog.text
+    assert not any(name.endswith('.tmp') for name in os.listdir(cache_dir))
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+import cbi_cube
+
+
+@pytest.fixture
+def cube(cube_path):
+    return np.array(cbi_cube.open_cube(cube_path))
+
+
+@pytest.mark.parametrize('executor', ['thread', 'process'])
+def test_frame_reductions_match_numpy(cube_path, cube, executor):
+    mask = np.zeros(cube.shape[1:], dtype=bool)
+    mask[10:20, 5:40] = True
+    got = cbi_cube.frame_reductions(cube_path, ('median', 'mean', 'max'), percentiles=(10, 90),
+                                    masks={'box': mask}, start=3, stop=35, chunk_frames=7,
+                                    workers=2, executor=executor)
+    flat = cube[3:35].reshape(32, -1).astype(float)
+    assert got.index.tolist() == list(range(3, 35))
+    np.testing.assert_allclose(got['median'], np.median(flat, axis=1), rtol=1e-6)
+    np.testing.assert_allclose(got['mean'], flat.mean(axis=1), rtol=1e-5)
+    np.testing.assert_array_equal(got['max'], flat.max(axis=1))
+    for q in (10, 90):
+        np.testing.assert_allclose(got[f'p{q}'], np.percentile(flat, q, axis=1), rtol=1e-6)
+    np.testing.assert_allclose(got['box'], flat[:, mask.ravel()].sum(axis=1), rtol=1e-5)
+
+
+def test_chunking_does_not_change_results(cube):
+    whole = cbi_cube.frame_medians(cube, chunk_frames=len(cube))
+    np.testing.assert_array_equal(cbi_cube.frame_medians(cube, chunk_frames=3, workers=3), whole)
+    with pytest.raises(ValueError):
+        cbi_cube.frame_reductions(cube, ('mode',))
+    with pytest.raises(ValueError):
+        cbi_cube.frame_reductions(cube, executor='process')
+
+
+def test_convert_pickled_cube(cube, tmp_path):
+    src, dst = str(tmp_path / 'pickled.npy'), str(tmp_path / 'plain.npy')
+    frames = np.empty(len(cube[:5]), dtype=object)
+    for i in range(len(frames)):
+        frames[i] = cube[i].astype(float)
+    np.save(src, frames, allow_pickle=True)
+    with pytest.raises(ValueError, match='convert_cube'):
+        cbi_cube.open_cube(src)
+    cbi_cube.convert_cube(src, dst)
+    out = cbi_cube.open_cube(dst)
+    assert isinstance(out, np.memmap) and out.dtype == np.float32
+    np.testing.assert_array_equal(out, cube[:5])
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import decimate
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(0)
+    x = np.sort(rng.uniform(0, 1000, 20_000))
+    y = np.cumsum(rng.normal(size=len(x)))
+    return x, y
+
+
+def test_minmax_keeps_every_bucket_extreme(series):
+    x, y = series
+    n_buckets = 100
+    idx = decimate.minmax_indices(x, y, n_buckets)
+    assert len(idx) <= 2 * n_buckets + 2
+    assert np.all(np.diff(idx) > 0)
+    edges = np.linspace(x[0], x[-1], n_buckets + 1)
+    bucket = np.clip(np.searchsorted(edges, x, 'right') - 1, 0, n_buckets - 1)
+    kept = set(idx)
+    for b in range(n_buckets):
+        members = np.flatnonzero(bucket == b)
+        assert members[np.argmin(y[members])] in kept
+        assert members[np.argmax(y[members])] in kept
+
+
+def lttb_reference(x, y, n_out):
+    n = len(x)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    out, a = [0], 0
+    for i in range(n_out - 2):
+        if i + 2 < len(edges):
+            nxt = range(edges[i + 1], edges[i + 2])
+            cx, cy = np.mean([x[j] for j in nxt]), np.mean([y[j] for j in nxt])
+        else:
+            cx, cy = x[-1], y[-1]
+        best, best_area = None, -1
+        for j in range(edges[i], edges[i + 1]):
+            area = abs((x[a] - cx) * (y[j] - y[a]) - (x[a] - x[j]) * (cy - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        a = best
+        out.append(a)
+    return out + [n - 1]
+
+
+def test_lttb_matches_reference(series):
+    x, y = (v[:3000] for v in series)
+    np.testing.assert_array_equal(decimate.lttb_indices(x, y, 150), lttb_reference(x, y, 150))
+
+
+def test_short_series_unchanged():
+    x = np.arange(10.0)
+    np.testing.assert_array_equal(decimate.decimate_indices(x, x, 100), np.arange(10))
+    np.testing.assert_array_equal(decimate.decimate_indices(x, x, 100, 'lttb'), np.arange(10))
+    with pytest.raises(ValueError):
+        decimate.decimate_indices(x, x, 4, 'mean')
+
+
+def test_decimate_drops_nan_and_keeps_datetimes():
+    x = pd.date_range('2012-01-01', periods=5000, freq='12min').to_numpy()
+    y = np.sin(np.arange(5000) / 50.0)
+    y[::7] = np.nan
+    dx, dy = decimate.decimate(x, y, n_out=200)
+    assert dx.dtype == x.dtype
+    assert np.isfinite(dy).all()
+    assert dy.max() == np.nanmax(y) and dy.min() == np.nanmin(y)
+
+
+def test_view_redecimates_visible_range(series):
+    x, y = series
+    s = decimate.DecimatedSeries(x, y)
+    vx, vy = s.view(100, 200, n_out=100)
+    assert vx[0] <= 100 and vx[-1] >= 200
+    inside = (x >= 100) & (x <= 200)
+    assert vy.max() >= y[inside].max() and vy.min() <= y[inside].min()
+    assert s.view(100, 200, n_out=100)[0] is vx
+
+
+def test_plot_follows_xlim(series):
+    plt = pytest.importorskip('matplotlib.pyplot')
+    x, y = series
+    fig, ax = plt.subplots()
+    try:
+        line = decimate.plot_decimated(ax, x, y, n_out=50)
+        assert len(line.get_xdata()) <= 52
+        ax.set_xlim(100, 110)
+        shown = line.get_xdata()
+        assert shown[0] <= 100 and shown[-1] >= 110 and shown[1] > 99
+    finally:
+        plt.close(fig)
@@ -0,0 +1,20 @@
+import numpy as np
+
+import flare_class
+
+
+def test_matches_loop_on_valid_classes():
+    rng = np.random.default_rng(0)
+    classes = [f"{c}{m:.1f}" for c, m in zip(rng.choice(list('ABCMX'), 500),
+                                               rng.uniform(1, 9.9, 500))]
+    got, rejected = flare_class.parse_flare_class(classes)
+    assert rejected == 0
+    np.testing.assert_array_equal(got, flare_class._parse_loop(classes))
+
+
+def test_scale_and_malformed_entries():
+    got, rejected = flare_class.parse_flare_class(
+        ['X1.0', 'm2.5', ' C3 ', 'B', 'Z1.0', '', None, np.nan, 'A1.5', 'M1.2.3'])
+    expected = [1e-4, 2.5e-5, 3e-6, np.nan, np.nan, np.nan, np.nan, np.nan, 1.5e-8, np.nan]
+    np.testing.assert_allclose(got, expected, rtol=1e-15)
+    assert rejected == 6
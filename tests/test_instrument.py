@@ -0,0 +1,82 @@
+import json
+import logging
+import os
+
+import numpy as np
+import pytest
+
+import instrument
+import resample_stats
+
+
+@pytest.fixture
+def trace(tmp_path):
+    """
+    Configure tracing for one test and switch it off again afterwards.
+    """
+    def configure(mode, **kwargs):
+        instrument.configure(trace=mode, trace_file=str(tmp_path / 'trace.{pid}.json'), **kwargs)
+        with instrument._lock:
+            instrument._events.clear()
+            instrument._counters.clear()
+    yield configure
+    instrument.disable()
+    with instrument._lock:
+        instrument._events.clear()
+
+
+def test_off_is_a_no_op(trace):
+    instrument.disable()
+    assert instrument.stage('x') is instrument._NULL
+    instrument.count('rows', 5)
+    assert instrument.counters() == {}
+
+
+def test_log_records_counter_deltas(trace, caplog):
+    trace('log')
+    with caplog.at_level(logging.INFO, logger='instrument'):
+        instrument.count('rows', 2)
+        with instrument.stage('outer', keyword='CBI'):
+            instrument.count('rows', 3)
+            with instrument.stage('inner'):
+                instrument.count('queries')
+        with pytest.raises(KeyError):
+            with instrument.stage('failing'):
+                raise KeyError('x')
+    inner, outer, failing = (json.loads(r.getMessage()) for r in caplog.records)
+    assert (inner['stage'], inner['depth'], inner['queries']) == ('inner', 1, 1)
+    assert (outer['rows'], outer['queries'], outer['keyword']) == (3, 1, 'CBI')
+    assert failing['error'] == 'KeyError'
+
+
+def test_tracemalloc_profile(trace, monkeypatch):
+    trace('log', profile='tracemalloc', profile_stages='alloc*')
+    records = []
+    monkeypatch.setattr(instrument, '_emit',
+                        lambda settings, record, t0, elapsed: records.append(record))
+    with instrument.stage('alloc'):
+        data = np.ones(1 << 20)
+    with instrument.stage('other'):
+        pass
+    assert records[0]['traced_peak_mb'] >= data.nbytes / 1024 ** 2
+    assert 'traced_peak_mb' not in records[1]
+
+
+def test_chrome_trace_merges_pool_workers(trace, tmp_path):
+    trace('chrome')
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=200)
+    with instrument.stage('top'):
+        resample_stats.bootstrap.uncached(x, x + rng.normal(size=200), n_replicates=400,
+                                          batch_size=100, workers=2)
+    path = instrument.write_chrome_trace()
+    assert path == str(tmp_path / f'trace.{os.getpid()}.json')
+    with open(path) as fh:
+        events = [e for e in json.load(fh)['traceEvents'] if e['ph'] == 'X']
+    batches = [e for e in events if e['name'] == 'stats.bootstrap_batch']
+    assert len(batches) == 4
+    assert {e['pid'] for e in batches} - {os.getpid()}
+    top = next(e for e in events if e['name'] == 'top')
+    # Workers share the parent's clock origin
+    assert all(top['ts'] <= e['ts'] <= top['ts'] + top['dur'] for e in batches)
+    assert list(tmp_path.glob('*.part')) == []
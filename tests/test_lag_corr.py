@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import lag_corr
+import sunspots
+
+
+@pytest.fixture
+def pair():
+    rng = np.random.default_rng(0)
+    n = 400
+    x = np.cumsum(rng.normal(size=n))
+    y = np.roll(x, 7) + rng.normal(size=n)
+    x[rng.random(n) < 0.1] = np.nan
+    y[150:180] = np.nan
+    return x, y
+
+
+def pearson(a, b, w=None):
+    ok = np.isfinite(a) & np.isfinite(b)
+    a, b = a[ok], b[ok]
+    w = np.ones(len(a)) if w is None else w[ok]
+    if w.sum() < lag_corr.MIN_PAIRS:
+        return w.sum(), np.nan
+    ma, mb = np.average(a, weights=w), np.average(b, weights=w)
+    cov = np.sum(w * (a - ma) * (b - mb))
+    return w.sum(), cov / np.sqrt(np.sum(w * (a - ma) ** 2) * np.sum(w * (b - mb) ** 2))
+
+
+def shifted(x, y, k, w=None):
+    """
+    x[i], y[i + k] (and w[i]) over the i where both exist.
+    """
+    n = len(x)
+    i = np.arange(max(0, -k), min(n, n - k))
+    return x[i], y[i + k], None if w is None else w[i]
+
+
+def test_xcorr_matches_brute_force(pair):
+    x, y = pair
+    table = lag_corr.xcorr(x, y, max_lag=60)
+    assert list(table.index) == list(range(-60, 61))
+    for k in table.index:
+        n, r = pearson(*shifted(x, y, k))
+        assert table.loc[k, 'n'] == n
+        assert table.loc[k, 'r'] == pytest.approx(r, abs=1e-12)
+    assert lag_corr.peak(table).name == 7
+
+
+def test_block_weights_count_draws():
+    rng = np.random.default_rng(1)
+    n, block, size = 50, 8, 5
+    w = lag_corr._block_weights(np.random.default_rng(1), size, n, block)
+    starts = rng.integers(0, n - block + 1, size=(size, -(-n // block)))
+    for row, s in zip(w, starts):
+        drawn = np.concatenate([np.arange(a, a + block) for a in s])[:n]
+        np.testing.assert_array_equal(row, np.bincount(drawn, minlength=n))
+    assert (w.sum(axis=1) == n).all()
+
+
+def test_bootstrap_replicates_are_weighted_pearson(pair):
+    x, y = pair
+    x0, y0, mx, my = lag_corr._prepare(x, y)
+    r = lag_corr._bootstrap_batch(x0, y0, mx, my, 20, 30, 3, np.random.SeedSequence(5))
+    w = lag_corr._block_weights(np.random.default_rng(np.random.SeedSequence(5)), 3, len(x), 30)
+    for j in range(3):
+        for k in (-20, 0, 7, 20):
+            _, expected = pearson(*shifted(x, y, k, w[j].astype(float)))
+            assert r[j, k + 20] == pytest.approx(expected, abs=1e-10)
+
+
+def test_block_bootstrap_bands(pair):
+    x, y = pair
+    one = lag_corr.block_bootstrap.uncached(x, y, max_lag=30, block=40, n_replicates=200,
+                                            batch_size=50, workers=1)
+    two = lag_corr.block_bootstrap.uncached(x, y, max_lag=30, block=40, n_replicates=200,
+                                            batch_size=50, workers=2)
+    pd.testing.assert_frame_equal(one, two)
+    pd.testing.assert_series_equal(one['r'], lag_corr.xcorr(x, y, 30)['r'])
+    assert (one['r_lo'] <= one['r_hi']).all() and (one['r_se'] > 0).all()
+
+
+def test_to_grid_methods():
+    times = pd.to_datetime(['2012-01-01', '2012-01-02', '2012-01-04', '2012-01-20'])
+    s = pd.Series([1.0, 2.0, 4.0, 20.0], index=times)
+    grid = pd.date_range('2012-01-01', '2012-01-21', freq='1D')
+    linear = lag_corr.to_grid(s, grid, 'linear', max_gap='3D')
+    np.testing.assert_array_equal(linear[:4], [1.0, 2.0, 3.0, 4.0])
+    # 16-day gap, and past the last sample
+    assert np.isnan(linear[4:19]).all() and linear[19] == 20.0 and np.isnan(linear[20])
+
+    fine = pd.Series(np.arange(48.0), index=pd.date_range('2012-01-01', periods=48, freq='h'))
+    mean = lag_corr.to_grid(fine, pd.date_range('2012-01-01', periods=3, freq='1D'), 'mean')
+    np.testing.assert_array_equal(mean, [11.5, 35.5, np.nan])
+    nearest = lag_corr.to_grid(s, grid, 'nearest', max_gap='1D')
+    assert nearest[2] == 2.0 and np.isnan(nearest[10])
+
+
+def test_cbi_sunspot_lags(cube_path, tmp_path):
+    frames = np.load(cube_path, mmap_mode='r').shape[0]
+    dates = pd.date_range('2012-01-01', periods=frames, freq='12h').to_numpy()
+    dates_file = str(tmp_path / 'dates.npy')
+    np.save(dates_file, dates)
+    days = pd.date_range('2011-11-01', '2012-03-31', freq='1D')
+    lines = [f"{d.year:4d} {d.month:02d} {d.day:02d} {d.year + d.dayofyear / 366:8.3f} "
+             f"{50 + i % 30:3d}   5.0    20 0" for i, d in enumerate(days)]
+    source = tmp_path / 'SN_d.txt'
+    source.write_text('\n'.join(lines) + '\n')
+    data = sunspots.ingest_file(str(source), 'daily')
+    assert (data['num_obs'] == 20).all() and (data['provisional'] == 0).all()
+
+    grid, table = lag_corr.cbi_sunspot_lags(cube_path, dates_file, max_lag='5D', block='4D',
+                                            n_replicates=50, skip=0, workers=1)
+    assert len(grid) == frames // 2 and grid['valid'].all()
+    assert list(table.index) == list(range(-5, 6))
+    np.testing.assert_array_equal(table['lag_days'], np.arange(-5.0, 6.0))
+    pd.testing.assert_series_equal(table['r'], lag_corr.xcorr(grid['x'], grid['y'], 5)['r'])
@@ -0,0 +1,103 @@
+import shutil
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import matched_events
+import window_join
+from tests import synthetic
+
+
+@pytest.fixture
+def sharp_db(swan_path, tmp_path):
+    path = str(tmp_path / 'swan.db')
+    shutil.copy(swan_path, path)
+    return path
+
+
+@pytest.fixture
+def events():
+    df = synthetic.catalog(200, seed=7)[['Date']]
+    # Events before the SWAN span get empty windows
+    early = pd.DataFrame({'Date': pd.to_datetime(['2001-01-01 12:00'])})
+    return pd.concat([df, early], ignore_index=True)
+
+
+def assert_matches_window_join(events, sharp_db, match_db, keyword, hours):
+    for agg in ('max', 'mean', 'min', 'count'):
+        got = matched_events.lookup(events['Date'], sharp_db, keyword, agg, hours, match_db)
+        expected = window_join.get_sharp_near_times(events, sharp_db, keyword, hours, agg)
+        np.testing.assert_allclose(got, np.asarray(expected, dtype=float), rtol=1e-12, equal_nan=True)
+
+
+def test_refresh_matches_window_join(sharp_db, events, tmp_path):
+    match_db = str(tmp_path / 'matches.db')
+    counts = matched_events.refresh(events['Date'], sharp_db, ['MEANPOT', 'TOTBSQ'], [3, 24],
+                                    match_db)
+    n = events['Date'].nunique()
+    assert counts == {(k, float(w)): n for k in ('MEANPOT', 'TOTBSQ') for w in (3, 24)}
+    for hours in (3, 24):
+        assert_matches_window_join(events, sharp_db, match_db, 'TOTBSQ', hours)
+
+    wide = matched_events.load_matches(sharp_db, ['MEANPOT', 'TOTBSQ'], 24, 'mean', match_db)
+    expected = window_join.get_sharp_near_times(events, sharp_db, 'MEANPOT', 24, 'mean')
+    by_date = pd.Series(expected, index=events['Date']).groupby(level=0).first()
+    np.testing.assert_allclose(wide['MEANPOT'], by_date.sort_index(), rtol=1e-12, equal_nan=True)
+
+    # Nothing changed, nothing recomputed; full=True redoes everything
+    again = matched_events.refresh(events['Date'], sharp_db, ['MEANPOT'], [3], match_db)
+    assert set(again.values()) == {0}
+    assert matched_events.refresh(events['Date'], sharp_db, ['MEANPOT'], [3], match_db,
+                                  full=True)[('MEANPOT', 3.0)] == n
+
+
+def test_incremental_refresh_after_append(sharp_db, events, tmp_path):
+    match_db = str(tmp_path / 'matches.db')
+    matched_events.refresh(events['Date'], sharp_db, ['MEANPOT'], [6], match_db)
+
+    with sqlite3.connect(sharp_db) as conn:
+        last = conn.execute("SELECT MAX(Timestamp) FROM solar_flare_data").fetchone()[0]
+        late = pd.date_range(pd.Timestamp(last) + pd.Timedelta('10min'), periods=40, freq='30min')
+        conn.executemany("INSERT INTO solar_flare_data (Timestamp, HARPNUM, MEANPOT) VALUES (?, 1, ?)",
+                         [(t.strftime(window_join.TIME_FMT), float(i)) for i, t in enumerate(late)])
+    # One event straddling the old last Timestamp, one wholly after it
+    grown = pd.concat([events, pd.DataFrame({'Date': [pd.Timestamp(last) + pd.Timedelta('1h'),
+                                                      late[30]]})], ignore_index=True)
+    straddling = (events['Date'] + pd.Timedelta('6h')).dt.strftime(window_join.TIME_FMT) > last
+    counts = matched_events.refresh(grown['Date'], sharp_db, ['MEANPOT'], [6], match_db)
+    assert counts[('MEANPOT', 6.0)] == 2 + straddling.sum()
+    assert_matches_window_join(grown, sharp_db, match_db, 'MEANPOT', 6)
+
+
+def test_incremental_refresh_after_backfill(sharp_db, events, tmp_path):
+    match_db = str(tmp_path / 'matches.db')
+    matched_events.refresh(events['Date'], sharp_db, ['MEANPOT', 'TOTBSQ'], [6, 24], match_db)
+
+    # A HARP ingested late: rows far below the newest Timestamp
+    target = events['Date'].iloc[50]
+    with sqlite3.connect(sharp_db) as conn:
+        conn.execute("INSERT INTO solar_flare_data (Timestamp, HARPNUM, MEANPOT) "
+                     "VALUES (?, 9999, 1e30)",
+                     ((target + pd.Timedelta('2h')).strftime(window_join.TIME_FMT),))
+    counts = matched_events.refresh(events['Date'], sharp_db, ['MEANPOT', 'TOTBSQ'], [6, 24], match_db)
+    near = (events['Date'] - target - pd.Timedelta('2h')).abs()
+    assert counts[('MEANPOT', 6.0)] == events.loc[near <= pd.Timedelta('6h'), 'Date'].nunique() >= 1
+    assert counts[('MEANPOT', 24.0)] == events.loc[near <= pd.Timedelta('24h'), 'Date'].nunique()
+    # The new row has no TOTBSQ value, so nothing to redo there
+    assert counts[('TOTBSQ', 6.0)] == counts[('TOTBSQ', 24.0)] == 0
+    for hours in (6, 24):
+        assert_matches_window_join(events, sharp_db, match_db, 'MEANPOT', hours)
+    got = matched_events.lookup([target], sharp_db, 'MEANPOT', 'max', 6, match_db)
+    assert got[0] == 1e30
+
+
+def test_matched_is_a_drop_in(sharp_db, events, tmp_path):
+    match_db = str(tmp_path / 'matches.db')
+    got = matched_events.matched(events, sharp_db, 'TOTBSQ', 12, 'min', match_db)
+    expected = window_join.get_sharp_near_times(events, sharp_db, 'TOTBSQ', 12, 'min')
+    np.testing.assert_allclose(got, expected, rtol=1e-12, equal_nan=True)
+    assert np.isnan(got[-1])
+    with pytest.raises(ValueError):
+        matched_events.lookup(events['Date'], sharp_db, 'TOTBSQ', 'median', 12, match_db)
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import linregress
+
+import regress_batch
+from tests import synthetic
+
+FIELDS = {'slope': 'slope', 'intercept': 'intercept', 'r': 'rvalue', 'p_value': 'pvalue',
+          'stderr': 'stderr', 'intercept_stderr': 'intercept_stderr'}
+
+
+def assert_fit(row, x, y):
+    fit = linregress(x, y)
+    assert row['n'] == len(x)
+    for col, attr in FIELDS.items():
+        assert row[col] == pytest.approx(getattr(fit, attr), rel=1e-9, abs=1e-12), col
+
+
+def test_grouped_matches_linregress():
+    df = synthetic.catalog(3000, seed=6)
+    df['year'] = df['Date'].dt.year
+    df['cls'] = df['Cls'].str[0]
+    df.loc[df.index[::17], 'CBI'] = np.nan
+    res = regress_batch.grouped_linregress.uncached(df, 'year')
+    clean = df.dropna(subset=['CBI', 'Vel'])
+    assert list(res.index) == sorted(clean['year'].unique())
+    for year, group in clean.groupby('year'):
+        assert_fit(res.loc[year], group['CBI'], group['Vel'])
+
+    multi = regress_batch.grouped_linregress.uncached(df, ['year', 'cls'])
+    for key, group in clean.dropna(subset=['cls']).groupby(['year', 'cls']):
+        if len(group) > 2:
+            assert_fit(multi.loc[key], group['CBI'], group['Vel'])
+
+
+def test_stacked_matches_linregress():
+    rng = np.random.default_rng(7)
+    x = rng.normal(size=200)
+    Y = x[:, None] * np.arange(1, 6) + rng.normal(size=(200, 5))
+    Y[rng.random(Y.shape) < 0.1] = np.nan
+    res = regress_batch.stacked_linregress(x, Y, names=list('abcde'))
+    for j, name in enumerate('abcde'):
+        ok = np.isfinite(Y[:, j])
+        assert_fit(res.loc[name], x[ok], Y[ok, j])
+
+
+def test_degenerate_groups():
+    df = pd.DataFrame({'g': [1, 1, 2, 2, 2], 'CBI': [1.0, 2.0, 3.0, 3.0, 3.0],
+                       'Vel': [1.0, 3.0, 1.0, 2.0, 3.0]})
+    res = regress_batch.grouped_linregress.uncached(df, 'g')
+    # Two points: a perfect fit without a p-value; constant x: no slope
+    assert res.loc[1, 'slope'] == 2.0 and np.isnan(res.loc[1, 'p_value'])
+    assert np.isnan(res.loc[2, 'slope']) and res.loc[2, 'r'] == 0.0
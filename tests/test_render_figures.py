@@ -0,0 +1,88 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import render_figures
+import sunspots
+from tests import synthetic
+
+pytest.importorskip('openpyxl')
+
+NAMES = ['cbi_usflux_timeseries', 'cbi_all_errors', 'cbi_meanpot']
+
+
+@pytest.fixture
+def paths(swan_path, tmp_path):
+    workbook = str(tmp_path / 'cbi.xlsx')
+    synthetic.write_workbook(synthetic.catalog(150, seed=6), workbook)
+    swan = str(tmp_path / 'swan.db')
+    shutil.copy(swan_path, swan)
+    return {'cbi_file': workbook, 'swan_db': swan, 'swan_cbi_db': swan}
+
+
+def test_renders_then_skips_until_an_input_changes(paths, tmp_path):
+    out_dir = str(tmp_path / 'images')
+    status = render_figures.render(NAMES, out_dir, ('png', 'pdf'), workers=1, paths=paths)
+    assert status == {name: 'rendered' for name in NAMES}
+    for name in NAMES:
+        for fmt in ('png', 'pdf'):
+            assert os.path.getsize(os.path.join(out_dir, f'{name}.{fmt}')) > 0
+
+    assert set(render_figures.render(NAMES, out_dir, ('png',), workers=1, paths=paths).values()) \
+        == {'skipped'}
+    # A deleted output and a changed catalog re-render only what they touch
+    os.remove(os.path.join(out_dir, 'cbi_usflux_timeseries.png'))
+    synthetic.write_workbook(synthetic.catalog(150, seed=7), paths['cbi_file'])
+    status = render_figures.render(NAMES, out_dir, ('png',), workers=1, paths=paths)
+    assert status == {name: 'rendered' for name in NAMES}
+    assert render_figures.render(NAMES[:1], out_dir, ('png',), workers=1, force=True,
+                                 paths=paths) == {NAMES[0]: 'rendered'}
+
+
+def test_missing_input_and_unknown_figure(paths, tmp_path):
+    paths = dict(paths, swan_cbi_db=str(tmp_path / 'missing.db'))
+    status = render_figures.render(NAMES[:2], str(tmp_path / 'images'), workers=1, paths=paths)
+    assert status['cbi_usflux_timeseries'].startswith('failed')
+    assert status['cbi_all_errors'] == 'rendered'
+    with pytest.raises(KeyError):
+        render_figures.render(['no_such_figure'], str(tmp_path / 'images'), paths=paths)
+
+
+def test_key_tracks_builder_modules():
+    # Direct imports only; code_fingerprint folds in what those import
+    modules = render_figures.builder_code('sharp_timeseries')['modules']
+    assert set(modules) == {'sharp_timeseries.py', 'decimate.py', 'cbi_catalog.py'}
+    assert 'matched_events.py' in render_figures.builder_code('sharp_scatter')['modules']
+
+
+def silso_monthly(path, scale):
+    months = pd.date_range('2009-01-01', '2021-12-01', freq='MS')
+    with open(path, 'w') as fh:
+        for i, m in enumerate(months):
+            sn = scale * (50 + 40 * np.sin(i / 20))
+            fh.write(f"{m.year:4d} {m.month:02d} {m.year + (m.month - 0.5) / 12:8.3f}"
+                     f"{sn:7.1f}{5.0:6.1f}{300:6d} 0\n")
+    return path
+
+
+def test_sunspot_update_rerenders(tmp_path, monkeypatch):
+    cube, dates = str(tmp_path / 'cube.npy'), str(tmp_path / 'dates.npy')
+    np.save(cube, np.random.default_rng(0).random((120, 8, 8), dtype=np.float32))
+    np.save(dates, pd.date_range('2010-01-01', periods=120, freq='20D').to_numpy())
+    monkeypatch.setitem(sunspots.SOURCES, 'monthly', silso_monthly(str(tmp_path / 'SN_m.txt'), 1.0))
+    paths = {'cube_file': cube, 'dates_file': dates}
+    out_dir, names = str(tmp_path / 'images'), ['cbi_sunspots_time_series']
+
+    assert render_figures.render(names, out_dir, workers=1, paths=paths) == {names[0]: 'rendered'}
+    assert render_figures.render(names, out_dir, workers=1, paths=paths) == {names[0]: 'skipped'}
+    sunspots.ingest_file(silso_monthly(str(tmp_path / 'SN_m2.txt'), 1.5), 'monthly')
+    assert render_figures.render(names, out_dir, workers=1, paths=paths) == {names[0]: 'rendered'}
+
+    # No cached copy and an unreachable source
+    monkeypatch.setitem(sunspots.SOURCES, 'monthly', str(tmp_path / 'missing.txt'))
+    os.remove(sunspots.cache_file('monthly'))
+    status = render_figures.render(names, out_dir, workers=1, paths=paths)
+    assert status[names[0]] == 'failed: no silso_monthly'
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from scipy import stats
+
+import resample_stats
+
+
+@pytest.fixture
+def xy():
+    rng = np.random.default_rng(8)
+    x = rng.lognormal(0.5, 0.8, 150)
+    y = 300 + 60 * x + rng.normal(0, 200, 150)
+    x[::25] = np.nan
+    return x, y
+
+
+def test_bootstrap_replicates_are_resampled_fits(xy):
+    x, y = xy
+    res = resample_stats.bootstrap.uncached(x, y, n_replicates=300, batch_size=64, workers=1)
+    xc, yc = resample_stats._clean(x, y)
+    fit = stats.linregress(xc, yc)
+    assert res['n'] == len(xc) == 144
+    assert res['r'] == pytest.approx(fit.rvalue, rel=1e-12)
+    assert res['slope'] == pytest.approx(fit.slope, rel=1e-12)
+
+    # Replay the first batch's draws and fit each replicate directly
+    _, seeds = resample_stats.batches(300, len(xc), 64, 0)
+    idx = np.random.default_rng(seeds[0]).integers(0, len(xc), size=(64, len(xc)))
+    for j in (0, 31, 63):
+        rep = stats.linregress(xc[idx[j]], yc[idx[j]])
+        assert res['r_replicates'][j] == pytest.approx(rep.rvalue, rel=1e-10)
+        assert res['slope_replicates'][j] == pytest.approx(rep.slope, rel=1e-10)
+    assert res['r_ci'][0] < res['r'] < res['r_ci'][1]
+
+
+def test_results_do_not_depend_on_workers(xy):
+    x, y = xy
+    one = resample_stats.bootstrap.uncached(x, y, n_replicates=400, batch_size=100, workers=1)
+    two = resample_stats.bootstrap.uncached(x, y, n_replicates=400, batch_size=100, workers=2)
+    np.testing.assert_array_equal(one['r_replicates'], two['r_replicates'])
+    p1 = resample_stats.permutation_test.uncached(x, y, n_replicates=400, batch_size=100, workers=1)
+    p2 = resample_stats.permutation_test.uncached(x, y, n_replicates=400, batch_size=100, workers=2)
+    assert p1 == p2
+
+
+def test_permutation_p_value():
+    rng = np.random.default_rng(9)
+    x = rng.normal(size=60)
+    strong = resample_stats.permutation_test.uncached(x, x + 0.1 * rng.normal(size=60),
+                                                      n_replicates=999, workers=1)
+    assert strong['p_value'] == 1 / 1000
+    y = rng.normal(size=60)
+    null = resample_stats.permutation_test.uncached(x, y, n_replicates=4000, workers=1)
+    # Close to the t-test p-value, within the Monte Carlo error
+    assert null['p_value'] == pytest.approx(stats.pearsonr(x, y).pvalue, abs=0.03)
+
+
+def test_batches_fit_the_byte_budget():
+    sizes, seeds = resample_stats.batches(10_000, 5000, None, 0)
+    assert sum(sizes) == 10_000 and len(seeds) == len(sizes)
+    assert max(sizes) * 5000 * resample_stats.ITEM_BYTES <= resample_stats.BATCH_BYTES
+    assert resample_stats.batches(10, 10, None, 0)[0] == [10]
@@ -0,0 +1,128 @@
+import os
+import textwrap
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import result_cache
+
+calls = []
+
+
+@result_cache.cached('test.summarise', files=('path',), ignore=('workers',), refresh='refresh')
+def summarise(df, scale=1.0, path=None, workers=None, refresh=False):
+    calls.append(scale)
+    out = df.sum() * scale
+    if path is not None:
+        with open(path) as fh:
+            out['lines'] = len(fh.readlines())
+    return out
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    result_cache.clear()
+    calls.clear()
+    yield
+    result_cache.clear()
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({'a': np.arange(5.0), 'b': np.ones(5)})
+
+
+def test_memo_then_disk_hits(df):
+    first = summarise(df, 2.0)
+    assert calls == [2.0]
+    pd.testing.assert_series_equal(summarise(df, 2.0, workers=8), first)
+    assert calls == [2.0]
+    with result_cache._lock:
+        result_cache._memo.clear()
+    pd.testing.assert_series_equal(summarise(df, 2.0), first)
+    assert calls == [2.0]
+    assert result_cache.stats()['entries'] == 1
+
+
+def test_arguments_and_content_change_the_key(df):
+    summarise(df, 2.0)
+    summarise(df, 3.0)
+    summarise(df.assign(b=2.0))
+    summarise(df, 2.0, refresh=True)
+    assert calls == [2.0, 3.0, 1.0, 2.0]
+
+
+def test_files_fingerprinted_by_content(df, tmp_path):
+    path = tmp_path / 'input.txt'
+    path.write_text('a\nb\n')
+    assert summarise(df, path=str(path))['lines'] == 2
+    summarise(df, path=str(path))
+    path.write_text('a\nb\nc\n')
+    assert summarise(df, path=str(path))['lines'] == 3
+    assert len(calls) == 2
+
+
+@result_cache.cached('test.ones')
+def ones(n):
+    return {'values': np.ones(n)}
+
+
+def test_results_are_copies():
+    ones(3)['values'][:] = 0.0
+    assert ones(3)['values'].sum() == 3.0
+    ones(3)['values'][:] = 0.0
+    assert ones(3)['values'].sum() == 3.0
+
+
+def test_disabled(df, monkeypatch):
+    monkeypatch.setitem(result_cache.config.get_config()['cache'], 'result_cache', 'false')
+    summarise(df)
+    summarise(df)
+    assert len(calls) == 2 and result_cache.stats()['entries'] == 0
+
+
+def test_unreadable_entry_discarded(df):
+    summarise(df)
+    (entry,) = [p for _, _, p in result_cache._entries(result_cache.settings()['directory'])]
+    with open(entry, 'wb') as fh:
+        fh.write(b'not a pickle')
+    result_cache._memo.clear()
+    summarise(df)
+    assert len(calls) == 2
+
+
+def test_evict_least_recently_used(tmp_path):
+    directory = str(tmp_path / 'lru')
+    for i in range(5):
+        key = f"{i:02d}" + 'k' * 62
+        result_cache._disk_put(directory, key, np.zeros(1000), max_bytes=1 << 30)
+        os.utime(result_cache._entry_path(directory, key), (i, i))
+    size = os.path.getsize(result_cache._entry_path(directory, '00' + 'k' * 62))
+    assert result_cache.evict(directory, max_bytes=3 * size) == 3
+    left = sorted(os.path.basename(p)[:2] for _, _, p in result_cache._entries(directory))
+    assert left == ['03', '04']
+
+
+def test_code_fingerprint_follows_imports(tmp_path, monkeypatch):
+    modules = {
+        'analysis.py': "import helper\n\ndef run():\n    return helper.f()\n",
+        'helper.py': "def f():\n    from inner import g\n    return g()\n",
+        'inner.py': "def g():\n    return 1\n",
+        'unrelated.py': "x = 1\n",
+    }
+    for name, source in modules.items():
+        (tmp_path / name).write_text(textwrap.dedent(source))
+    monkeypatch.setattr(result_cache, 'PROJECT_DIR', str(tmp_path))
+
+    def fingerprint():
+        result_cache.code_fingerprint.cache_clear()
+        return result_cache.code_fingerprint(str(tmp_path / 'analysis.py'))
+
+    base = fingerprint()
+    (tmp_path / 'unrelated.py').write_text("x = 2\n")
+    assert fingerprint() == base
+    # A function-level import two modules away still counts
+    (tmp_path / 'inner.py').write_text("def g():\n    return 2\n")
+    assert fingerprint() != base
+    result_cache.code_fingerprint.cache_clear()
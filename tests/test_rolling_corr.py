@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+import rolling_corr
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(0)
+    n = 3000
+    # Irregular cadence with gaps, and NaNs in both series
+    steps = rng.exponential(3600, n)
+    steps[rng.random(n) < 0.01] *= 200
+    times = pd.Timestamp('2012-01-01') + pd.to_timedelta(np.cumsum(steps), unit='s')
+    x = rng.normal(size=n)
+    y = 0.5 * x + rng.normal(size=n) + np.sin(np.arange(n) / 300)
+    x[rng.random(n) < 0.05] = np.nan
+    y[rng.random(n) < 0.05] = np.nan
+    return times, x, y
+
+
+def test_count_window_matches_pandas(series):
+    _, x, y = series
+    res = rolling_corr.rolling_pearson(x, y, 50, min_periods=10)
+    ok = np.isfinite(x) & np.isfinite(y)
+    xs, ys = pd.Series(x[ok]), pd.Series(y[ok])
+    r = xs.rolling(50, min_periods=10).corr(ys)
+    slope = xs.rolling(50, min_periods=10).cov(ys) / xs.rolling(50, min_periods=10).var()
+    np.testing.assert_array_equal(res.index, np.flatnonzero(ok))
+    np.testing.assert_allclose(res['r'], r, rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(res['slope'], slope, rtol=1e-9, atol=1e-12)
+
+
+def test_time_window_matches_pandas(series):
+    times, x, y = series
+    res = rolling_corr.rolling_pearson(x, y, '27D', times=times, min_periods=5)
+    ok = np.isfinite(x) & np.isfinite(y)
+    xs = pd.Series(x[ok], index=times[ok])
+    ys = pd.Series(y[ok], index=times[ok])
+    expected = xs.rolling('27D', min_periods=5).corr(ys)
+    np.testing.assert_array_equal(res.index, expected.index)
+    np.testing.assert_allclose(res['r'], expected, rtol=1e-9, atol=1e-12)
+    np.testing.assert_array_equal(res['n'], xs.rolling('27D').count())
+
+
+def test_p_and_intercept_match_linregress(series):
+    times, x, y = series
+    at = times[[300, 900, 1500, 2100, 2700]].round('D')
+    res = rolling_corr.rolling_pearson(x, y, '10D', times=times, at=at, center=True)
+    ok = np.isfinite(x) & np.isfinite(y)
+    half = pd.Timedelta('5D')
+    for t, row in res.iterrows():
+        inside = ok & (times >= t - half) & (times <= t + half)
+        fit = stats.linregress(x[inside], y[inside])
+        assert row['n'] == inside.sum()
+        assert row['r'] == pytest.approx(fit.rvalue, rel=1e-9)
+        assert row['intercept'] == pytest.approx(fit.intercept, rel=1e-9, abs=1e-12)
+        assert row['p'] == pytest.approx(fit.pvalue, rel=1e-6)
+
+
+def test_large_offset_keeps_precision():
+    rng = np.random.default_rng(1)
+    x = 1e9 + np.concatenate([rng.normal(0, 1e3, 500), rng.normal(0, 1e-3, 500)])
+    y = 2 * x + rng.normal(0, 1e-3, 1000)
+    res = rolling_corr.rolling_pearson(x, y, 40)
+    i = 900
+    fit = stats.linregress(x[i - 39:i + 1], y[i - 39:i + 1])
+    assert res['r'].iloc[i] == pytest.approx(fit.rvalue, rel=1e-6)
+    assert res['slope'].iloc[i] == pytest.approx(fit.slope, rel=1e-6)
+
+
+def test_short_windows_are_nan():
+    res = rolling_corr.rolling_pearson([1.0, 2.0, 3.0, 5.0], [1.0, 3.0, 2.0, 4.0], 3, min_periods=3)
+    assert res['r'].iloc[:2].isna().all() and res['r'].iloc[2:].notna().all()
+    with pytest.raises(ValueError):
+        rolling_corr.rolling_pearson([1.0], [1.0], '1D')
+
+
+def test_rolling_sharp_on_swan(swan_path):
+    res = rolling_corr.rolling_sharp(swan_path, 'R_VALUE', window='180D', step='30D')
+    assert len(res) > 100
+    assert (res.index.to_series().diff().dropna() == pd.Timedelta('30D')).all()
+    valid = res.dropna()
+    assert len(valid) and valid['r'].between(-1, 1).all()
@@ -0,0 +1,101 @@
+import shutil
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import sharp_expr
+import swan_db
+from sharp_expr import Query, col, log10, ratio, sqrt
+
+
+@pytest.fixture
+def db(swan_path, tmp_path):
+    """
+    The synthetic SWAN table plus rows outside the log/sqrt/ratio domains.
+    """
+    path = str(tmp_path / 'swan.db')
+    shutil.copy(swan_path, path)
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            f"INSERT INTO {swan_db.TABLE} (Timestamp, HARPNUM, CBI, USFLUX, TOTUSJZ, TOTPOT, R_VALUE) "
+            "VALUES (?, 1, 1.0, ?, ?, ?, ?)",
+            [('2030-06-01 00:00:00', 0.0, 5.0, -3.0, -1.0),
+             ('2030-06-01 00:12:00', -2.0, 0.0, 0.0, 0.0),
+             ('2030-06-01 00:24:00', 4.0, None, 10.0, 2.0)])
+    return path
+
+
+def table(path):
+    with sqlite3.connect(path) as conn:
+        return pd.read_sql_query(f"SELECT * FROM {swan_db.TABLE} ORDER BY Timestamp", conn)
+
+
+def test_pushdown_matches_pandas(db):
+    q = (Query(db)
+         .select('CBI', ratio('TOTUSJZ', 'USFLUX'), log_totpot=log10('TOTPOT'),
+                 root=sqrt(col('R_VALUE')) * 2)
+         .where(col('USFLUX') > 1e8)
+         .between('2011-01-01', '2020-01-01'))
+    got = q.to_frame()
+
+    df = table(db)
+    outputs = {name: e.evaluate(df) for name, e in q.outputs.items()}
+    keep = (df['USFLUX'] > 1e8) & df['Timestamp'].between('2011-01-01', '2020-01-01')
+    expected = pd.DataFrame(outputs)[keep.to_numpy()].dropna()
+    assert list(got.columns) == ['Timestamp', 'CBI', 'TOTUSJZ/USFLUX', 'log_totpot', 'root']
+    assert len(got) == len(expected) > 100
+    for name in outputs:
+        np.testing.assert_allclose(got[name], expected[name], rtol=1e-12)
+
+
+def test_guards_drop_undefined_rows(db):
+    got = Query(db).select(log10('TOTPOT'), ratio('TOTUSJZ', 'USFLUX')) \
+        .between('2030-06-01', '2030-06-02').to_frame()
+    # TOTPOT <= 0 or USFLUX == 0 or a NULL keyword: nothing left
+    assert got.empty
+
+
+def test_allow_missing_keeps_rows(db):
+    got = (Query(db).select('CBI', log10('TOTPOT'), sqrt('R_VALUE'))
+           .allow_missing('log10(TOTPOT)', 'sqrt(R_VALUE)')
+           .between('2030-06-01', '2030-06-02').to_frame())
+    assert len(got) == 3
+    assert got['log10(TOTPOT)'].isna().tolist() == [True, True, False]
+    assert got['sqrt(R_VALUE)'].tolist()[1:] == [0.0, np.sqrt(2.0)]
+
+
+def test_parse_spec_labels():
+    for spec in ('USFLUX', 'log10(TOTPOT)', 'TOTUSJZ/USFLUX'):
+        assert sharp_expr.parse_spec(spec).label() == spec
+    with pytest.raises(ValueError):
+        col('USFLUX; DROP TABLE x')
+
+
+def test_fallbacks_return_null_outside_domain():
+    for name, (func, _) in sharp_expr.SQL_FUNCTIONS.items():
+        if name != 'abs':
+            assert func(None) is None
+    log10_ = sharp_expr.SQL_FUNCTIONS['log10'][0]
+    assert log10_(100.0) == 2.0 and log10_(0.0) is None and log10_(-1.0) is None
+    assert sharp_expr.SQL_FUNCTIONS['sqrt'][0](-4.0) is None
+
+
+def test_fallback_condition_before_guard(db):
+    q = Query(db).select('CBI').where(log10(col('TOTPOT')) > 1).between('2030-06-01', '2030-06-02')
+    sql, params = q.to_sql()
+    conn = sqlite3.connect(db)
+    try:
+        # Application functions replace the built-in ones, as on SQLite
+        # builds without math functions
+        for name, (func, _) in sharp_expr.SQL_FUNCTIONS.items():
+            if name != 'abs':
+                conn.create_function(name, 1, func, deterministic=True)
+        # Evaluate the user condition alone, before any guard
+        rows = conn.execute(f"SELECT Timestamp FROM {swan_db.TABLE} "
+                            "WHERE log10(TOTPOT) > 1 AND Timestamp BETWEEN ? AND ?", params).fetchall()
+        assert rows == []
+        assert conn.execute(sql, params).fetchall() == []
+    finally:
+        conn.close()
@@ -0,0 +1,133 @@
+import json
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import sharp_ingest
+import swan_db
+
+HARPS = (101, 102, 103)
+
+
+@pytest.fixture
+def source(tmp_path):
+    """
+    Ten days of 12-minute records for three HARPs, one file type each.
+    """
+    root = tmp_path / 'src'
+    root.mkdir()
+    rng = np.random.default_rng(0)
+    times = pd.date_range('2012-01-05', '2012-01-15', freq='12min', inclusive='left')
+    for harp, ext in zip(HARPS, sharp_ingest.FILE_TYPES):
+        df = pd.DataFrame({'T_REC': times.strftime('%Y.%m.%d_%H:%M:%S_TAI'), 'HARPNUM': harp,
+                           'USFLUX': rng.lognormal(20, 1, len(times)),
+                           'MEANPOT': rng.lognormal(5, 1, len(times))})
+        path = root / f"{harp}{ext}"
+        if ext == '.csv':
+            df.to_csv(path, index=False)
+        elif ext == '.json':
+            path.write_text(df.to_json(orient='records'))
+        else:
+            path.write_text(df.to_json(orient='records', lines=True))
+    return str(root), len(times)
+
+
+def stored(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return pd.read_sql_query(f"SELECT * FROM {swan_db.TABLE} ORDER BY HARPNUM, Timestamp", conn)
+
+
+def test_ingest_every_record(source, tmp_path):
+    root, n = source
+    db = str(tmp_path / 'swan.db')
+    summary = sharp_ingest.run(root, db, start='2012-01-01', end='2012-02-01', chunk_days=3)
+    assert summary['rows'] == 3 * n and summary['duplicates'] == 0 and summary['failed'] == 0
+
+    df = stored(db)
+    assert len(df) == 3 * n
+    assert df['Timestamp'].iloc[0] == '2012-01-05 00:00:00'
+    src = pd.read_csv(f"{root}/101.csv")
+    np.testing.assert_allclose(df.loc[df['HARPNUM'] == 101, 'USFLUX'], src['USFLUX'], rtol=1e-15)
+
+
+def test_resume_skips_finished_tasks(source, tmp_path):
+    root, n = source
+    db = str(tmp_path / 'swan.db')
+    sharp_ingest.run(root, db, start='2012-01-01', end='2012-02-01')
+    again = sharp_ingest.run(root, db, start='2012-01-01', end='2012-02-01')
+    assert again['tasks'] == 0 and again['rows'] == 0
+
+
+def test_overlapping_ranges_stay_unique(source, tmp_path):
+    root, n = source
+    db = str(tmp_path / 'swan.db')
+    first = sharp_ingest.run(root, db, start='2012-01-01', end='2012-01-10', chunk_days=2)
+    # A different range and chunking: new task keys, overlapping records
+    second = sharp_ingest.run(root, db, start='2012-01-08', end='2012-02-01', chunk_days=5)
+    overlap = 3 * 2 * 24 * 5
+    assert second['duplicates'] == overlap
+    assert second['rows'] == 3 * n - first['rows']
+    df = stored(db)
+    assert len(df) == 3 * n
+    assert not df.duplicated(['HARPNUM', 'Timestamp']).any()
+
+
+def test_existing_duplicates_need_dedupe(tmp_path, source):
+    root, n = source
+    db = str(tmp_path / 'swan.db')
+    with sqlite3.connect(db) as conn:
+        conn.execute(f"CREATE TABLE {swan_db.TABLE} (Timestamp TEXT, HARPNUM INTEGER, USFLUX REAL)")
+        rows = [('2012-01-05 00:00:00', 101, 1.0), ('2012-01-05 00:00:00', 101, 2.0),
+                ('2012-01-05 00:12:00', 101, 3.0), (None, 101, 4.0), (None, 101, 5.0)]
+        conn.executemany(f"INSERT INTO {swan_db.TABLE} VALUES (?, ?, ?)", rows)
+    with pytest.raises(ValueError, match='1 duplicate'):
+        sharp_ingest.Writer(db)
+    assert len(stored(db)) == 5
+
+    summary = sharp_ingest.run(root, db, start='2012-01-05', end='2012-01-06', dedupe=True)
+    assert summary['removed'] == 1
+    df = stored(db)
+    # The earliest copy is kept; rows without a Timestamp are left alone
+    assert list(df['USFLUX'].iloc[:4]) == [4.0, 5.0, 1.0, 3.0]
+    assert not df.dropna(subset=['Timestamp']).duplicated(['HARPNUM', 'Timestamp']).any()
+
+
+def test_journal_mode_and_missing_harpnum(source, tmp_path):
+    root, n = source
+    db = str(tmp_path / 'swan.db')
+    with sqlite3.connect(db) as conn:
+        conn.execute(f"CREATE TABLE {swan_db.TABLE} (Timestamp TEXT, USFLUX REAL)")
+    with pytest.raises(ValueError, match='HARPNUM'):
+        sharp_ingest.Writer(db)
+    with sqlite3.connect(db) as conn:
+        conn.execute(f"DROP TABLE {swan_db.TABLE}")
+    sharp_ingest.run(root, db, start='2012-01-05', end='2012-01-06')
+    with sqlite3.connect(db) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'delete'
+
+
+def test_http_source(source, tmp_path):
+    root, n = source
+    server = sharp_ingest.serve(root, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        db = str(tmp_path / 'swan.db')
+        summary = sharp_ingest.run(url, db, start='2012-01-06', end='2012-01-07', concurrency=4)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert summary['rows'] == 3 * 24 * 5
+    assert stored(db)['Timestamp'].str.startswith('2012-01-06').all()
+
+
+def test_parse_timestamp_forms():
+    assert sharp_ingest.parse_timestamp('2012.03.07_00:12:00_TAI') == '2012-03-07 00:12:00'
+    assert sharp_ingest.parse_timestamp('2012-03-07 00:12:00') == '2012-03-07 00:12:00'
+    assert sharp_ingest.parse_timestamp('2012-03-07T00:12') == '2012-03-07 00:12:00'
+    assert json.loads(json.dumps(sharp_ingest.numeric_keywords(
+        [{'T_REC': 'x', 'HARPNUM': 1, 'USFLUX': '1.5', 'NOTE': 'a'}]))) == ['USFLUX']
@@ -0,0 +1,82 @@
+import shutil
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import sharp_rollup
+import swan_db
+
+RESOLUTIONS = ('30min', '6h', '1D', '7D', 'MS', 'QS')
+
+
+@pytest.fixture
+def db(swan_path, tmp_path):
+    path = str(tmp_path / 'swan.db')
+    shutil.copy(swan_path, path)
+    return path
+
+
+def expected(path, keyword, start, end, resolution):
+    with sqlite3.connect(path) as conn:
+        df = pd.read_sql_query(f"SELECT Timestamp, {keyword} FROM {swan_db.TABLE} "
+                               f"WHERE {keyword} IS NOT NULL AND Timestamp BETWEEN ? AND ?",
+                               conn, params=(start, end), parse_dates=['Timestamp'])
+    s = df.set_index('Timestamp')[keyword].sort_index()
+    return s.resample(resolution).agg(['count', 'mean', 'std', 'min', 'max'])
+
+
+def check(path, keyword, start, end, resolution):
+    got = sharp_rollup.series(path, keyword, start, end, resolution)
+    ref = expected(path, keyword, start, end, resolution)
+    pd.testing.assert_index_equal(got.index, ref.index, check_names=False)
+    np.testing.assert_array_equal(got['n'], ref['count'])
+    for col in ('mean', 'min', 'max'):
+        np.testing.assert_allclose(got[col], ref[col], rtol=1e-12)
+    np.testing.assert_allclose(got['std'], ref['std'], rtol=1e-6)
+
+
+@pytest.mark.parametrize('resolution', RESOLUTIONS)
+def test_series_matches_resample(db, resolution):
+    status = sharp_rollup.refresh(db, ['USFLUX', 'CBI'])
+    assert status == {'USFLUX': 'full', 'CBI': 'full'}
+    check(db, 'USFLUX', '2011-03-17 05:31:10', '2013-11-02 17:00:00', resolution)
+    check(db, 'CBI', '2010-05-01 00:00:00', '2024-12-31 00:00:00', resolution)
+
+
+def test_plan_levels(db):
+    assert sharp_rollup.plan(db, 'USFLUX', 'MS') == 'raw'
+    sharp_rollup.refresh(db, ['USFLUX'])
+    assert sharp_rollup.plan(db, 'USFLUX', 'QS') == 'month'
+    assert sharp_rollup.plan(db, 'USFLUX', '7D') == 'day'
+    assert sharp_rollup.plan(db, 'USFLUX', '3h') == 'hour'
+    assert sharp_rollup.plan(db, 'USFLUX', '90min') == 'raw'
+    with pytest.raises(ValueError):
+        sharp_rollup.levels_for('W-SUN')
+
+
+def test_new_rows_read_raw_then_rolled_up(db):
+    sharp_rollup.refresh(db, ['USFLUX'])
+    rng = np.random.default_rng(2)
+    # Out of time order, as sharp_ingest writes them
+    seconds = rng.integers(0, 3 * 365 * 86400, 500)
+    times = pd.Timestamp('2012-01-01') + pd.to_timedelta(seconds, unit='s')
+    rows = list(zip(times.strftime('%Y-%m-%d %H:%M:%S'), rng.lognormal(20, 1, 500)))
+    with sqlite3.connect(db) as conn:
+        conn.executemany(f"INSERT INTO {swan_db.TABLE} (Timestamp, HARPNUM, USFLUX) "
+                         "VALUES (?, 7, ?)", rows)
+    check(db, 'USFLUX', '2011-06-01', '2015-06-01', 'MS')
+
+    assert sharp_rollup.refresh(db, ['USFLUX']) == {'USFLUX': 'incremental'}
+    assert sharp_rollup.refresh(db, ['USFLUX']) == {'USFLUX': 'current'}
+    for resolution in ('1D', 'MS'):
+        check(db, 'USFLUX', '2011-06-01 12:00:00', '2015-06-01', resolution)
+
+
+def test_full_rebuild_after_delete(db):
+    sharp_rollup.refresh(db, ['USFLUX'])
+    with sqlite3.connect(db) as conn:
+        conn.execute(f"DELETE FROM {swan_db.TABLE} WHERE Timestamp < '2012-01-01' AND HARPNUM % 2 = 0")
+    assert sharp_rollup.refresh(db, ['USFLUX'], full=True) == {'USFLUX': 'full'}
+    check(db, 'USFLUX', '2010-06-01', '2013-01-01', 'MS')
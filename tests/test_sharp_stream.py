@@ -0,0 +1,116 @@
+import shutil
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+import sharp_rollup
+import sharp_stream
+import swan_db
+from sharp_expr import Query, log10
+
+KEYWORDS = ['CBI', 'USFLUX', 'MEANPOT']
+
+
+def frame(path, keywords=KEYWORDS):
+    with sqlite3.connect(path) as conn:
+        df = pd.read_sql_query(f"SELECT Timestamp, {', '.join(keywords)} FROM {swan_db.TABLE} "
+                               "ORDER BY Timestamp", conn)
+    df['Timestamp'] = pd.to_datetime(df['Timestamp']).astype('datetime64[ns]')
+    return df
+
+
+def stream(path, **kwargs):
+    return sharp_stream.iter_chunks(path, KEYWORDS, required=(), chunk_rows=700, **kwargs)
+
+
+def test_collect_matches_full_read(swan_path):
+    got = sharp_stream.collect(stream(swan_path))
+    expected = frame(swan_path)
+    np.testing.assert_array_equal(got['Timestamp'], expected['Timestamp'])
+    for name in KEYWORDS:
+        assert got[name].dtype == np.float32
+        np.testing.assert_allclose(got[name], expected[name], rtol=sharp_stream.FLOAT32_RTOL)
+    exact = sharp_stream.collect(stream(swan_path, downcast=False))
+    pd.testing.assert_frame_equal(exact, expected, check_dtype=False)
+
+
+def test_bounded_and_required(swan_path):
+    got = sharp_stream.collect(sharp_stream.iter_chunks(
+        swan_path, ['USFLUX', 'MEANPOT'], start='2012-01-01', end='2012-12-31', chunk_rows=50))
+    expected = swan_db.load_series(swan_path, ['USFLUX', 'MEANPOT'], '2012-01-01', '2012-12-31')
+    assert len(got) == len(expected) > 0
+    assert not got[['USFLUX', 'MEANPOT']].isna().any().any()
+
+
+def test_moments_and_correlate_match_pandas(swan_path):
+    df = frame(swan_path)
+    got = sharp_stream.moments(stream(swan_path, downcast=False))
+    described = df[KEYWORDS].agg(['count', 'mean', 'std', 'min', 'max']).T
+    np.testing.assert_array_equal(got['n'], described['count'])
+    cols = ['mean', 'std', 'min', 'max']
+    np.testing.assert_allclose(got[cols], described[cols], rtol=1e-12)
+
+    table = sharp_stream.correlate(stream(swan_path, downcast=False), 'CBI').set_index('keyword')
+    for name in ('USFLUX', 'MEANPOT'):
+        pair = df[['CBI', name]].dropna()
+        r, p = stats.pearsonr(pair['CBI'], pair[name])
+        assert table.loc[name, 'n'] == len(pair)
+        assert table.loc[name, 'r'] == pytest.approx(r, rel=1e-10)
+        assert table.loc[name, 'p'] == pytest.approx(p, rel=1e-8)
+
+
+def test_binned_matches_rollups(swan_path, tmp_path):
+    path = str(tmp_path / 'swan.db')
+    shutil.copy(swan_path, path)
+    sharp_rollup.refresh(path, ['USFLUX'])
+    got = sharp_stream.binned(stream(path, downcast=False), 'USFLUX', '7D')
+    expected = sharp_rollup.series(path, 'USFLUX', resolution='1D')
+    weekly = frame(path).set_index('Timestamp')['USFLUX'].dropna()
+    weeks = weekly.groupby((weekly.index - pd.Timestamp(0)) // pd.Timedelta('7D'))
+    np.testing.assert_array_equal(got['n'], weeks.count())
+    np.testing.assert_allclose(got['mean'], weeks.mean(), rtol=1e-10)
+    np.testing.assert_allclose(got['max'], weeks.max(), rtol=0)
+    daily = sharp_stream.binned(stream(path, downcast=False), 'USFLUX', '1D')
+    nonempty = expected[expected['n'] > 0]
+    np.testing.assert_array_equal(daily.index, nonempty.index)
+    np.testing.assert_allclose(daily['mean'], nonempty['mean'], rtol=1e-10)
+    with pytest.raises(ValueError):
+        sharp_stream.binned(stream(path), 'USFLUX', 'MS')
+
+
+def test_iter_query_matches_to_frame(swan_path):
+    q = Query(swan_path).select('CBI', log10('USFLUX')).between('2011-01-01', '2014-01-01')
+    got = sharp_stream.collect(sharp_stream.iter_query(q, chunk_rows=100, downcast=False))
+    expected = q.to_frame()
+    np.testing.assert_array_equal(got['Timestamp'], expected['Timestamp'].astype('datetime64[ns]'))
+    pd.testing.assert_frame_equal(got.drop(columns='Timestamp'), expected.drop(columns='Timestamp'),
+                                  check_dtype=False)
+
+
+def test_text_and_downcast_fallback(tmp_path):
+    path = str(tmp_path / 'tiny.db')
+    with sqlite3.connect(path) as conn:
+        conn.execute(f"CREATE TABLE {swan_db.TABLE} (Timestamp TEXT, HARPNUM INTEGER, A REAL, B REAL)")
+        conn.executemany(f"INSERT INTO {swan_db.TABLE} VALUES (?, 1, ?, ?)",
+                         [('2012-01-01 00:00:00', 1.5, 1e300), ('2012-01-01 00:12:00', 'n/a', 2.0),
+                          ('2012-01-01 00:24:00', None, 3.0)])
+    chunks = list(sharp_stream.iter_chunks(path, ['A', 'B'], required=(), chunk_rows=1))
+    assert [c['A'].dtype for c in chunks] == [np.float32] * 3
+    # B does not fit float32 in the first chunk, so it stays float64
+    assert [c['B'].dtype for c in chunks] == [np.float64] * 3
+    df = sharp_stream.collect(iter(chunks))
+    assert df['A'].isna().tolist() == [False, True, True]
+
+
+def test_idle_streams_leave_the_pool_free(swan_path, monkeypatch):
+    monkeypatch.setenv('ASTROSTATS_POOL_SIZE', '1')
+    streams = [stream(swan_path) for _ in range(5)]
+    for s in streams:
+        next(s)
+    with swan_db.pooled(swan_path, timeout=1) as conn:
+        assert conn.execute(f"SELECT COUNT(*) FROM {swan_db.TABLE}").fetchone()[0] == 5000
+    for s in streams:
+        s.close()
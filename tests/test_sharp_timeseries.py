@@ -0,0 +1,57 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+import sharp_timeseries
+
+SPECS = ['USFLUX', 'log10(TOTPOT)', 'TOTUSJZ/USFLUX', 'MEANPOT']
+
+
+def raw_frame(path):
+    with sqlite3.connect(path) as conn:
+        return pd.read_sql_query("SELECT CBI, USFLUX, TOTPOT, TOTUSJZ, MEANPOT FROM solar_flare_data "
+                                 "WHERE CBI IS NOT NULL ORDER BY Timestamp", conn)
+
+
+def reference(df, spec):
+    if spec == 'log10(TOTPOT)':
+        return np.log10(df['TOTPOT'])
+    if spec == 'TOTUSJZ/USFLUX':
+        return df['TOTUSJZ'] / df['USFLUX']
+    return df[spec]
+
+
+def test_sweep_matches_pairwise_pearsonr(swan_path):
+    table = sharp_timeseries.correlation_sweep(swan_path, SPECS).set_index('keyword')
+    df = raw_frame(swan_path)
+    for spec in SPECS:
+        pair = pd.DataFrame({'x': df['CBI'], 'y': reference(df, spec)}).dropna()
+        r, p = stats.pearsonr(pair['x'], pair['y'])
+        assert table.loc[spec, 'n'] == len(pair)
+        assert table.loc[spec, 'r'] == pytest.approx(r, rel=1e-9)
+        assert table.loc[spec, 'p'] == pytest.approx(p, rel=1e-6)
+        assert table.loc[spec, 'y_std'] == pytest.approx(pair['y'].std(), rel=1e-9)
+
+
+def test_load_frame_require_all(swan_path):
+    strict = sharp_timeseries.load_frame(swan_path, SPECS)
+    loose = sharp_timeseries.load_frame(swan_path, SPECS, require_all=False)
+    assert not strict[SPECS].isna().any().any()
+    assert len(loose) == len(raw_frame(swan_path)) > len(strict)
+    np.testing.assert_allclose(loose['log10(TOTPOT)'], np.log10(raw_frame(swan_path)['TOTPOT']),
+                               rtol=1e-12, equal_nan=True)
+
+
+def test_batch_pearson_edge_cases():
+    x = np.array([1.0, 2.0, 3.0, np.nan, 5.0])
+    Y = np.column_stack([2 * x + 1, [np.nan, np.nan, 1.0, 2.0, np.nan], [3.0, 1.0, 4.0, 1.0, 5.0]])
+    out = sharp_timeseries.batch_pearson(x, Y)
+    np.testing.assert_array_equal(out['n'], [4, 1, 4])
+    assert out['r'][0] == pytest.approx(1.0) and out['p'][0] == 0.0
+    assert np.isnan(out['p'][1])
+    keep = np.isfinite(x)
+    r, p = stats.pearsonr(x[keep], Y[keep, 2])
+    assert out['r'][2] == pytest.approx(r) and out['p'][2] == pytest.approx(p)
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import solar_phases
+from tests import synthetic
+
+
+@pytest.fixture
+def events():
+    df = synthetic.catalog(2000, seed=10)
+    # Phase edges, and dates outside every phase
+    extra = pd.DataFrame({'Date': pd.to_datetime(['1996-05-01 00:00', '1997-06-30 00:00',
+                                                   '1997-06-30 00:01', '1990-01-01 00:00', None])})
+    return pd.concat([df, extra], ignore_index=True)
+
+
+def test_assign_matches_boolean_masks(events):
+    got = solar_phases.assign_phases(events['Date'])
+    expected = pd.Series(np.nan, index=events.index, dtype=object)
+    for label, start, end in solar_phases.CYCLE_PHASES:
+        mask = (events['Date'] >= start) & (events['Date'] <= end)
+        expected[mask] = label
+    pd.testing.assert_series_equal(got.astype(object), expected, check_names=False)
+    assert list(got.cat.categories) == [p[0] for p in solar_phases.CYCLE_PHASES]
+
+
+def test_phase_stats_matches_masks(events):
+    stats = solar_phases.phase_stats(events, solar_phases.MIN_MAX_PHASES)
+    assert list(stats.index) == [p[0] for p in solar_phases.MIN_MAX_PHASES]
+    for label, start, end in solar_phases.MIN_MAX_PHASES:
+        sel = events[(events['Date'] >= start) & (events['Date'] <= end)]
+        assert stats.loc[label, 'N'] == len(sel)
+        if len(sel):
+            assert stats.loc[label, 'CBI mean'] == pytest.approx(sel['CBI'].mean(), rel=1e-12,
+                                                                 nan_ok=True)
+            np.testing.assert_equal(stats.loc[label, 'Vel median'], sel['Vel'].median())
+
+
+def test_phase_stats_reuses_phase_column(events, monkeypatch):
+    expected = solar_phases.phase_stats(events, solar_phases.MIN_MAX_PHASES)
+    df = events.assign(phase=solar_phases.assign_phases(events['Date'], solar_phases.MIN_MAX_PHASES))
+
+    def assign_again(*args, **kwargs):
+        raise AssertionError("phases assigned twice")
+
+    monkeypatch.setattr(solar_phases, 'assign_phases', assign_again)
+    pd.testing.assert_frame_equal(solar_phases.phase_stats(df, solar_phases.MIN_MAX_PHASES), expected)
+
+
+def test_bad_catalogs():
+    with pytest.raises(ValueError, match='overlap'):
+        solar_phases.phase_table([('a', '2000-01-01', '2001-01-01'),
+                                  ('b', '2001-01-01', '2002-01-01')])
+    with pytest.raises(ValueError, match='before'):
+        solar_phases.phase_table([('a', '2001-01-01', '2000-01-01')])
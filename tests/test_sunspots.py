@@ -0,0 +1,121 @@
+import email.message
+import os
+import urllib.error
+
+import numpy as np
+import pytest
+
+import sunspots
+
+MONTHLY = """\
+1749 01 1749.042   96.7  -1.0    -1 1
+1749 02 1749.123  104.3  -1.0    -1 1
+2024 11 2024.873  152.5  22.6   824 0
+2024 12 2024.958  154.5  24.3   676  
+"""
+DAILY = """\
+1818 01 01 1818.001  -1  -1.0     0 1
+1818 01 02 1818.004  -1  -1.0     0 1
+2024 12 30 2024.996 170  13.1    40 0
+2024 12 31 2024.999 158  18.9    38 0
+"""
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+def test_parse_monthly_by_position():
+    data = sunspots.parse_silso(MONTHLY, 'monthly')
+    np.testing.assert_array_equal(data['year'], [1749, 1749, 2024, 2024])
+    np.testing.assert_array_equal(data['sunspot_number'], [96.7, 104.3, 152.5, 154.5])
+    np.testing.assert_array_equal(data['num_obs'], [-1, -1, 824, 676])
+    # The last line has no provisional marker
+    np.testing.assert_array_equal(data['provisional'][:3], [1, 1, 0])
+    assert np.isnan(data['provisional'][3])
+    assert str(data['date'][2])[:10] == '2024-11-01'
+
+
+def test_parse_daily():
+    data = sunspots.parse_silso(DAILY, 'daily')
+    np.testing.assert_array_equal(data['day'], [1, 2, 30, 31])
+    np.testing.assert_array_equal(data['sunspot_number'], [-1, -1, 170, 158])
+    assert str(data['date'][-1])[:10] == '2024-12-31'
+
+
+def test_parse_matches_whitespace_split():
+    data = sunspots.parse_silso(MONTHLY, 'monthly')
+    for i, line in enumerate(MONTHLY.splitlines()[:3]):
+        fields = [float(v) for v in line.split()]
+        got = [data[name][i] for name in sunspots.COLUMNS['monthly']]
+        assert got == fields
+
+
+def test_parse_rejects_garbage():
+    with pytest.raises(ValueError):
+        sunspots.parse_silso(MONTHLY.replace('96.7', 'x6.7'), 'monthly')
+    with pytest.raises(ValueError):
+        sunspots.parse_silso('     01 1749.042   96.7  -1.0    -1 1\n', 'monthly')
+
+
+def test_get_sunspots_slices_and_marks_missing(tmp_path):
+    source = write(tmp_path, 'm.txt', MONTHLY)
+    df = sunspots.get_sunspots('monthly', start='2024-01-01', source=source)
+    assert list(df['year']) == [2024, 2024]
+    assert list(df['provisional']) == [0, -1]
+    assert df['provisional'].dtype.kind == 'i'
+
+
+def test_local_source_cached_until_changed(tmp_path):
+    source = write(tmp_path, 'm.txt', MONTHLY)
+    sunspots.load_series('monthly', source=source, max_age=0)
+    data_file, meta_file = sunspots._cache_files('monthly', None)
+    assert data_file.startswith(str(tmp_path / 'cache'))
+
+    # Unchanged source: the cache is only touched
+    os.utime(data_file, (0, 0))
+    sunspots.load_series('monthly', source=source, max_age=0)
+    assert os.path.getmtime(data_file) > 0
+
+    with open(source, 'a') as fh:
+        fh.write("2025 01 2025.042  137.0  20.1   700 1\n")
+    os.utime(source, (1e9, 1e9))
+    data = sunspots.load_series('monthly', source=source, max_age=0)
+    assert len(data['year']) == 5
+
+
+def test_not_modified_touches_cache(tmp_path, monkeypatch):
+    url = 'https://example.invalid/SN_m_tot_V2.0.txt'
+    sunspots.ingest_file(write(tmp_path, 'm.txt', MONTHLY), 'monthly')
+    data_file, meta_file = sunspots._cache_files('monthly', None)
+    with open(meta_file, 'w') as fh:
+        fh.write('{"source": "%s", "etag": "\\"abc\\""}' % url)
+    os.utime(data_file, (0, 0))
+
+    sent = {}
+
+    def not_modified(request, timeout):
+        sent.update(request.header_items())
+        raise urllib.error.HTTPError(url, 304, 'Not Modified', email.message.Message(), None)
+
+    monkeypatch.setattr(sunspots.urllib.request, 'urlopen', not_modified)
+    data = sunspots.load_series('monthly', source=url)
+    assert sent['If-none-match'] == '"abc"'
+    assert os.path.getmtime(data_file) > 0
+    assert len(data['year']) == 4
+
+
+def test_offline_serves_cache(tmp_path, monkeypatch):
+    url = 'https://example.invalid/SN_m_tot_V2.0.txt'
+    sunspots.ingest_file(write(tmp_path, 'm.txt', MONTHLY), 'monthly')
+    data_file, meta_file = sunspots._cache_files('monthly', None)
+    with open(meta_file, 'w') as fh:
+        fh.write('{"source": "%s"}' % url)
+
+    def offline(request, timeout):
+        raise urllib.error.URLError('no network')
+
+    monkeypatch.setattr(sunspots.urllib.request, 'urlopen', offline)
+    assert len(sunspots.load_series('monthly', source=url, refresh=True)['year']) == 4
@@ -0,0 +1,87 @@
+import os
+import shutil
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import swan_db
+
+
+@pytest.fixture
+def db(swan_path, tmp_path):
+    path = str(tmp_path / 'swan.db')
+    shutil.copy(swan_path, path)
+    return path
+
+
+def indexes(path):
+    with sqlite3.connect(path) as conn:
+        return swan_db.existing_indexes(conn)
+
+
+def test_one_covering_index_per_keyword_set(db):
+    built = swan_db.prepare(db, ['USFLUX', 'MEANPOT'])
+    assert built == ['idx_solar_flare_data_Timestamp',
+                     'idx_solar_flare_data_Timestamp_MEANPOT_USFLUX']
+    assert swan_db.prepare(db, ['MEANPOT', 'USFLUX']) == []
+    with sqlite3.connect(db) as conn:
+        conn.execute(f"DROP INDEX {built[1]}")
+    # Already prepared in this process: nothing is rebuilt behind a query
+    assert swan_db.prepare(db, ['USFLUX', 'MEANPOT']) == []
+
+    with sqlite3.connect(db) as conn:
+        assert swan_db.ensure_indexes(conn, ['USFLUX', 'MEANPOT', 'USFLUX']) == [built[1]]
+        analyzed = {name for (name,) in conn.execute("SELECT idx FROM sqlite_stat1")}
+        assert set(built) <= analyzed
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'delete'
+    assert swan_db.covering_columns(['R_VALUE', 'CBI', 'TOTBSQ', 'USFLUX', 'MEANPOT']) is None
+
+
+def test_drop_covering_indexes(db):
+    with sqlite3.connect(db) as conn:
+        swan_db.ensure_indexes(conn, ['USFLUX'])
+        swan_db.ensure_indexes(conn, ['CBI', 'MEANPOT'])
+        dropped = swan_db.drop_covering_indexes(conn, keep=[('MEANPOT', 'CBI')])
+    assert dropped == ['idx_solar_flare_data_Timestamp_USFLUX']
+    assert 'idx_solar_flare_data_Timestamp_CBI_MEANPOT' in indexes(db)
+
+
+def test_queries_are_read_only(db):
+    df = swan_db.load_series(db, ['USFLUX', 'CBI'], '2012-01-01', '2013-01-01')
+    with sqlite3.connect(db) as conn:
+        expected = pd.read_sql_query(
+            "SELECT Timestamp, USFLUX, CBI FROM solar_flare_data WHERE USFLUX IS NOT NULL "
+            "AND CBI IS NOT NULL AND Timestamp BETWEEN '2012-01-01' AND '2013-01-01' "
+            "ORDER BY Timestamp", conn)
+    pd.testing.assert_frame_equal(df, expected)
+    assert indexes(db) == set()
+    with swan_db.pooled(db) as conn, pytest.raises(sqlite3.OperationalError):
+        conn.execute("CREATE INDEX idx_x ON solar_flare_data (CBI)")
+
+
+def test_pool_checkout_times_out(db):
+    pool = swan_db.ConnectionPool(db, size=1, timeout=0.05)
+    with pool.connection():
+        with pytest.raises(TimeoutError):
+            with pool.connection():
+                pass
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM solar_flare_data").fetchone()[0] == 5000
+    pool.close()
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_forked_child_gets_no_pools(db):
+    with swan_db.pooled(db):
+        pass
+    assert swan_db._pools
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.write(write, b'%d' % len(swan_db._pools))
+        os._exit(0)
+    os.close(write)
+    os.waitpid(pid, 0)
+    assert os.read(read, 16) == b'0'
+    os.close(read)
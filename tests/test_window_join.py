@@ -0,0 +1,56 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import window_join
+from tests import synthetic
+
+
+@pytest.fixture
+def events():
+    df = synthetic.catalog(300, seed=5)
+    # Events before the SWAN span get empty windows
+    early = pd.DataFrame({'Date': pd.to_datetime(['2001-01-01 12:00'])})
+    return pd.concat([df[['Date']], early], ignore_index=True)
+
+
+def per_event_sql(db_path, dates, keyword, hours):
+    """
+    One BETWEEN query per event, as the scripts used to do.
+    """
+    sql = (f"SELECT MAX({keyword}), MIN({keyword}), AVG({keyword}), COUNT({keyword}) "
+           f"FROM solar_flare_data WHERE {keyword} IS NOT NULL AND Timestamp BETWEEN ? AND ?")
+    rows = []
+    with sqlite3.connect(db_path) as conn:
+        for date in dates:
+            lo = (date - pd.Timedelta(hours=hours)).strftime(window_join.TIME_FMT)
+            hi = (date + pd.Timedelta(hours=hours)).strftime(window_join.TIME_FMT)
+            rows.append(conn.execute(sql, (lo, hi)).fetchone())
+    return pd.DataFrame(rows, columns=['max', 'min', 'mean', 'count'], dtype=float)
+
+
+@pytest.mark.parametrize('hours', [6, 48])
+def test_matches_per_event_queries(swan_path, events, hours):
+    got = window_join.get_sharp_near_times(events, swan_path, 'MEANPOT', hours,
+                                           agg=['max', 'min', 'mean', 'count'])
+    expected = per_event_sql(swan_path, events['Date'], 'MEANPOT', hours)
+    assert expected['count'].gt(0).any() and expected['count'].eq(0).any()
+    for agg in ('max', 'min', 'mean'):
+        np.testing.assert_allclose(got[agg], expected[agg], rtol=1e-12)
+    np.testing.assert_array_equal(got['count'], expected['count'])
+
+
+def test_window_aggregate_edges():
+    times = np.array(['2012-01-01 00:00:00', '2012-01-01 06:00:00', '2012-01-01 12:00:00'])
+    values = np.array([1.0, 5.0, 3.0])
+    start = np.array(['2012-01-01 00:00:00', '2012-01-01 06:00:01', '2012-01-02 00:00:00'])
+    end = np.array(['2012-01-01 06:00:00', '2012-01-01 12:00:00', '2012-01-03 00:00:00'])
+    out = window_join.window_aggregate(times, values, start, end, window_join.AGGREGATES)
+    np.testing.assert_array_equal(out['max'], [5.0, 3.0, np.nan])
+    np.testing.assert_array_equal(out['first'], [1.0, 3.0, np.nan])
+    np.testing.assert_array_equal(out['sum'], [6.0, 3.0, 0.0])
+    np.testing.assert_array_equal(out['count'], [2, 1, 0])
+    with pytest.raises(ValueError):
+        window_join.window_aggregate(times, values, start, end, ['median'])
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 10:02:11 2026
+
+@author: kfrench
+
+Time-window join of CBI events against SWAN SHARP keywords.
+
+The SHARP column is read once, sorted by Timestamp, and every CBI event
+window is resolved with searchsorted on the sorted timestamps.  Windows
+are compared as '%Y-%m-%d %H:%M:%S' strings, exactly like the
+'Timestamp BETWEEN start AND end' queries in cbi_meanpot.py / cbi_totbsq.py,
+so the matched values are the same as the old per-event loop.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+import instrument
+import swan_db
+
+TIME_FMT = "%Y-%m-%d %H:%M:%S"
+AGGREGATES = ('max', 'min', 'mean', 'sum', 'first', 'count')
+
+
+def event_windows(event_dates, time_window_hours=6):
+    """
+    Return the (start, end) window strings for each event date.
+    """
+    dates = pd.to_datetime(pd.Series(event_dates)).reset_index(drop=True)
+    dt = timedelta(hours=time_window_hours)
+    start = (dates - dt).dt.strftime(TIME_FMT).to_numpy(dtype=str)
+    end = (dates + dt).dt.strftime(TIME_FMT).to_numpy(dtype=str)
+    return start, end
+
+
+def window_bounds(sample_times, start, end):
+    """
+    Index bounds [lo, hi) into the sorted sample_times for each window,
+    inclusive on both ends like SQL BETWEEN.
+    """
+    lo = np.searchsorted(sample_times, start, side='left')
+    hi = np.searchsorted(sample_times, end, side='right')
+    hi = np.maximum(hi, lo)
+    return lo, hi
+
+
+def _reduce_windows(ufunc, values, lo, hi):
+    """
+    Apply ufunc.reduceat over every [lo, hi) window in a single call.
+    Empty windows come back as NaN.
+    """
+    # Interleave starts and ends; every other reduceat output is a window.
+    # A sentinel is appended so hi == len(values) is still a valid index.
+    if len(lo) == 0:
+        return np.array([], dtype=float)
+    padded = np.append(values, values.dtype.type(0))
+    idx = np.empty(2 * len(lo), dtype=np.intp)
+    idx[0::2] = lo
+    idx[1::2] = hi
+    out = ufunc.reduceat(padded, idx)[0::2].astype(float)
+    out[hi == lo] = np.nan
+    return out
+
+
+def window_aggregate(sample_times, values, start, end, aggs=('max',)):
+    """
+    Aggregate values over each [start, end] window.
+
+    sample_times must be sorted ascending and comparable with start/end
+    (strings in TIME_FMT, datetime64, or numbers).  Returns a dict
+    {agg: array} with one entry per window.
+    """
+    values = np.asarray(values, dtype=float)
+    lo, hi = window_bounds(sample_times, start, end)
+    count = hi - lo
+
+    results = {}
+    for agg in aggs:
+        if agg == 'max':
+            results[agg] = _reduce_windows(np.maximum, values, lo, hi)
+        elif agg == 'min':
+            results[agg] = _reduce_windows(np.minimum, values, lo, hi)
+        elif agg in ('sum', 'mean'):
+            total = _reduce_windows(np.add, values, lo, hi)
+            if agg == 'sum':
+                results[agg] = np.where(count > 0, total, 0.0)
+            else:
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    results[agg] = total / count
+        elif agg == 'first':
+            first = np.full(len(lo), np.nan)
+            has = count > 0
+            first[has] = values[lo[has]]
+            results[agg] = first
+        elif agg == 'count':
+            results[agg] = count
+        else:
+            raise ValueError(f"Unknown aggregate {agg!r}, expected one of {AGGREGATES}")
+    return results
+
+
+def load_sharp_column(conn, keyword, start=None, end=None):
+    """
+    Read one SHARP keyword sorted by Timestamp, optionally limited to
+    [start, end].  Returns (timestamps as str array, values as float array).
+    """
+    if start is not None and end is not None:
+        rows = swan_db.execute(conn, swan_db.series_sql((keyword,), bounded=True), (start, end))
+    else:
+        rows = swan_db.execute(conn, swan_db.series_sql((keyword,)))
+    if not rows:
+        return np.array([], dtype=str), np.array([], dtype=float)
+    times, values = zip(*rows)
+    return np.asarray(times, dtype=str), np.asarray(values, dtype=float)
+
+
+@instrument.timed('match.window_join')
+def get_sharp_near_times(cbi_df, db_path, keyword, time_window_hours=6, agg='max'):
+    """
+    Match a SHARP keyword to every CBI event in cbi_df['Date'] over a
+    +/- time_window_hours window.
+
+    agg is one of AGGREGATES, or a list of them; a single agg returns an
+    array aligned with cbi_df, a list returns a DataFrame with one column
+    per aggregate.
+    """
+    aggs = [agg] if isinstance(agg, str) else list(agg)
+    start, end = event_windows(cbi_df['Date'], time_window_hours)
+
+    if len(start):
+        with swan_db.pooled(db_path) as conn:
+            times, values = load_sharp_column(conn, keyword, min(start), max(end))
+    else:
+        times, values = np.array([], dtype=str), np.array([], dtype=float)
+
+    results = window_aggregate(times, values, start, end, aggs)
+    if isinstance(agg, str):
+        return results[agg]
+    return pd.DataFrame(results, index=cbi_df.index)